@@ -0,0 +1,208 @@
+"""
+Брокер в памяти процесса с подмножеством API aio-pika.
+
+Поддерживает ровно то, что используют RabbitMQClient и OrderConsumer:
+каналы с prefetch, объявление очередей, публикацию через default exchange,
+подписку, ack/reject и счётчик сообщений в очереди. Нужен, чтобы гонять
+бенчмарк конвейера на одной машине без RabbitMQ.
+"""
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+_consumer_tags = itertools.count(1)
+_delivery_tags = itertools.count(1)
+
+
+class FakeIncomingMessage:
+    def __init__(self, queue, channel, message, no_ack: bool, redelivered: bool = False):
+        self._queue = queue
+        self._channel = channel
+        self._message = message
+        self._no_ack = no_ack
+        self.delivery_tag = next(_delivery_tags)
+        self.redelivered = redelivered
+        self.processed = no_ack
+
+    def __getattr__(self, name):
+        # body, content_type, headers, message_id, timestamp и т.д.
+        return getattr(self._message, name)
+
+    def _settle(self):
+        if self.processed:
+            raise RuntimeError("Сообщение уже обработано")
+        self.processed = True
+        self._channel.unacked -= 1
+        self._queue.wakeup()
+
+    async def ack(self, multiple: bool = False):
+        self._settle()
+
+    async def reject(self, requeue: bool = False):
+        self._settle()
+        if requeue:
+            self._queue.requeue(self._message)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        await self.reject(requeue=requeue)
+
+    @asynccontextmanager
+    async def process(self, requeue: bool = False, reject_on_redelivered: bool = False, ignore_processed: bool = False):
+        try:
+            yield self
+            if not ignore_processed or not self.processed:
+                await self.ack()
+        except BaseException:
+            if not ignore_processed or not self.processed:
+                await self.reject(requeue=requeue)
+            raise
+
+
+class FakeQueue:
+    def __init__(self, name: str):
+        self.name = name
+        self.messages = deque()
+        self.consumers = {}
+        self.published = 0
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._rotation = 0
+
+    @property
+    def message_count(self) -> int:
+        return len(self.messages)
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    def put(self, message):
+        self.published += 1
+        self.messages.append((message, False))
+        self.wakeup()
+
+    def requeue(self, message):
+        self.messages.appendleft((message, True))
+        self.wakeup()
+
+    def add_consumer(self, channel, callback, no_ack: bool) -> str:
+        consumer_tag = f"ctag{next(_consumer_tags)}"
+        self.consumers[consumer_tag] = (channel, callback, no_ack)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        return consumer_tag
+
+    def remove_consumer(self, consumer_tag: str):
+        self.consumers.pop(consumer_tag, None)
+        self.wakeup()
+
+    def _next_consumer(self):
+        tags = list(self.consumers)
+        for i in range(len(tags)):
+            consumer_tag = tags[(self._rotation + i) % len(tags)]
+            channel, callback, no_ack = self.consumers[consumer_tag]
+            if no_ack or channel.has_capacity():
+                self._rotation += i + 1
+                return channel, callback, no_ack
+        return None
+
+    async def _dispatch(self):
+        while self.consumers:
+            consumer = self._next_consumer() if self.messages else None
+            if consumer is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            channel, callback, no_ack = consumer
+            message, redelivered = self.messages.popleft()
+            if not no_ack:
+                channel.unacked += 1
+            incoming = FakeIncomingMessage(self, channel, message, no_ack, redelivered)
+            # Без ожидания доставка ограничена только prefetch каналов
+            channel.track(asyncio.create_task(callback(incoming)))
+
+
+class FakeQueueHandle:
+    def __init__(self, queue: FakeQueue, channel):
+        self._queue = queue
+        self._channel = channel
+        self.name = queue.name
+
+    @property
+    def declaration_result(self):
+        return SimpleNamespace(message_count=self._queue.message_count, consumer_count=len(self._queue.consumers))
+
+    async def consume(self, callback, no_ack: bool = False, **kwargs) -> str:
+        return self._queue.add_consumer(self._channel, callback, no_ack)
+
+    async def cancel(self, consumer_tag: str, **kwargs):
+        self._queue.remove_consumer(consumer_tag)
+
+
+class FakeExchange:
+    def __init__(self, broker, name: str = ""):
+        self._broker = broker
+        self.name = name
+
+    async def publish(self, message, routing_key: str, **kwargs):
+        queue = self._broker.queues.get(routing_key)
+        # Как и в RabbitMQ, сообщение в необъявленную очередь теряется
+        if queue is not None:
+            queue.put(message)
+        # Публикация в настоящий брокер всегда уступает цикл событий;
+        # без этого генератор нагрузки не даёт работать consumer'у
+        await asyncio.sleep(0)
+
+
+class FakeChannel:
+    def __init__(self, broker):
+        self._broker = broker
+        self.prefetch_count = 0
+        self.unacked = 0
+        self.default_exchange = FakeExchange(broker)
+        self._tasks = set()
+
+    def has_capacity(self) -> bool:
+        return not self.prefetch_count or self.unacked < self.prefetch_count
+
+    def track(self, task: asyncio.Task):
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs):
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name: str, **kwargs) -> FakeQueueHandle:
+        return FakeQueueHandle(self._broker.declare_queue(name), self)
+
+    async def get_exchange(self, name: str, **kwargs) -> FakeExchange:
+        return FakeExchange(self._broker, name)
+
+    async def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, broker):
+        self._broker = broker
+
+    async def channel(self, **kwargs) -> FakeChannel:
+        return FakeChannel(self._broker)
+
+    async def close(self):
+        pass
+
+
+class FakeBroker:
+    def __init__(self):
+        self.queues = {}
+
+    def declare_queue(self, name: str) -> FakeQueue:
+        if name not in self.queues:
+            self.queues[name] = FakeQueue(name)
+        return self.queues[name]
+
+    def connection(self) -> FakeConnection:
+        return FakeConnection(self)
@@ -0,0 +1,103 @@
+"""
+Бенчмарк сериализации списков Django-сервиса.
+
+Заполняет временную тестовую базу заказами и рецептами с комментариями и
+сравнивает GET /order и GET /recipe через ModelSerializer DRF и через
+быстрый путь на строках .values() (project.fast_serializers): время ответа
+и совпадение тела байт в байт.
+
+Пример (из корня репозитория, настройки базы - как у сервиса):
+
+    DJANGO_SETTINGS_MODULE=project.settings python -m benchmarks.list_serialization --rows 5000 --limit 1000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "django_microservice"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from order.models import Order, OrderStatus  # noqa: E402
+from recipe.models import Recipe, RecipeComment  # noqa: E402
+
+
+def populate(rows: int):
+    now = timezone.now()
+    Order.objects.bulk_create([
+        Order(
+            product_name=f"Товар {i}",
+            quantity=i % 10 + 1,
+            customer_name="Покупатель",
+            customer_email=f"buyer{i}@example.com",
+            status=OrderStatus.values[i % len(OrderStatus.values)],
+            created_at=now - timedelta(seconds=i, microseconds=i),
+        )
+        for i in range(rows)
+    ], batch_size=1000)
+    recipes = Recipe.objects.bulk_create([
+        Recipe(title=f"Рецепт {i}", time_minutes=i % 120, price=f"{i % 1000}.{i % 100:02}",
+               description="Описание", ingredients="Ингредиенты")
+        for i in range(rows)
+    ], batch_size=1000)
+    RecipeComment.objects.bulk_create([
+        RecipeComment(recipe=recipe, comment_text=f"Комментарий {j}")
+        for recipe in recipes
+        for j in range(recipe.id % 8)
+    ], batch_size=1000)
+
+
+def measure(client: APIClient, url: str, repeat: int):
+    timings = []
+    body = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        body = response.content
+    return statistics.median(timings), body
+
+
+def run(args):
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        populate(args.rows)
+        client = APIClient()
+        with override_settings(RECIPE_CACHE_ENABLED=False):
+            for url in (f"/order?limit={args.limit}", f"/recipe?limit={args.limit}"):
+                with override_settings(FAST_LIST_SERIALIZATION=False):
+                    slow, expected = measure(client, url, args.repeat)
+                fast, actual = measure(client, url, args.repeat)
+                print(
+                    f"{url}: DRF {slow * 1000:.1f} мс, быстрый путь {fast * 1000:.1f} мс, "
+                    f"ускорение x{slow / fast:.1f}, ответ {'совпадает' if actual == expected else 'ОТЛИЧАЕТСЯ'}"
+                )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="Заказов и рецептов в базе")
+    parser.add_argument("--limit", type=int, default=1000, help="Размер страницы")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,108 @@
+"""
+События изменений сущностей с переносом состояния (event-carried state transfer).
+
+Конверт события:
+
+    {
+        "schema": 1,
+        "type": "created" | "updated" | "deleted",
+        "entity": "order",
+        "id": 42,
+        "version": 3,
+        "occurred_at": "2024-05-01T12:00:00.000000Z",
+        "data": {...}
+    }
+
+version растёт на единицу при каждом изменении строки, поэтому consumer
+может применять события по одному и отбрасывать пришедшие не по порядку
+или повторно. В created - всё состояние сущности, в updated - только
+изменённые поля, в deleted data нет.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, UTC
+from typing import Dict, Optional, Tuple
+
+SCHEMA_VERSION = 1
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+EVENT_TYPES = (CREATED, UPDATED, DELETED)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    type: str
+    entity: str
+    id: object
+    version: int
+    occurred_at: str
+    data: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.entity, str(self.id)
+
+
+def make_event(
+    event_type: str,
+    entity: str,
+    entity_id,
+    version: int,
+    data: Optional[dict] = None,
+    occurred_at: Optional[datetime] = None,
+) -> dict:
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Неизвестный тип события: {event_type}")
+    event = {
+        "schema": SCHEMA_VERSION,
+        "type": event_type,
+        "entity": entity,
+        "id": entity_id,
+        "version": version,
+        "occurred_at": (occurred_at or datetime.now(UTC)).isoformat(timespec="microseconds").replace("+00:00", "Z"),
+    }
+    if event_type != DELETED:
+        event["data"] = data or {}
+    return event
+
+
+def parse_event(body: dict) -> ChangeEvent:
+    """Проверяет конверт; ValueError - не событие этой схемы."""
+    if not isinstance(body, dict) or body.get("schema") != SCHEMA_VERSION:
+        raise ValueError("Неподдерживаемая схема события")
+    try:
+        event = ChangeEvent(
+            type=body["type"],
+            entity=body["entity"],
+            id=body["id"],
+            version=int(body["version"]),
+            occurred_at=body.get("occurred_at", ""),
+            data=body.get("data") or {},
+        )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Некорректное событие: {e!r}") from e
+    if event.type not in EVENT_TYPES:
+        raise ValueError(f"Неизвестный тип события: {event.type}")
+    return event
+
+
+class VersionTracker:
+    """Последняя применённая версия каждой сущности, включая удалённые."""
+
+    def __init__(self):
+        self._versions: Dict[Tuple[str, str], int] = {}
+
+    def remember(self, entity: str, entity_id, version: int):
+        """Восстановление из снимка: версия без события."""
+        self._versions[entity, str(entity_id)] = version
+
+    def version(self, event: ChangeEvent) -> int:
+        return self._versions.get(event.key, 0)
+
+    def accept(self, event: ChangeEvent) -> bool:
+        """True, если событие новее применённого; тогда оно запоминается."""
+        if event.version <= self.version(event):
+            return False
+        self._versions[event.key] = event.version
+        return True
@@ -0,0 +1,43 @@
+"""
+Общая работа с RabbitMQ для всех сервисов.
+
+- topology - очереди и обменники с параметрами объявления;
+- codecs - форматы тел сообщений по content_type;
+- publisher - асинхронный издатель с подтверждениями, пачками и допуском публикаций;
+- consumer - подключение и конкурентная обработка очереди;
+- sync_publisher - пул каналов pika для синхронного кода (импортируется явно).
+"""
+from common.messaging.codecs import CODECS, JSON_CONTENT_TYPE, codec_by_name, decode, get_codec, register_codec
+from common.messaging.consumer import ConsumerRunner, open_channels
+from common.messaging.publisher import AsyncPublisher, BrokerUnavailable
+from common.messaging.topology import (
+    ORDER_EVENTS_QUEUE,
+    ORDERS_QUEUE,
+    RECIPE_EVENTS_QUEUE,
+    RECIPES_EXCHANGE,
+    ExchangeSpec,
+    QueueSpec,
+    Topology,
+    default_topology,
+)
+
+__all__ = [
+    "CODECS",
+    "JSON_CONTENT_TYPE",
+    "ORDER_EVENTS_QUEUE",
+    "ORDERS_QUEUE",
+    "RECIPE_EVENTS_QUEUE",
+    "RECIPES_EXCHANGE",
+    "AsyncPublisher",
+    "BrokerUnavailable",
+    "ConsumerRunner",
+    "ExchangeSpec",
+    "QueueSpec",
+    "Topology",
+    "codec_by_name",
+    "decode",
+    "default_topology",
+    "get_codec",
+    "open_channels",
+    "register_codec",
+]
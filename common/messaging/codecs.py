@@ -0,0 +1,131 @@
+"""
+Форматы тел сообщений, выбираемые по content_type.
+
+Кодек - объект с content_type, encode(dict) -> bytes и decode(bytes) -> dict.
+Свой формат подключается через register_codec(); consumer выбирает кодек по
+content_type входящего сообщения, поэтому форматы можно менять у издателя
+без остановки consumer'ов.
+"""
+import json
+import struct
+from datetime import datetime, timedelta, UTC
+from typing import Dict, Optional, Protocol
+
+JSON_CONTENT_TYPE = "application/json"
+BINARY_ORDER_CONTENT_TYPE = "application/x-order-v1"
+
+# Числовые коды статусов в бинарном формате. Коды только добавляются,
+# иначе старые сообщения в очереди декодируются неправильно
+STATUS_CODES = {"created": 0, "processing": 1, "completed": 2, "cancelled": 3}
+STATUSES = {code: status for status, code in STATUS_CODES.items()}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+MICROSECOND = timedelta(microseconds=1)
+
+# статус, количество, время создания в микросекундах от эпохи
+_HEADER = struct.Struct("!Biq")
+_LENGTH = struct.Struct("!H")
+# Пределы бинарного формата: количество - int32, строка - до 65535 байт UTF-8
+MIN_QUANTITY, MAX_QUANTITY = -(2 ** 31), 2 ** 31 - 1
+MAX_STRING_BYTES = 2 ** 16 - 1
+_STRING_FIELDS = ("order_id", "product_name", "customer_name", "customer_email")
+
+
+class Codec(Protocol):
+    content_type: str
+
+    def encode(self, data: dict) -> bytes: ...
+
+    def decode(self, body: bytes) -> dict: ...
+
+
+class JsonCodec:
+    content_type = JSON_CONTENT_TYPE
+
+    def encode(self, data: dict) -> bytes:
+        return json.dumps(data).encode()
+
+    def decode(self, body: bytes) -> dict:
+        return json.loads(body)
+
+
+class BinaryOrderCodec:
+    """
+    Компактный формат заказа: фиксированный заголовок из struct и строки
+    с двухбайтовым префиксом длины, без имён полей.
+    """
+    content_type = BINARY_ORDER_CONTENT_TYPE
+
+    def encode(self, data: dict) -> bytes:
+        created_at = data["created_at"]
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=UTC)
+        micros = (created_at - EPOCH) // MICROSECOND
+
+        quantity = data["quantity"]
+        if not MIN_QUANTITY <= quantity <= MAX_QUANTITY:
+            raise ValueError(f"quantity вне диапазона int32: {quantity}")
+        parts = [_HEADER.pack(STATUS_CODES[data["status"]], quantity, micros)]
+        for field in _STRING_FIELDS:
+            encoded = data[field].encode()
+            if len(encoded) > MAX_STRING_BYTES:
+                raise ValueError(f"{field} длиннее {MAX_STRING_BYTES} байт")
+            parts.append(_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
+
+    def decode(self, body: bytes) -> dict:
+        status, quantity, micros = _HEADER.unpack_from(body)
+        offset = _HEADER.size
+        data = {}
+        for field in _STRING_FIELDS:
+            (length,) = _LENGTH.unpack_from(body, offset)
+            offset += _LENGTH.size
+            data[field] = body[offset:offset + length].decode()
+            offset += length
+
+        data.update(
+            quantity=quantity,
+            status=STATUSES[status],
+            created_at=(EPOCH + micros * MICROSECOND).isoformat(),
+        )
+        return data
+
+
+CODECS: Dict[str, Codec] = {}
+# Короткие имена для настроек (RABBITMQ_CODEC=json|binary)
+CODEC_NAMES: Dict[str, str] = {}
+
+
+def register_codec(codec: Codec, name: Optional[str] = None):
+    CODECS[codec.content_type] = codec
+    if name:
+        CODEC_NAMES[name] = codec.content_type
+
+
+register_codec(JsonCodec(), "json")
+register_codec(BinaryOrderCodec(), "binary")
+
+
+def get_codec(content_type: Optional[str]) -> Codec:
+    # Сообщения без content_type публиковались старыми версиями в JSON
+    try:
+        return CODECS[content_type or JSON_CONTENT_TYPE]
+    except KeyError:
+        raise ValueError(f"Неизвестный формат сообщения: {content_type}")
+
+
+def codec_by_name(name: str) -> Codec:
+    try:
+        return CODECS[CODEC_NAMES[name]]
+    except KeyError:
+        raise ValueError(f"Неизвестный кодек: {name}")
+
+
+def decode(body: bytes, content_type: Optional[str]) -> dict:
+    try:
+        return get_codec(content_type).decode(body)
+    except struct.error as e:
+        raise ValueError(f"Повреждённое сообщение: {e}") from e
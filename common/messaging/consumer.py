@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+import aio_pika
+from prometheus_client import Gauge
+
+from common.messaging.topology import QueueSpec
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[aio_pika.abc.AbstractIncomingMessage], Awaitable[None]]
+
+
+async def open_channels(
+    rabbitmq_url: str,
+    count: int = 1,
+    prefetch_count: int = 1,
+) -> Tuple[aio_pika.abc.AbstractRobustConnection, List[aio_pika.abc.AbstractChannel]]:
+    """Соединение и count каналов с prefetch_count на каждый."""
+    connection = await aio_pika.connect_robust(rabbitmq_url)
+    channels = []
+    for _ in range(count):
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=prefetch_count)
+        channels.append(channel)
+    return connection, channels
+
+
+class ConsumerRunner:
+    """
+    Конкурентная обработка одной очереди.
+
+    Каждый канал подписывается на очередь, доставленные сообщения попадают в
+    общий буфер, а concurrency обработчиков разбирают его. Брокер не отдаст
+    больше prefetch_count сообщений на канал, поэтому буфер такого размера
+    никогда не блокирует доставку. Подтверждение сообщения - забота handler.
+
+    run() работает до stopping, затем отменяет подписки и дорабатывает уже
+    полученные сообщения.
+    """
+
+    def __init__(self, handler: Handler, concurrency: int = 1, buffered: Optional[Gauge] = None):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.buffered = buffered
+
+    async def run(
+        self,
+        channels: Sequence[aio_pika.abc.AbstractChannel],
+        queue: QueueSpec,
+        prefetch_count: int,
+        stopping: asyncio.Event,
+    ):
+        messages = asyncio.Queue(maxsize=prefetch_count * len(channels))
+        if self.buffered is not None:
+            self.buffered.set_function(messages.qsize)
+        workers = [asyncio.create_task(self._worker(messages)) for _ in range(self.concurrency)]
+
+        subscriptions = []
+        try:
+            for channel in channels:
+                declared = await queue.declare(channel)
+                consumer_tag = await declared.consume(messages.put)
+                subscriptions.append((declared, consumer_tag))
+            await stopping.wait()
+        finally:
+            for declared, consumer_tag in subscriptions:
+                await declared.cancel(consumer_tag)
+            await messages.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _worker(self, messages: asyncio.Queue):
+        while True:
+            message = await messages.get()
+            try:
+                await self.handler(message)
+            except Exception:
+                # Упавший обработчик не уносит с собой worker: иначе буфер
+                # перестанет разбираться, а stop() не дождётся messages.join()
+                logger.exception("Сообщение %s не обработано", message.message_id)
+            finally:
+                messages.task_done()
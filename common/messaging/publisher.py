@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import aio_pika
+from opentelemetry import context as otel_context
+
+from common import tracing
+from common.messaging.codecs import JSON_CONTENT_TYPE, JsonCodec
+from common.messaging.topology import Topology, default_topology
+
+Exchange = Union[str, aio_pika.abc.AbstractExchange, None]
+
+_json = JsonCodec()
+
+logger = logging.getLogger(__name__)
+
+
+def _would_wait(coroutine) -> bool:
+    """Приостановится ли корутина на первом шаге; дальше она не выполняется."""
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        return False
+    coroutine.close()
+    return True
+
+
+class BrokerUnavailable(Exception):
+    """Брокер не принимает публикации или локальный буфер полон; запрос стоит повторить позже."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"RabbitMQ недоступен: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AsyncPublisher:
+    """
+    Издатель aio-pika с подтверждениями брокера (publisher confirms).
+
+    Одно соединение и канал на процесс; очереди и обменники объявляются по
+    Topology при первой публикации в них. publish_many() отправляет все
+    сообщения сразу и ждёт подтверждений вместе - пачка стоит один round
+    trip, а не N. В режиме batching одиночные publish() из параллельных
+    задач собираются в такие же пачки: пока предыдущая пачка ждёт
+    подтверждений, следующая копится до max_batch_size или max_batch_delay,
+    на свободном канале сообщение уходит сразу. Число неподтверждённых
+    брокером сообщений ограничено max_unconfirmed.
+
+    Подтверждения включены всегда (как и в канале aio-pika по умолчанию):
+    publish() возвращается только после basic.ack брокера, то есть каждая
+    публикация стоит не меньше одного round trip до RabbitMQ. Без этого
+    503 при перегрузке и at-least-once outbox были бы невозможны.
+
+    Допуск публикаций: при тревоге памяти/диска брокер шлёт
+    connection.blocked и перестаёт читать сокет, публикации зависают.
+    Вместо того чтобы копить их без предела, издатель держит не больше
+    max_in_flight ожидающих публикаций, ограничивает ожидание publish_timeout
+    и сразу отказывает BrokerUnavailable, пока брокер заблокирован.
+    """
+
+    def __init__(
+        self,
+        topology: Optional[Topology] = None,
+        batching: bool = False,
+        max_batch_size: int = 100,
+        max_batch_delay: float = 0.005,
+        max_unconfirmed: int = 1000,
+        max_in_flight: int = 1000,
+        publish_timeout: float = 5.0,
+        retry_after: float = 1.0,
+    ):
+        self.topology = topology or default_topology()
+        self.connection = None
+        self.channel = None
+        self.queues: Dict[str, aio_pika.abc.AbstractQueue] = {}
+        self.exchanges: Dict[str, aio_pika.abc.AbstractExchange] = {}
+
+        self.batching = batching
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.max_unconfirmed = max_unconfirmed
+        self._pending = None
+        self._flusher = None
+        self._unconfirmed = None
+        self._in_flight = set()
+
+        self.max_in_flight = max_in_flight
+        self.publish_timeout = publish_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._disconnected = False
+        self._blocked_unknown = False
+
+    async def connect(self, rabbitmq_url: str):
+        self.connection = await aio_pika.connect_robust(rabbitmq_url)
+        # Пока connect_robust переподключается, публикации не ждут, а отклоняются
+        self.connection.close_callbacks.add(self._on_connection_lost)
+        self.connection.reconnect_callbacks.add(self._on_reconnected)
+        self.channel = await self.connection.channel(publisher_confirms=True)
+
+    def _on_connection_lost(self, _connection, _exc=None):
+        self._disconnected = True
+
+    def _on_reconnected(self, _connection):
+        self._disconnected = False
+
+    @property
+    def blocked(self) -> bool:
+        # aio-pika не сообщает о connection.blocked наружу. У соединения aiormq
+        # есть ready(): она ждёт, пока брокер не снимет блокировку
+        transport = getattr(self.connection, "transport", None)
+        connection = getattr(transport, "connection", None)
+        if connection is None:
+            return False
+        ready = getattr(connection, "ready", None)
+        if ready is None:
+            if not self._blocked_unknown:
+                self._blocked_unknown = True
+                logger.warning(
+                    "Соединение %s не сообщает о connection.blocked; при тревоге брокера "
+                    "публикации будут отклоняться только по publish_timeout", type(connection).__name__,
+                )
+            return False
+        return _would_wait(ready())
+
+    def unavailable_reason(self, count: int = 1) -> Optional[str]:
+        """Почему публикация count сообщений сейчас будет отклонена; None, если брокер её примет."""
+        if self.channel is None or self._disconnected:
+            return "disconnected"
+        if self.blocked:
+            return "blocked"
+        if self.in_flight + count > self.max_in_flight:
+            return "overloaded"
+        return None
+
+    def on_rejected(self, reason: str):
+        """Вызывается перед каждым BrokerUnavailable; место для метрик сервиса."""
+
+    def check_available(self, count: int = 1):
+        reason = self.unavailable_reason(count)
+        if reason is not None:
+            self.on_rejected(reason)
+            raise BrokerUnavailable(reason, self.retry_after)
+
+    async def declare_queue(self, queue_name: str) -> aio_pika.abc.AbstractQueue:
+        if queue_name not in self.queues:
+            self.queues[queue_name] = await self.topology.declare_queue(self.channel, queue_name)
+        return self.queues[queue_name]
+
+    async def get_exchange(self, exchange: Exchange, routing_key: str) -> aio_pika.abc.AbstractExchange:
+        """Обменник по имени из Topology; без имени - default exchange и очередь routing_key."""
+        if exchange is not None and not isinstance(exchange, str):
+            return exchange
+        if not exchange:
+            await self.declare_queue(routing_key)
+            return self.channel.default_exchange
+        if exchange not in self.exchanges:
+            self.exchanges[exchange] = await self.topology.declare_exchange(self.channel, exchange)
+        return self.exchanges[exchange]
+
+    @staticmethod
+    def build_message(
+        body: bytes,
+        content_type: str = JSON_CONTENT_TYPE,
+        message_id: Optional[str] = None,
+        headers: Optional[dict] = None,
+    ) -> aio_pika.Message:
+        return aio_pika.Message(
+            body=body,
+            content_type=content_type,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            # По message_id consumer'ы отбрасывают повторные доставки
+            message_id=message_id or uuid.uuid4().hex,
+            headers=headers or None,
+        )
+
+    async def publish(self, message: aio_pika.Message, routing_key: str, exchange: Exchange = ""):
+        await self.publish_many([(exchange, routing_key, message)])
+
+    async def publish_many(self, messages: Iterable[Tuple[Exchange, str, aio_pika.Message]]):
+        """Сообщения - кортежи (exchange, routing_key, message); возвращается после подтверждения всех."""
+        messages = list(messages)
+        if len(messages) > self.max_in_flight:
+            # Такую пачку не допустить никогда, повтор по Retry-After не поможет
+            raise ValueError(f"Пачка из {len(messages)} сообщений больше max_in_flight={self.max_in_flight}")
+        self.check_available(len(messages))
+        self.in_flight += len(messages)
+        try:
+            await asyncio.wait_for(self._publish_all(messages), self.publish_timeout)
+        except asyncio.TimeoutError:
+            self.on_rejected("timeout")
+            raise BrokerUnavailable("timeout", self.retry_after)
+        finally:
+            self.in_flight -= len(messages)
+
+    async def publish_json(self, routing_key: str, body: dict, exchange: str = "", message_id: Optional[str] = None):
+        message = self.build_message(_json.encode(body), message_id=message_id, headers=tracing.inject({}))
+        await self.publish(message, routing_key, exchange)
+
+    async def _publish_all(self, messages):
+        publishes = []
+        for exchange, routing_key, message in messages:
+            target = await self.get_exchange(exchange, routing_key)
+            publishes.append(self._publish(message, target, routing_key))
+        await asyncio.gather(*publishes)
+
+    async def _publish(self, message: aio_pika.Message, exchange: aio_pika.abc.AbstractExchange, routing_key: str):
+        parent = tracing.message_context(message.headers)
+        if not self.batching:
+            await self._send(message, exchange, routing_key, parent)
+            return
+
+        if self._flusher is None:
+            self._start_batching()
+        confirmed = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((message, exchange, routing_key, parent, confirmed))
+        await confirmed
+
+    @staticmethod
+    async def _send(message: aio_pika.Message, exchange: aio_pika.abc.AbstractExchange, routing_key: str, parent):
+        # Пачку отправляет задача _flush_loop, а span публикации должен
+        # продолжить trace того, кто сообщение опубликовал
+        token = otel_context.attach(parent)
+        try:
+            await exchange.publish(message, routing_key=routing_key)
+        finally:
+            otel_context.detach(token)
+
+    def _start_batching(self):
+        self._pending = asyncio.Queue()
+        self._unconfirmed = asyncio.Semaphore(self.max_unconfirmed)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _collect_batch(self):
+        batch = [await self._pending.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_batch_delay
+
+        # Пачка больше max_unconfirmed никогда не получила бы разрешения на отправку
+        limit = min(self.max_batch_size, self.max_unconfirmed)
+        while len(batch) < limit and batch[-1] is not None:
+            if not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+                continue
+            # Копить пачку есть смысл, только пока канал занят предыдущими:
+            # на свободном канале ожидание лишь добавило бы задержку
+            timeout = deadline - loop.time()
+            if not self._in_flight or timeout <= 0:
+                break
+            getter = asyncio.ensure_future(self._pending.get())
+            done, _ = await asyncio.wait({getter, *self._in_flight}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                batch.append(getter.result())
+                continue
+            # Отменённый get() не забирает сообщение из очереди
+            getter.cancel()
+            break
+        return batch
+
+    async def _flush_loop(self):
+        while True:
+            batch = await self._collect_batch()
+            # None - сигнал остановки от close()
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                for _ in batch:
+                    await self._unconfirmed.acquire()
+                task = asyncio.create_task(self._publish_batch(batch))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            if stopping:
+                return
+
+    async def _publish_batch(self, batch):
+        # Отправитель, не дождавшийся очереди за publish_timeout, уже получил
+        # отказ и мог повторить запрос: его сообщение не отправляется
+        sending = []
+        for item in batch:
+            if item[-1].cancelled():
+                self._unconfirmed.release()
+            else:
+                sending.append(item)
+        # Все basic.publish пачки уходят в сокет подряд, подтверждения
+        # ждутся вместе: пачка стоит один round trip
+        try:
+            results = await asyncio.gather(
+                *(self._send(message, exchange, routing_key, parent) for message, exchange, routing_key, parent, _ in sending),
+                return_exceptions=True,
+            )
+        finally:
+            for _ in sending:
+                self._unconfirmed.release()
+        for (*_, confirmed), result in zip(sending, results):
+            if confirmed.done():
+                continue
+            if isinstance(result, BaseException):
+                confirmed.set_exception(result)
+            else:
+                confirmed.set_result(None)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._pending.put_nowait(None)
+            await self._flusher
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight, return_exceptions=True)
+            self._flusher = None
+        if self.connection:
+            await self.connection.close()
@@ -0,0 +1,178 @@
+"""
+Синхронный издатель на pika для кода без цикла событий (WSGI-воркеры Django).
+
+Модуль не импортируется из common.messaging, чтобы асинхронным сервисам не
+требовался pika.
+"""
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import pika
+from pika.exceptions import AMQPError
+
+from common.messaging.topology import Topology, default_topology
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhausted(Exception):
+    """Все каналы пула заняты дольше acquire_timeout."""
+
+    def __init__(self, max_size: int, timeout: float):
+        super().__init__(f"Все {max_size} каналов RabbitMQ заняты дольше {timeout:g} с")
+        self.max_size = max_size
+        self.timeout = timeout
+
+
+class PooledChannel:
+    """Долгоживущее соединение с одним каналом и кэшем объявленной топологии."""
+
+    def __init__(self, parameters: pika.ConnectionParameters, topology: Topology):
+        self.connection = pika.BlockingConnection(parameters)
+        self.channel = self.connection.channel()
+        self.topology = topology
+        self.declared_queues = set()
+        self.declared_exchanges = set()
+
+    @property
+    def is_open(self) -> bool:
+        return self.connection.is_open and self.channel.is_open
+
+    def ensure_queue(self, queue_name: str):
+        if queue_name not in self.declared_queues:
+            self.topology.declare_queue_sync(self.channel, queue_name)
+            self.declared_queues.add(queue_name)
+
+    def ensure_exchange(self, exchange: str):
+        if exchange not in self.declared_exchanges:
+            self.topology.declare_exchange_sync(self.channel, exchange)
+            self.declared_queues.update(self.topology.exchange(exchange).queues)
+            self.declared_exchanges.add(exchange)
+
+    def close(self):
+        try:
+            if self.connection.is_open:
+                self.connection.close()
+        except AMQPError:
+            pass
+
+
+class SyncPublisher:
+    """
+    Процессный пул каналов RabbitMQ.
+
+    BlockingConnection не потокобезопасен, поэтому каждый поток берёт канал
+    из пула на время одной публикации. Пул привязан к PID: после fork
+    (gunicorn prefork) дочерний процесс не трогает сокеты родителя, а
+    открывает свои соединения.
+    """
+
+    def __init__(
+        self,
+        parameters: pika.ConnectionParameters,
+        topology: Optional[Topology] = None,
+        max_size: int = 4,
+        acquire_timeout: float = 5.0,
+    ):
+        self.parameters = parameters
+        self.topology = topology or default_topology()
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+    def _acquire(self) -> Optional[PooledChannel]:
+        self._check_pid()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                return None
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise PoolExhausted(self.max_size, self.acquire_timeout) from None
+
+    def _release(self, pooled: Optional[PooledChannel], broken: bool = False):
+        if self._pid != os.getpid():
+            return
+        if broken or pooled is None:
+            if pooled is not None:
+                pooled.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def channel(self):
+        pooled = self._acquire()
+        try:
+            if pooled is None or not pooled.is_open:
+                if pooled is not None:
+                    pooled.close()
+                pooled = PooledChannel(self.parameters, self.topology)
+            yield pooled
+        except BaseException:
+            self._release(pooled, broken=True)
+            raise
+        else:
+            self._release(pooled)
+
+    def publish(self, routing_key: str, body: bytes, properties: Optional[pika.BasicProperties] = None, exchange: str = ""):
+        self.publish_many(routing_key, [(body, properties)], exchange)
+
+    def publish_many(
+        self,
+        routing_key: str,
+        messages: List[Tuple[bytes, Optional[pika.BasicProperties]]],
+        exchange: str = "",
+    ):
+        # Одна повторная попытка: брокер мог закрыть простаивающее соединение.
+        # Пачка целиком уходит через один канал, повтор может продублировать
+        # уже отправленную её часть
+        for attempt in range(2):
+            try:
+                with self.channel() as pooled:
+                    if exchange:
+                        pooled.ensure_exchange(exchange)
+                    else:
+                        pooled.ensure_queue(routing_key)
+                    for body, properties in messages:
+                        pooled.channel.basic_publish(
+                            exchange=exchange,
+                            routing_key=routing_key,
+                            body=body,
+                            properties=properties,
+                        )
+                return
+            except AMQPError:
+                if attempt:
+                    raise
+                logger.warning("Соединение с RabbitMQ потеряно, переподключаюсь...")
+
+    def close(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._release(pooled, broken=True)
@@ -0,0 +1,110 @@
+"""
+Очереди и обменники всех сервисов в одном месте.
+
+orders_queue и orders_q - разные контракты, а не два имени одной очереди:
+в orders_queue order_service публикует созданные заказы (их читает
+телеграм-бот), в orders_q Django-сервис публикует события изменений
+заказов (common.events). Все очереди объявляются durable, сообщения
+публикуются persistent.
+
+orders_q по умолчанию - stream: события не удаляются после чтения, и
+каждый экземпляр read model читает весь поток со своей позиции, а не
+делит сообщения с другими.
+
+Издатель и consumer объявляют очередь по одному описанию, иначе брокер
+ответит PRECONDITION_FAILED на расхождение параметров.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+import aio_pika
+
+from common.queues import queue_arguments_from_env
+
+ORDERS_QUEUE = "orders_queue"
+ORDER_EVENTS_QUEUE = "orders_q"
+RECIPE_EVENTS_QUEUE = "recipes_q"
+RECIPES_EXCHANGE = "recipes"
+
+
+@dataclass(frozen=True)
+class QueueSpec:
+    name: str
+    durable: bool = True
+    arguments: Optional[dict] = field(default=None, hash=False)
+
+    async def declare(self, channel: aio_pika.abc.AbstractChannel) -> aio_pika.abc.AbstractQueue:
+        return await channel.declare_queue(self.name, durable=self.durable, arguments=self.arguments)
+
+    def declare_sync(self, channel):
+        """То же для канала pika."""
+        channel.queue_declare(queue=self.name, durable=self.durable, arguments=self.arguments)
+
+    @property
+    def is_stream(self) -> bool:
+        return (self.arguments or {}).get("x-queue-type") == "stream"
+
+
+@dataclass(frozen=True)
+class ExchangeSpec:
+    name: str
+    type: str
+    # Очереди, привязываемые к обменнику при объявлении
+    queues: Tuple[str, ...] = ()
+    durable: bool = True
+
+
+class Topology:
+    def __init__(self, queues: Iterable[QueueSpec] = (), exchanges: Iterable[ExchangeSpec] = ()):
+        self.queues: Dict[str, QueueSpec] = {queue.name: queue for queue in queues}
+        self.exchanges: Dict[str, ExchangeSpec] = {exchange.name: exchange for exchange in exchanges}
+
+    def queue(self, name: str) -> QueueSpec:
+        # Очереди вне описания (партиции, очереди повторов) - durable без аргументов
+        return self.queues.get(name) or QueueSpec(name)
+
+    def exchange(self, name: str) -> ExchangeSpec:
+        try:
+            return self.exchanges[name]
+        except KeyError:
+            raise ValueError(f"Неизвестный обменник: {name}")
+
+    async def declare_queue(self, channel: aio_pika.abc.AbstractChannel, name: str) -> aio_pika.abc.AbstractQueue:
+        return await self.queue(name).declare(channel)
+
+    async def declare_exchange(self, channel: aio_pika.abc.AbstractChannel, name: str) -> aio_pika.abc.AbstractExchange:
+        spec = self.exchange(name)
+        exchange = await channel.declare_exchange(spec.name, spec.type, durable=spec.durable)
+        for queue_name in spec.queues:
+            queue = await self.declare_queue(channel, queue_name)
+            await queue.bind(exchange)
+        return exchange
+
+    def declare_queue_sync(self, channel, name: str):
+        self.queue(name).declare_sync(channel)
+
+    def declare_exchange_sync(self, channel, name: str):
+        spec = self.exchange(name)
+        channel.exchange_declare(exchange=spec.name, exchange_type=spec.type, durable=spec.durable)
+        for queue_name in spec.queues:
+            self.declare_queue_sync(channel, queue_name)
+            channel.queue_bind(queue=queue_name, exchange=spec.name)
+
+
+def default_topology() -> Topology:
+    """
+    Топология сервисов; тип orders_queue берётся из ORDERS_QUEUE_TYPE,
+    orders_q - из ORDER_EVENTS_QUEUE_TYPE (stream по умолчанию), см. common.queues.
+    """
+    return Topology(
+        queues=[
+            QueueSpec(ORDERS_QUEUE, arguments=queue_arguments_from_env()),
+            QueueSpec(ORDER_EVENTS_QUEUE, arguments=queue_arguments_from_env("ORDER_EVENTS", "stream")),
+            QueueSpec(RECIPE_EVENTS_QUEUE),
+        ],
+        exchanges=[
+            # Каждый экземпляр Django-сервиса привязывает к нему свою временную
+            # очередь для инвалидации кэша (см. recipe.cache)
+            ExchangeSpec(RECIPES_EXCHANGE, "fanout", queues=(RECIPE_EVENTS_QUEUE,)),
+        ],
+    )
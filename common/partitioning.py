@@ -0,0 +1,70 @@
+"""
+Разбиение потока заказов на N очередей-партиций по ключу клиента.
+
+Заказы одного клиента всегда попадают в одну партицию, поэтому при
+последовательной обработке партиции их порядок сохраняется, а пропускная
+способность растёт с числом партиций: каждая очередь живёт на своём ядре
+брокера и обрабатывается своим consumer'ом.
+
+Маршрутизация:
+- modulo - партиция считается на стороне издателя (crc32(key) % N) и
+  передаётся ключом маршрутизации в direct-обменник; работает на любом
+  RabbitMQ, но смена N перемешивает почти все ключи;
+- hash - обменник x-consistent-hash (плагин rabbitmq_consistent_hash_exchange)
+  хэширует ключ сам; при смене N переезжает лишь ~1/N ключей.
+"""
+import zlib
+from typing import List, Optional
+
+import aio_pika
+
+PARTITIONED_EXCHANGE = "orders.partitioned"
+ROUTING_MODES = ("modulo", "hash")
+
+
+class PartitionedTopology:
+    def __init__(
+        self,
+        partitions: int,
+        routing: str = "modulo",
+        queue_prefix: str = "orders_queue",
+        exchange: str = PARTITIONED_EXCHANGE,
+        queue_arguments: Optional[dict] = None,
+    ):
+        if partitions < 1:
+            raise ValueError("Число партиций должно быть положительным")
+        if routing not in ROUTING_MODES:
+            raise ValueError(f"Неизвестный режим маршрутизации: {routing}")
+        self.partitions = partitions
+        self.routing = routing
+        self.queue_prefix = queue_prefix
+        self.exchange = exchange
+        self.queue_arguments = queue_arguments
+
+    def queue_name(self, partition: int) -> str:
+        return f"{self.queue_prefix}.p{partition}"
+
+    def queue_names(self) -> List[str]:
+        return [self.queue_name(partition) for partition in range(self.partitions)]
+
+    def partition_for(self, key: str) -> int:
+        # crc32, а не hash(): значение не зависит от PYTHONHASHSEED и процесса
+        return zlib.crc32(key.encode()) % self.partitions
+
+    def routing_key(self, key: str) -> str:
+        if self.routing == "modulo":
+            return str(self.partition_for(key))
+        return key
+
+    async def declare(self, channel: aio_pika.abc.AbstractChannel) -> aio_pika.abc.AbstractExchange:
+        """Объявляет обменник и очереди партиций; безопасно вызывать из любого сервиса."""
+        exchange = await channel.declare_exchange(
+            self.exchange,
+            aio_pika.ExchangeType.DIRECT if self.routing == "modulo" else "x-consistent-hash",
+            durable=True,
+        )
+        for partition in range(self.partitions):
+            queue = await channel.declare_queue(self.queue_name(partition), durable=True, arguments=self.queue_arguments)
+            # Для consistent-hash ключ привязки - вес партиции в кольце
+            await queue.bind(exchange, routing_key=str(partition) if self.routing == "modulo" else "1")
+        return exchange
@@ -0,0 +1,27 @@
+"""Тип очередей заказов: classic, quorum или stream."""
+import os
+from typing import Optional
+
+QUEUE_TYPES = ("classic", "quorum", "stream")
+
+
+def queue_arguments(queue_type: str = "classic", max_age: Optional[str] = None) -> Optional[dict]:
+    """
+    Аргументы объявления очереди. Тип нельзя поменять у существующей очереди
+    (брокер ответит PRECONDITION_FAILED), поэтому издатель и consumer должны
+    объявлять её одинаково, а смена типа требует пересоздания очереди.
+    """
+    if queue_type not in QUEUE_TYPES:
+        raise ValueError(f"Неизвестный тип очереди: {queue_type}")
+    if queue_type == "classic":
+        return None
+    arguments = {"x-queue-type": queue_type}
+    # Поток не удаляет прочитанные сообщения; хранение ограничивается по возрасту
+    if queue_type == "stream" and max_age:
+        arguments["x-max-age"] = max_age
+    return arguments
+
+
+def queue_arguments_from_env(prefix: str = "ORDERS", default_type: str = "classic") -> Optional[dict]:
+    """Аргументы из <prefix>_QUEUE_TYPE и <prefix>_STREAM_MAX_AGE."""
+    return queue_arguments(os.getenv(f"{prefix}_QUEUE_TYPE", default_type), os.getenv(f"{prefix}_STREAM_MAX_AGE") or None)
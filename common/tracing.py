@@ -0,0 +1,128 @@
+"""
+Трассировка запросов через HTTP и RabbitMQ на OpenTelemetry SDK.
+
+configure_from_env() настраивает TracerProvider с выгрузкой по OTLP/HTTP или
+в файл и включает инструментирование aio-pika и pika: span'ы публикаций и
+контекст W3C `traceparent` в заголовках сообщений создаёт оно. HTTP-запросы
+инструментируют сами сервисы (FastAPI, Django). Здесь остаются только
+span'ы, о которых инструментирование не знает: ожидание в outbox и в
+очереди, для чего продюсеры добавляют заголовок `x-sent-at`.
+
+Пока трассировка не включена, tracer'ы OpenTelemetry ничего не записывают,
+а SDK и инструментирование даже не импортируются.
+"""
+import os
+import time
+from typing import Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.context import Context
+from opentelemetry.trace import SpanKind
+
+TRACEPARENT_HEADER = "traceparent"
+SENT_AT_HEADER = "x-sent-at"
+
+_provider = None
+_tracer = trace.get_tracer(__name__)
+
+
+def _exporter_from_env(kind: str):
+    if kind == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        # JSON Lines: по span'у на строку
+        return ConsoleSpanExporter(
+            out=open(os.getenv("TRACING_FILE", "traces.jsonl"), "a"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        # Адрес коллектора - OTEL_EXPORTER_OTLP_ENDPOINT (по умолчанию http://localhost:4318)
+        return OTLPSpanExporter()
+    return None
+
+
+def configure_from_env(service_name: str) -> bool:
+    """
+    TRACING_EXPORTER: none (по умолчанию), file или otlp;
+    TRACING_FILE - файл для file, OTEL_EXPORTER_OTLP_ENDPOINT - коллектор для otlp.
+    Возвращает True, если трассировка включена.
+    """
+    global _provider
+    exporter = _exporter_from_env(os.getenv("TRACING_EXPORTER", "none"))
+    if exporter is None:
+        return False
+
+    from opentelemetry.instrumentation.aio_pika import AioPikaInstrumentor
+    from opentelemetry.instrumentation.pika import PikaInstrumentor
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    _provider = TracerProvider(resource=Resource.create({SERVICE_NAME: os.getenv("OTEL_SERVICE_NAME", service_name)}))
+    # BatchSpanProcessor выгружает span'ы из фонового потока и перезапускает его после fork
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    AioPikaInstrumentor().instrument()
+    PikaInstrumentor().instrument()
+    return True
+
+
+def flush(timeout: float = 5.0):
+    """Дожидается выгрузки накопленных span'ов, например перед выходом."""
+    if _provider is not None:
+        _provider.force_flush(int(timeout * 1000))
+
+
+def record_span(
+    name: str,
+    start_ns: int,
+    end_ns: Optional[int] = None,
+    parent: Optional[Context] = None,
+    kind: SpanKind = SpanKind.INTERNAL,
+) -> Context:
+    """Span задним числом, например ожидание в очереди; возвращает контекст с ним для inject()."""
+    recorded = _tracer.start_span(name, context=parent, kind=kind, start_time=start_ns)
+    recorded.end(end_time=end_ns)
+    return trace.set_span_in_context(recorded, parent)
+
+
+def inject(headers: dict, context: Optional[Context] = None) -> dict:
+    """Добавляет контекст и время отправки в заголовки сообщения."""
+    propagate.inject(headers, context)
+    if TRACEPARENT_HEADER in headers:
+        headers[SENT_AT_HEADER] = time.time_ns()
+    return headers
+
+
+def extract(headers) -> Optional[Context]:
+    """Контекст из заголовков сообщения; None, если trace в них не передан."""
+    if not headers:
+        return None
+    carrier = {
+        key: value.decode(errors="replace") if isinstance(value, bytes) else value
+        for key, value in headers.items()
+        if isinstance(value, (str, bytes))
+    }
+    context = propagate.extract(carrier)
+    if not trace.get_current_span(context).get_span_context().is_valid:
+        return None
+    return context
+
+
+def message_context(headers) -> Context:
+    """
+    Контекст, в котором публикуется сообщение: записанный в его заголовки
+    (например, в outbox) или текущий. Span публикации aio-pika становится
+    его дочерним, даже если сообщение отправляет другая задача.
+    """
+    return extract(headers) or otel_context.get_current()
+
+
+def sent_at_ns(headers) -> Optional[int]:
+    try:
+        return int((headers or {}).get(SENT_AT_HEADER))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Значения завершившегося воркера остаются в сумме, а его gauge-файлы удаляются
+    multiprocess.mark_process_dead(worker.pid)
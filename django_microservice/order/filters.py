@@ -0,0 +1,46 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from order.models import OrderStatus
+
+# Каждой сортировке соответствует индекс: id - первичный ключ,
+# -created_at - order_status_created_idx (с фильтром по статусу) и
+# order_created_at_idx (без него)
+ORDERINGS = {
+    'id': ('id',),
+    '-created_at': ('-created_at', '-id'),
+}
+
+
+def _parse_datetime(name, value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: ['Ожидается дата и время в формате ISO 8601']})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_orders(queryset, params):
+    """Фильтры ?status=, ?created_after= (включительно) и ?created_before=."""
+    status = params.get('status')
+    if status:
+        if status not in OrderStatus.values:
+            raise ValidationError({'status': [f'Допустимые значения: {", ".join(OrderStatus.values)}']})
+        queryset = queryset.filter(status=status)
+
+    created_after = params.get('created_after')
+    if created_after:
+        queryset = queryset.filter(created_at__gte=_parse_datetime('created_after', created_after))
+    created_before = params.get('created_before')
+    if created_before:
+        queryset = queryset.filter(created_at__lt=_parse_datetime('created_before', created_before))
+    return queryset
+
+
+def get_ordering(params):
+    ordering = params.get('ordering', 'id')
+    if ordering not in ORDERINGS:
+        raise ValidationError({'ordering': [f'Допустимые значения: {", ".join(ORDERINGS)}']})
+    return ORDERINGS[ordering]
@@ -0,0 +1,219 @@
+import datetime
+
+import django.utils.timezone
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+from django.db.migrations.operations.base import Operation
+from django.utils.dateparse import parse_date, parse_datetime
+
+BATCH_SIZE = 5000
+
+
+class PostgresOrElse(Operation):
+    """
+    Операции postgres на PostgreSQL, иначе fallback (SQLite в разработке и
+    тестах). Итоговая схема одинакова, поэтому состояние всегда берётся из
+    fallback.
+    """
+    reversible = False
+
+    def __init__(self, postgres, fallback=()):
+        self.postgres = postgres
+        self.fallback = fallback
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.postgres, self.fallback], {}
+
+    def state_forwards(self, app_label, state):
+        for operation in self.fallback:
+            operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            for operation in self.postgres:
+                operation.database_forwards(app_label, schema_editor, from_state, to_state)
+            return
+        for operation in self.fallback:
+            state = from_state.clone()
+            operation.state_forwards(app_label, state)
+            operation.database_forwards(app_label, schema_editor, from_state, state)
+            from_state = state
+
+    def describe(self):
+        return 'PostgreSQL-специфичные операции с запасным вариантом'
+
+
+# Пока идёт перенос, приложение продолжает писать строковый created_at.
+# Триггер заполняет новую колонку при каждой такой записи, поэтому строки,
+# вставленные после последней пачки, не остаются с NULL и VALIDATE
+# CONSTRAINT не падает. Перенос пачками пишет только created_at_ts и
+# триггер не задевает
+SYNC_TRIGGER_SQL = """
+CREATE FUNCTION "order_order_sync_created_at_ts"() RETURNS trigger AS $$
+BEGIN
+    BEGIN
+        NEW."created_at_ts" := NULLIF(btrim(NEW."created_at"), '')::timestamptz;
+    EXCEPTION WHEN others THEN
+        NEW."created_at_ts" := NULL;
+    END;
+    NEW."created_at_ts" := COALESCE(NEW."created_at_ts", now());
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER "order_order_sync_created_at_ts"
+    BEFORE INSERT OR UPDATE OF "created_at" ON "order_order"
+    FOR EACH ROW EXECUTE FUNCTION "order_order_sync_created_at_ts"();
+"""
+
+DROP_SYNC_TRIGGER_SQL = (
+    'DROP TRIGGER "order_order_sync_created_at_ts" ON "order_order";'
+    'DROP FUNCTION "order_order_sync_created_at_ts"();'
+)
+
+
+def parse_created_at(value, fallback):
+    value = (value or '').strip()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        parsed = datetime.datetime.combine(day, datetime.time()) if day else None
+    if parsed is None:
+        return fallback
+    if django.utils.timezone.is_naive(parsed):
+        parsed = django.utils.timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def convert_batches(queryset, fallback):
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                queryset
+                .filter(id__gt=last_id)
+                .select_for_update()
+                .order_by('id')
+                .only('id', 'created_at')[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for order in batch:
+                order.created_at_ts = parse_created_at(order.created_at, fallback)
+            queryset.model.objects.bulk_update(batch, ['created_at_ts'])
+        last_id = batch[-1].id
+
+
+def convert_created_at(apps, schema_editor):
+    """
+    Переносит строковый created_at в новую колонку пачками по id, каждая пачка
+    в своей короткой транзакции - блокируются только строки текущей пачки.
+    Нераспознанные значения получают время миграции.
+
+    Новые строки заполняет триггер (на PostgreSQL), но строку, вставленную
+    до его создания и закоммиченную после прохода её пачки, пачки пропустят.
+    Поэтому в конце отдельно добираются оставшиеся NULL.
+    """
+    Order = apps.get_model('order', 'Order')
+    fallback = django.utils.timezone.now()
+    convert_batches(Order.objects.all(), fallback)
+    convert_batches(Order.objects.filter(created_at_ts__isnull=True), fallback)
+
+
+class Migration(migrations.Migration):
+    # Перенос данных и CREATE INDEX CONCURRENTLY нельзя выполнять в одной
+    # транзакции на всю таблицу
+    atomic = False
+    # Миграция необратима: строковый created_at удаляется, а нераспознанные
+    # значения заменены временем миграции. Откат - только из резервной копии
+
+    dependencies = [
+        ('order', '0001_initial'),
+    ]
+
+    operations = [
+        # Только choices и default на уровне Django, схема не меняется
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(
+                choices=[
+                    ('created', 'Создан'),
+                    ('processing', 'В обработке'),
+                    ('completed', 'Выполнен'),
+                    ('cancelled', 'Отменён'),
+                ],
+                default='created',
+                verbose_name='Статус',
+            ),
+        ),
+        # Nullable-колонка без default добавляется без перезаписи таблицы
+        migrations.AddField(
+            model_name='order',
+            name='created_at_ts',
+            field=models.DateTimeField(null=True),
+        ),
+        PostgresOrElse(postgres=[migrations.RunSQL(SYNC_TRIGGER_SQL)]),
+        migrations.RunPython(convert_created_at, elidable=True),
+        PostgresOrElse(
+            postgres=[
+                migrations.RunSQL(
+                    DROP_SYNC_TRIGGER_SQL
+                    + 'ALTER TABLE "order_order" DROP COLUMN "created_at";'
+                    'ALTER TABLE "order_order" RENAME COLUMN "created_at_ts" TO "created_at";'
+                ),
+                # SET NOT NULL без полного сканирования под эксклюзивной
+                # блокировкой: сначала проверяем CHECK NOT VALID, которая
+                # держит только SHARE UPDATE EXCLUSIVE
+                migrations.RunSQL(
+                    'ALTER TABLE "order_order" ADD CONSTRAINT "order_created_at_not_null" '
+                    'CHECK ("created_at" IS NOT NULL) NOT VALID;'
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE "order_order" VALIDATE CONSTRAINT "order_created_at_not_null";'
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE "order_order" ALTER COLUMN "created_at" SET NOT NULL;'
+                    'ALTER TABLE "order_order" DROP CONSTRAINT "order_created_at_not_null";'
+                ),
+            ],
+            # Без PostgreSQL - обычные операции Django (SQLite пересоздаёт таблицу)
+            fallback=[
+                migrations.RemoveField(
+                    model_name='order',
+                    name='created_at',
+                ),
+                migrations.RenameField(
+                    model_name='order',
+                    old_name='created_at_ts',
+                    new_name='created_at',
+                ),
+                migrations.AlterField(
+                    model_name='order',
+                    name='created_at',
+                    field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создан'),
+                ),
+            ],
+        ),
+        PostgresOrElse(
+            postgres=[
+                AddIndexConcurrently(
+                    model_name='order',
+                    index=models.Index(fields=['created_at'], name='order_created_at_idx'),
+                ),
+                AddIndexConcurrently(
+                    model_name='order',
+                    index=models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+                ),
+            ],
+            fallback=[
+                migrations.AddIndex(
+                    model_name='order',
+                    index=models.Index(fields=['created_at'], name='order_created_at_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='order',
+                    index=models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_order_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='product_name',
+            field=models.CharField(verbose_name='Название товара'),
+        ),
+    ]
@@ -1,13 +1,29 @@
 from django.db import models
+from django.utils import timezone
 
+from rabbit_mq.events import EventsMixin
 
-class Order(models.Model):
+
+class OrderStatus(models.TextChoices):
+    # Совпадает с OrderStatus в order_service
+    CREATED = 'created', 'Создан'
+    PROCESSING = 'processing', 'В обработке'
+    COMPLETED = 'completed', 'Выполнен'
+    CANCELLED = 'cancelled', 'Отменён'
+
+
+class Order(EventsMixin, models.Model):
     product_name = models.CharField('Название товара')
     quantity = models.IntegerField('Количество')
     customer_name = models.CharField('Имя заказчика')
     customer_email = models.EmailField('Еmail заказчика')
-    status = models.CharField('Статус')
-    created_at = models.CharField('Создан')
+    status = models.CharField('Статус', choices=OrderStatus.choices, default=OrderStatus.CREATED)
+    created_at = models.DateTimeField('Создан', default=timezone.now)
+    # Растёт при каждом изменении; передаётся в событиях, см. common.events
+    version = models.PositiveIntegerField('Версия', default=1)
+
+    events_queue = 'orders_q'
+    events_serializer = 'order.serializers.OrderSerializer'
 
     def __str__(self):
         return f'Order: {self.product_name}'
@@ -15,3 +31,8 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+            # Заказы в статусе, новые сверху; id - для постраничной выдачи по ключу
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+        ]
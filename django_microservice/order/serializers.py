@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from project.serializers import BulkListSerializer
+
 from .models import Order
 
 
@@ -7,3 +9,5 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
+        read_only_fields = ('version',)
+        list_serializer_class = BulkListSerializer
@@ -0,0 +1,313 @@
+import json
+from base64 import urlsafe_b64encode
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from order.models import Order, OrderStatus
+from order.views import OrderAsyncDetailView
+from rabbit_mq.models import OutboxMessage
+
+
+class OrderFastListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        moscow = timezone(timedelta(hours=3))
+        Order.objects.bulk_create([
+            Order(
+                product_name=f'Товар {i} \u2029',
+                quantity=i,
+                customer_name='Иван',
+                customer_email=f'ivan{i}@example.com',
+                status=OrderStatus.values[i % 4],
+                created_at=datetime(2024, 5, 1, 12, 0, i, i * 1000, tzinfo=moscow if i % 2 else timezone.utc),
+            )
+            for i in range(10)
+        ])
+
+    def test_fast_list_is_byte_identical(self):
+        client = APIClient()
+        for url in ('/order', '/order?limit=3', '/order?ordering=-created_at&status=created'):
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = client.get(url)
+            actual = client.get(url)
+            self.assertEqual(actual.status_code, 200)
+            self.assertEqual(actual.content, expected.content)
+            self.assertEqual(actual['Content-Type'], expected['Content-Type'])
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class OrderPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        created_at = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        # Одинаковое время у соседних заказов: порядок внутри него держит id
+        Order.objects.bulk_create([
+            Order(
+                product_name=f'Товар {i}', quantity=1, customer_name='Иван', customer_email='ivan@example.com',
+                created_at=created_at + timedelta(seconds=i // 2),
+            )
+            for i in range(7)
+        ])
+
+    def walk(self, url):
+        client = APIClient()
+        ids = []
+        while url:
+            data = client.get(url).json()
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids
+
+    def test_pages_cover_every_row_once(self):
+        by_id = list(Order.objects.order_by('id').values_list('id', flat=True))
+        newest_first = list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        self.assertEqual(self.walk('/order?limit=3'), by_id)
+        self.assertEqual(self.walk('/order?limit=2&ordering=-created_at'), newest_first)
+        self.assertEqual(self.walk('/async/order?limit=3'), by_id)
+
+    def test_invalid_cursor_is_404(self):
+        client = APIClient()
+        for values in (['abc'], 'x', {'a': 1}, 1, [1, 2]):
+            cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+            for url in (f'/order?cursor={cursor}', f'/recipe?cursor={cursor}', f'/async/order?cursor={cursor}'):
+                with self.subTest(url=url, values=values):
+                    self.assertEqual(client.get(url).status_code, 404)
+        self.assertEqual(client.get('/order?cursor=not-base64!').status_code, 404)
+
+
+class OrderFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        Order.objects.bulk_create([
+            Order(
+                product_name=f'Товар {i}', quantity=1, customer_name='Иван', customer_email='ivan@example.com',
+                status=OrderStatus.values[i % 2], created_at=start + timedelta(days=i),
+            )
+            for i in range(6)
+        ])
+
+    def ids(self, query):
+        response = APIClient().get(f'/order?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [Order.objects.get(id=item['id']).product_name for item in response.json()['results']]
+
+    def test_filters_and_orderings(self):
+        self.assertEqual(self.ids('status=processing'), ['Товар 1', 'Товар 3', 'Товар 5'])
+        # created_after включительно, created_before - нет; наивное время - UTC
+        self.assertEqual(self.ids('created_after=2024-05-02T00:00:00&created_before=2024-05-04T00:00:00Z'), ['Товар 1', 'Товар 2'])
+        self.assertEqual(self.ids('created_after=2024-05-02T03:00:00%2B03:00'), [f'Товар {i}' for i in range(1, 6)])
+        self.assertEqual(self.ids('ordering=-created_at&status=created'), ['Товар 4', 'Товар 2', 'Товар 0'])
+        self.assertEqual(self.ids('ordering=id'), [f'Товар {i}' for i in range(6)])
+
+    def test_invalid_filters_are_400(self):
+        client = APIClient()
+        for query, field in (('status=lost', 'status'), ('created_after=вчера', 'created_after'),
+                             ('created_before=2024-13-01', 'created_before'), ('ordering=price', 'ordering')):
+            with self.subTest(query=query):
+                response = client.get(f'/order?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(field, response.json())
+
+    def test_next_page_bounds_leading_sort_column(self):
+        first = APIClient().get('/order?ordering=-created_at&limit=2').json()
+        with CaptureQueriesContext(connection) as queries:
+            APIClient().get(first['next'])
+
+        # Граница created_at <= x отдельным условием, а не только внутри OR
+        sql = queries[-1]['sql']
+        self.assertRegex(sql, r'AND "order_order"\."created_at" <= ')
+
+
+ORDER_PAYLOAD = {'product_name': 'Чай', 'quantity': 1, 'customer_name': 'Иван', 'customer_email': 'ivan@example.com'}
+
+
+@override_settings(RABBITMQ_OUTBOX=True)
+class OrderBulkTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_bulk_create_and_update_in_one_batch(self):
+        with self.assertNumQueries(4):
+            # SAVEPOINT, INSERT заказов, INSERT событий, RELEASE
+            created = self.client.post('/order/bulk', [dict(ORDER_PAYLOAD, quantity=i) for i in range(1, 4)], format='json')
+        self.assertEqual(created.status_code, 201)
+        ids = [item['id'] for item in created.json()]
+
+        updated = self.client.put('/order/bulk', [{'id': pk, 'status': 'completed'} for pk in ids[:2]], format='json')
+
+        self.assertEqual(updated.status_code, 202)
+        self.assertEqual(
+            list(Order.objects.order_by('id').values_list('status', 'version')),
+            [('completed', 2), ('completed', 2), ('created', 1)],
+        )
+        self.assertEqual(OutboxMessage.objects.count(), 5)
+
+    def test_bulk_update_rejects_unknown_or_missing_ids(self):
+        order = Order.objects.create(**ORDER_PAYLOAD)
+        events = OutboxMessage.objects.count()
+        response = self.client.put('/order/bulk', [{'id': order.id, 'quantity': 5}, {'id': 0}, {'quantity': 1}], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual(order.quantity, 1)
+        self.assertEqual(OutboxMessage.objects.count(), events)
+
+    def test_bulk_update_rejects_duplicate_ids(self):
+        order = Order.objects.create(**ORDER_PAYLOAD)
+        events = OutboxMessage.objects.count()
+        response = self.client.put('/order/bulk', [{'id': order.id, 'quantity': 5}, {'id': order.id, 'quantity': 7}], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        order.refresh_from_db()
+        self.assertEqual((order.quantity, order.version), (1, 1))
+        self.assertEqual(OutboxMessage.objects.count(), events)
+
+    @mock.patch('order.views.BULK_MAX_ITEMS', 2)
+    def test_bulk_size_is_limited(self):
+        response = self.client.post('/order/bulk', [ORDER_PAYLOAD] * 3, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_missing_order_is_404(self):
+        for pk in (999, 'abc'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.put(f'/order/{pk}', {'quantity': 2}, format='json').status_code, 404)
+                self.assertEqual(self.client.delete(f'/order/{pk}').status_code, 404)
+
+
+@override_settings(RABBITMQ_OUTBOX=True)
+class OrderEventTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def events(self):
+        return [message.body for message in OutboxMessage.objects.order_by('id')]
+
+    def test_change_events_carry_type_version_and_changed_fields(self):
+        created = self.client.post('/order', {
+            'product_name': 'Чай', 'quantity': 1, 'customer_name': 'Иван', 'customer_email': 'ivan@example.com',
+        }, format='json').json()
+        order_id = created['id']
+        self.client.put(f'/order/{order_id}', {'quantity': 3, 'product_name': 'Чай'}, format='json')
+        self.client.put('/order/bulk', [{'id': order_id, 'status': 'completed'}], format='json')
+        self.client.delete(f'/order/{order_id}')
+
+        created_event, updated_event, bulk_event, deleted_event = self.events()
+        self.assertEqual(
+            [(e['type'], e['entity'], e['id'], e['version']) for e in self.events()],
+            [('created', 'order', order_id, 1), ('updated', 'order', order_id, 2),
+             ('updated', 'order', order_id, 3), ('deleted', 'order', order_id, 4)],
+        )
+        self.assertEqual(created_event['data'], created)
+        self.assertEqual(updated_event['data'], {'quantity': 3})
+        self.assertEqual(bulk_event['data'], {'status': 'completed'})
+        self.assertNotIn('data', deleted_event)
+
+    def test_orm_changes_bump_version_and_emit_events(self):
+        # Как в админке: изменения в обход API
+        order = Order.objects.create(product_name='Чай', quantity=1, customer_name='Иван', customer_email='ivan@example.com')
+        order.quantity = 2
+        order.save()
+        order.status = 'completed'
+        order.customer_name = 'Пётр'
+        order.save(update_fields=['status'])
+        other = Order.objects.create(product_name='Кофе', quantity=1, customer_name='Иван', customer_email='ivan@example.com')
+        Order.objects.filter(id=other.id).delete()
+
+        order.refresh_from_db()
+        self.assertEqual((order.version, order.status, order.customer_name), (3, 'completed', 'Иван'))
+        self.assertEqual(
+            [(e['type'], e['id'], e['version'], e.get('data')) for e in self.events()][1:],
+            [('updated', order.id, 2, {'quantity': 2}), ('updated', order.id, 3, {'status': 'completed'}),
+             ('created', other.id, 1, mock.ANY), ('deleted', other.id, 2, None)],
+        )
+
+    def test_version_is_read_only(self):
+        order = Order.objects.create(product_name='Чай', quantity=1, customer_name='Иван', customer_email='ivan@example.com')
+        response = self.client.put(f'/order/{order.id}', {'version': 100}, format='json')
+        self.assertEqual(response.json()['version'], 2)
+
+
+class OrderAsyncViewTests(TestCase):
+    def setUp(self):
+        self.client = AsyncClient()
+        self.publisher = mock.AsyncMock()
+        patch = mock.patch('project.async_views.get_async_publisher', mock.AsyncMock(return_value=self.publisher))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    async def check_crud(self):
+        created = await self.client.post('/async/order', ORDER_PAYLOAD, content_type='application/json')
+        self.assertEqual(created.status_code, 201)
+        order_id = created.json()['id']
+
+        listed = await self.client.get('/async/order')
+        self.assertEqual([item['id'] for item in listed.json()['results']], [order_id])
+
+        updated = await self.client.put(f'/async/order/{order_id}', {'quantity': 3}, content_type='application/json')
+        self.assertEqual(updated.status_code, 202)
+        self.assertEqual((updated.json()['quantity'], updated.json()['version']), (3, 2))
+
+        deleted = await self.client.delete(f'/async/order/{order_id}')
+        self.assertEqual(deleted.status_code, 204)
+        self.assertFalse(await Order.objects.filter(id=order_id).aexists())
+
+    @override_settings(RABBITMQ_OUTBOX=True)
+    async def test_crud_with_outbox(self):
+        await self.check_crud()
+
+        events = [message.body async for message in OutboxMessage.objects.order_by('id')]
+        self.assertEqual([(e['type'], e['version']) for e in events], [('created', 1), ('updated', 2), ('deleted', 3)])
+        self.publisher.publish_json.assert_not_awaited()
+
+    @override_settings(RABBITMQ_OUTBOX=False)
+    async def test_crud_publishes_directly_without_outbox(self):
+        await self.check_crud()
+
+        events = [call.args[1] for call in self.publisher.publish_json.await_args_list]
+        self.assertEqual([(e['type'], e['version']) for e in events], [('created', 1), ('updated', 2), ('deleted', 3)])
+
+    @override_settings(RABBITMQ_OUTBOX=False)
+    async def test_update_without_outbox_uses_locked_row(self):
+        order = await Order.objects.acreate(**ORDER_PAYLOAD)
+        get_object = OrderAsyncDetailView._get_object
+
+        async def changed_after_read(view, pk):
+            # Параллельный запрос меняет заказ между чтением и записью
+            instance = await get_object(view, pk)
+            await Order.objects.filter(id=pk).aupdate(customer_name='Пётр', version=2)
+            return instance
+
+        with mock.patch.object(OrderAsyncDetailView, '_get_object', changed_after_read):
+            updated = await self.client.put(f'/async/order/{order.id}', {'quantity': 3}, content_type='application/json')
+            deleted = await self.client.delete(f'/async/order/{order.id}')
+
+        self.assertEqual(updated.status_code, 202)
+        self.assertEqual((updated.json()['customer_name'], updated.json()['version']), ('Пётр', 3))
+        self.assertEqual(deleted.status_code, 204)
+        events = [call.args[1] for call in self.publisher.publish_json.await_args_list]
+        self.assertEqual([(e['type'], e['version']) for e in events], [('updated', 3), ('deleted', 3)])
+        self.assertEqual(events[0]['data'], {'quantity': 3})
+
+    async def test_errors(self):
+        for method, url in (('post', '/async/order'), ('put', '/async/order/1')):
+            if method == 'put':
+                await Order.objects.acreate(id=1, **ORDER_PAYLOAD)
+            with self.subTest(method=method):
+                response = await getattr(self.client, method)(url, b'{not json', content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+        invalid = await self.client.post('/async/order', {'quantity': 'много'}, content_type='application/json')
+        self.assertEqual(invalid.status_code, 400)
+        self.assertIn('quantity', invalid.json())
+        for pk in (999, 'abc'):
+            self.assertEqual((await self.client.put(f'/async/order/{pk}', {}, content_type='application/json')).status_code, 404)
+            self.assertEqual((await self.client.delete(f'/async/order/{pk}')).status_code, 404)
@@ -1,34 +1,91 @@
+from django.db import transaction
 from rest_framework import viewsets, status
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from rabbit_mq.rabbit_mq_provider import publish
+from project.async_views import AsyncDetailView, AsyncListView
+from project.fast_serializers import RowSerializer, json_response, use_fast_path
+from project.pagination import KeysetPagination, stream_ndjson
+from project.serializers import BULK_MAX_ITEMS, BulkListSerializer
+from rabbit_mq.events import created_event, updated_event
+from rabbit_mq.outbox import enqueue_many
+from order.filters import filter_orders, get_ordering
 from order.models import Order
 from order.serializers import OrderSerializer
 
 
+ORDER_ROWS = RowSerializer(OrderSerializer)
+
+
 class OrderView(viewsets.ViewSet):
     def list(self, request):
-        orders = Order.objects.all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        ordering = get_ordering(request.query_params)
+        orders = filter_orders(Order.objects.all(), request.query_params)
+        if request.query_params.get('stream') == 'ndjson':
+            return stream_ndjson(orders.order_by(*ordering), OrderSerializer)
+
+        paginator = KeysetPagination(ordering)
+        if use_fast_path(request):
+            page = paginator.paginate_queryset(orders.values(*ORDER_ROWS.value_names), request)
+            return json_response(paginator.get_paginated_data(ORDER_ROWS.many(page)))
+
+        page = paginator.paginate_queryset(orders, request)
+        serializer = OrderSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def create(self, request):
         serializer = OrderSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        # Событие ставит в очередь сама модель, см. rabbit_mq.events.EventsMixin
         serializer.save()
-        publish('orders_q', serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def update(self, request, pk=None):
-        recipe = Order.objects.get(id=pk)
-        serializer = OrderSerializer(instance=recipe, data=request.data, partial=True)
+    def bulk_create(self, request):
+        serializer = OrderSerializer(data=request.data, many=True, max_length=BULK_MAX_ITEMS)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        publish('orders_q', serializer.data)
+        with transaction.atomic():
+            serializer.save()
+            # bulk_create не вызывает save(), события пачки ставятся здесь
+            enqueue_many(Order.events_queue, [created_event(Order, data) for data in serializer.data])
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        ids = BulkListSerializer.collect_ids(request.data)
+        with transaction.atomic():
+            instances = Order.objects.select_for_update().in_bulk(ids)
+            serializer = OrderSerializer(instance=instances, data=request.data, many=True, partial=True, max_length=BULK_MAX_ITEMS)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            enqueue_many(Order.events_queue, [
+                updated_event(Order, data, changed) for data, changed in zip(serializer.data, serializer.changed)
+            ])
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    def update(self, request, pk=None):
+        with transaction.atomic():
+            order = get_object_or_404(Order.objects.select_for_update(), id=pk)
+            serializer = OrderSerializer(instance=order, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
     def destroy(self, request, pk=None):
-        recipe = Order.objects.get(id=pk)
-        recipe.delete()
-        publish('orders_q', {'id': 'pk'})
+        with transaction.atomic():
+            get_object_or_404(Order.objects.select_for_update(), id=pk).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class OrderAsyncListView(AsyncListView):
+    model = Order
+    serializer_class = OrderSerializer
+
+    def get_queryset(self, request):
+        return filter_orders(Order.objects.all(), request.GET)
+
+    def get_ordering(self, request):
+        return get_ordering(request.GET)
+
+
+class OrderAsyncDetailView(AsyncDetailView):
+    model = Order
+    serializer_class = OrderSerializer
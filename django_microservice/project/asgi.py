@@ -11,6 +11,13 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from common import tracing
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+# Middleware инструментирования добавляется в settings.MIDDLEWARE, поэтому до создания приложения
+if tracing.configure_from_env("django_microservice"):
+    from opentelemetry.instrumentation.django import DjangoInstrumentor
+
+    DjangoInstrumentor().instrument()
 
 application = get_asgi_application()
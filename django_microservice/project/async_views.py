@@ -0,0 +1,131 @@
+import json
+from contextlib import nullcontext
+from typing import Dict, List
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.utils import encoders
+
+from project.pagination import KeysetPagination
+from rabbit_mq.aio_publisher import get_async_publisher
+from rabbit_mq.events import collect_events
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        safe=False,
+        encoder=encoders.JSONEncoder,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncModelView(View):
+    """
+    Асинхронный вариант ViewSet'ов для запуска под ASGI.
+
+    Чтение идёт через асинхронный ORM, а события публикуются издателем
+    aio-pika, общим для цикла событий, так что запрос не занимает поток на
+    время общения с брокером. Запись блокирует строку в транзакции, а с
+    включённым outbox сохраняет в ней и событие; Django не умеет асинхронные
+    транзакции, поэтому этот шаг выполняется через sync_to_async.
+    """
+    model = None
+    serializer_class = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status=404)
+        except APIException as e:
+            return json_response(e.detail if isinstance(e.detail, (dict, list)) else {'detail': e.detail}, status=e.status_code)
+
+    @staticmethod
+    def _load_body(request):
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise ParseError('JSON parse error')
+
+    async def _get_object(self, pk):
+        try:
+            return await self.model.objects.aget(id=pk)
+        except (self.model.DoesNotExist, ValueError):
+            raise Http404
+
+    def _save_locked(self, serializer, delete=None) -> List[Dict]:
+        """
+        Сохраняет или удаляет объект в транзакции. Изменяемая строка
+        блокируется, так что версия и данные ответа берутся из неё, а не из
+        прочитанного до блокировки объекта. Событие ставит модель (см.
+        rabbit_mq.events.EventsMixin); без outbox оно возвращается, чтобы
+        опубликовать его асинхронным издателем после коммита.
+        """
+        with collect_events() if not settings.RABBITMQ_OUTBOX else nullcontext([]) as events, transaction.atomic():
+            if delete is not None:
+                self._lock(delete.pk).delete()
+            elif serializer.instance is None:
+                serializer.save()
+            else:
+                serializer.instance = self._lock(serializer.instance.pk)
+                serializer.save()
+        return events
+
+    def _lock(self, pk):
+        try:
+            return self.model.objects.select_for_update().get(pk=pk)
+        except self.model.DoesNotExist:
+            # Удалён параллельным запросом
+            raise Http404
+
+    async def _save_and_publish(self, serializer, delete=None):
+        events = await sync_to_async(self._save_locked)(serializer, delete=delete)
+        if events:
+            publisher = await get_async_publisher()
+            for body in events:
+                await publisher.publish_json(self.model.events_queue, body, self.model.events_exchange)
+
+
+class AsyncListView(AsyncModelView):
+    # Сериализатор выдачи списка, если он отличается от сериализатора записи
+    read_serializer_class = None
+
+    def get_queryset(self, request):
+        return self.model.objects.all()
+
+    def get_ordering(self, request):
+        return ('id',)
+
+    async def get(self, request):
+        paginator = KeysetPagination(self.get_ordering(request))
+        page = await paginator.apaginate_queryset(self.get_queryset(request), request)
+        data = (self.read_serializer_class or self.serializer_class)(page, many=True).data
+        return json_response(paginator.get_paginated_data(data))
+
+    async def post(self, request):
+        serializer = self.serializer_class(data=self._load_body(request))
+        serializer.is_valid(raise_exception=True)
+        await self._save_and_publish(serializer)
+        return json_response(serializer.data, status=201)
+
+
+class AsyncDetailView(AsyncModelView):
+    async def put(self, request, pk):
+        instance = await self._get_object(pk)
+        serializer = self.serializer_class(instance=instance, data=self._load_body(request), partial=True)
+        serializer.is_valid(raise_exception=True)
+        await self._save_and_publish(serializer)
+        return json_response(serializer.data, status=202)
+
+    async def delete(self, request, pk):
+        await self._save_and_publish(None, delete=await self._get_object(pk))
+        return HttpResponse(status=204)
@@ -0,0 +1,176 @@
+import decimal
+import json
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+# Поля, которые отдают значение из базы как есть
+IDENTITY_FIELDS = (
+    drf_fields.IntegerField,
+    drf_fields.CharField,
+    drf_fields.BooleanField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+def _bigint_converter(field: drf_fields.BigIntegerField) -> Optional[Callable]:
+    if getattr(field, 'coerce_to_string', api_settings.COERCE_BIGINT_TO_STRING):
+        return str
+    return None
+
+
+def _decimal_converter(field: drf_fields.DecimalField) -> Callable:
+    if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) or field.localize:
+        return field.to_representation
+    if field.decimal_places is None:
+        return lambda value: format(value, 'f')
+
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        return format(value.quantize(quantum, rounding=rounding, context=context), 'f')
+
+    return convert
+
+
+def _datetime_converter(field: drf_fields.DateTimeField) -> Callable[[], Callable]:
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != drf_fields.ISO_8601:
+        return lambda: field.to_representation
+
+    def bind():
+        # Часовой пояс может быть активирован на запрос, поэтому он берётся
+        # на каждый вызов many(), а не на каждую строку
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.utcoffset() is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+
+        return convert
+
+    return bind
+
+
+def _choice_converter(field: drf_fields.ChoiceField) -> Callable:
+    choices = field.choice_strings_to_values
+    return lambda value: choices.get(str(value), value)
+
+
+class RowSerializer:
+    """
+    Быстрая read-only сериализация строк .values() по полям ModelSerializer.
+
+    Для каждого поля сериализатора заранее выбирается преобразование
+    значения из базы (Decimal - в строку с нужным числом знаков, datetime - в
+    ISO 8601 как у DRF, целые и строки - как есть), поэтому не создаются ни
+    экземпляры моделей, ни BoundField'ы DRF, а результат совпадает с
+    serializer.data. Вложенные many=True сериализаторы ожидают в строке
+    готовый список строк под своим source.
+    """
+
+    def __init__(self, serializer_class):
+        self.fields = []
+        self.nested: Dict[str, RowSerializer] = {}
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if '.' in field.source or field.source == '*':
+                raise ValueError(f'Поле {name} не поддерживается быстрой сериализацией')
+            self.fields.append((name, field.source, self._converter_factory(field)))
+
+    def _converter_factory(self, field) -> Callable[[], Optional[Callable]]:
+        if isinstance(field, drf_fields.DateTimeField):
+            return _datetime_converter(field)
+        converter = self._converter(field)
+        return lambda: converter
+
+    def _converter(self, field) -> Optional[Callable]:
+        if isinstance(field, serializers.ListSerializer):
+            nested = self.nested[field.source] = RowSerializer(type(field.child))
+            return nested.many
+        if isinstance(field, serializers.BaseSerializer) or isinstance(field, drf_fields.SerializerMethodField):
+            raise ValueError(f'Поле {field.field_name} не поддерживается быстрой сериализацией')
+        if isinstance(field, drf_fields.ChoiceField):
+            return _choice_converter(field)
+        if isinstance(field, drf_fields.DecimalField):
+            return _decimal_converter(field)
+        if isinstance(field, drf_fields.BigIntegerField):
+            return _bigint_converter(field)
+        if type(field) in IDENTITY_FIELDS or isinstance(field, drf_fields.CharField):
+            return None
+        return field.to_representation
+
+    @property
+    def value_names(self) -> List[str]:
+        """Аргументы для .values(): всё, кроме вложенных списков."""
+        return [source for _, source, _ in self.fields if source not in self.nested]
+
+    def _bind(self):
+        return [(name, source, factory()) for name, source, factory in self.fields]
+
+    @staticmethod
+    def _convert(fields, row: dict) -> dict:
+        data = {}
+        for name, source, convert in fields:
+            value = row[source]
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def to_representation(self, row: dict) -> dict:
+        return self._convert(self._bind(), row)
+
+    def many(self, rows) -> list:
+        fields = self._bind()
+        convert = self._convert
+        return [convert(fields, row) for row in rows]
+
+
+_encode = json.JSONEncoder(
+    ensure_ascii=JSONRenderer.ensure_ascii,
+    allow_nan=not JSONRenderer.strict,
+    separators=(',', ':') if JSONRenderer.compact else (', ', ': '),
+).encode
+
+
+def render_json(data) -> bytes:
+    """
+    То же, что JSONRenderer().render(data), для данных из RowSerializer:
+    в них только str/int/bool/None, поэтому encoder DRF с его default()
+    не нужен.
+    """
+    return _encode(data).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+def json_response(data) -> HttpResponse:
+    return HttpResponse(render_json(data), content_type=JSONRenderer.media_type)
+
+
+def use_fast_path(request) -> bool:
+    """Быстрый путь только для обычного JSON: без browsable API и ?indent."""
+    return settings.FAST_LIST_SERIALIZATION and renders_plain_json(request)
+
+
+def renders_plain_json(request) -> bool:
+    """DRF выбрал для ответа стандартный JSONRenderer без отступов."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return (
+        isinstance(renderer, JSONRenderer)
+        and type(renderer).render is JSONRenderer.render
+        and 'indent' not in (getattr(request, 'accepted_media_type', None) or '')
+    )
@@ -0,0 +1,146 @@
+import datetime
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Sequence
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает время до миллисекунд, а курсор должен
+    # совпадать со значением в базе точно, иначе строки пропустятся
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination:
+    """
+    Постраничная выдача по ключу: следующая страница начинается строго после
+    последней строки предыдущей (WHERE (a, b) > (...) ORDER BY a, b LIMIT n),
+    поэтому запрос идёт по индексу и не зависит от глубины страницы, в
+    отличие от OFFSET. Курсор - значения полей сортировки последней строки.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 100
+    max_limit = 1000
+
+    def __init__(self, ordering: Sequence[str] = ('id',)):
+        self.ordering = tuple(ordering)
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(self._query_params(request).get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, instance) -> str:
+        # Строка страницы - объект модели или словарь из .values()
+        if isinstance(instance, dict):
+            values = [instance[name] for name, _ in self._fields()]
+        else:
+            values = [getattr(instance, name) for name, _ in self._fields()]
+        return urlsafe_b64encode(json.dumps(values, cls=CursorEncoder).encode()).decode()
+
+    def decode_cursor(self, queryset, cursor: str):
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            fields = self._fields()
+            # Корректный base64 и JSON ещё не курсор: строка, объект или
+            # значения не того типа - такая же ошибка клиента
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                queryset.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(fields, values)
+            ]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound('Invalid cursor')
+
+    def _after(self, values) -> Q:
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), с учётом направления
+        fields = self._fields()
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(fields, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        if len(fields) > 1:
+            # Из OR PostgreSQL не выводит границу диапазона индекса и читает
+            # его с начала на каждой странице; избыточное a >= x (a <= x для
+            # убывания) даёт её
+            name, descending = fields[0]
+            condition &= Q(**{f'{name}__{"lte" if descending else "gte"}': values[0]})
+        return condition
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self._query_params(request).get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(queryset, cursor)))
+
+        # Лишняя строка показывает, есть ли следующая страница, без COUNT(*)
+        return queryset[:self.limit + 1]
+
+    def _finish_page(self, rows):
+        self.has_next = len(rows) > self.limit
+        page = rows[:self.limit]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    @staticmethod
+    def _query_params(request):
+        # DRF Request или обычный HttpRequest асинхронных view
+        return getattr(request, 'query_params', request.GET)
+
+    def paginate_queryset(self, queryset, request):
+        return self._finish_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self._finish_page([row async for row in self._page_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+def stream_ndjson(queryset, serializer_class, chunk_size: int = 2000) -> StreamingHttpResponse:
+    """
+    Отдаёт queryset построчно в формате NDJSON: строки читаются серверным
+    курсором пачками по chunk_size и сериализуются по одной, так что память
+    не растёт с размером таблицы.
+    """
+    def rows():
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            data = serializer_class(instance).data
+            yield json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
@@ -0,0 +1,83 @@
+from rest_framework import serializers
+
+# Предел размера пачки для POST/PUT .../bulk
+BULK_MAX_ITEMS = 5000
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer, сохраняющий всю пачку одним bulk_create/bulk_update
+    вместо INSERT/UPDATE на каждый объект.
+
+    Для обновления instance - словарь {pk: объект} (например, из in_bulk),
+    а каждый элемент данных должен содержать id.
+    """
+    batch_size = 1000
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            instance = self.instance.get(self._pk(data))
+            if instance is None:
+                raise serializers.ValidationError({'id': 'Объект не найден'})
+            self.child.instance = instance
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            # Повторный id обновился бы дважды с одной и той же версией,
+            # и потребители отбросили бы второе событие как дубликат
+            ids = [self._pk(data) for data in self.initial_data]
+            if len(set(ids)) != len(ids):
+                raise serializers.ValidationError('id в пачке не должны повторяться')
+        return super().validate(attrs)
+
+    @staticmethod
+    def _pk(data):
+        try:
+            return int(data['id'])
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError({'id': 'Обязательное поле'})
+
+    @classmethod
+    def collect_ids(cls, data):
+        """id объектов из входных данных для выборки instance через in_bulk."""
+        if not isinstance(data, list):
+            return []
+        ids = []
+        for item in data:
+            try:
+                ids.append(cls._pk(item))
+            except serializers.ValidationError:
+                pass
+        return ids
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.objects.bulk_create(
+            [model(**attrs) for attrs in validated_data],
+            batch_size=self.batch_size,
+        )
+
+    def update(self, instance, validated_data):
+        model = self.child.Meta.model
+        # Строки заблокированы select_for_update, поэтому версию можно
+        # увеличить на стороне Python
+        versioned = any(field.name == 'version' for field in model._meta.concrete_fields)
+        objects = []
+        fields = set()
+        # Изменившиеся поля каждого объекта, для событий updated
+        self.changed = []
+        for data, attrs in zip(self.initial_data, validated_data):
+            obj = instance[self._pk(data)]
+            self.changed.append([name for name, value in attrs.items() if getattr(obj, name) != value])
+            for name, value in attrs.items():
+                setattr(obj, name, value)
+            fields.update(attrs)
+            if versioned:
+                obj.version += 1
+                fields.add('version')
+            objects.append(obj)
+        if fields:
+            model.objects.bulk_update(objects, fields, batch_size=self.batch_size)
+        return objects
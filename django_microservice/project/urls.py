@@ -2,19 +2,26 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 
-from recipe.views import RecipeView
-from order.views import OrderView
+from recipe.views import RecipeAsyncDetailView, RecipeAsyncListView, RecipeView
+from order.views import OrderAsyncDetailView, OrderAsyncListView, OrderView
 
 from . import settings
+from .views import metrics
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics),
     path('recipe', RecipeView.as_view({
         'get': 'list',
         'post': 'create'
     })),
+    path('recipe/bulk', RecipeView.as_view({
+        'post': 'bulk_create',
+        'put': 'bulk_update'
+    })),
     path('recipe/<str:pk>', RecipeView.as_view({
+        'get': 'retrieve',
         'put': 'update',
         'delete': 'destroy'
     })),
@@ -22,10 +29,20 @@ urlpatterns = [
         'get': 'list',
         'post': 'create'
     })),
+    path('order/bulk', OrderView.as_view({
+        'post': 'bulk_create',
+        'put': 'bulk_update'
+    })),
     path('order/<str:pk>', OrderView.as_view({
         'put': 'update',
         'delete': 'destroy'
     })),
+
+    # Асинхронные варианты для запуска под ASGI (uvicorn project.asgi:application)
+    path('async/recipe', RecipeAsyncListView.as_view()),
+    path('async/recipe/<str:pk>', RecipeAsyncDetailView.as_view()),
+    path('async/order', OrderAsyncListView.as_view()),
+    path('async/order/<str:pk>', OrderAsyncDetailView.as_view()),
 ]
 
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
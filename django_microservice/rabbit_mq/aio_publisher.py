@@ -0,0 +1,25 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+
+from common.messaging import AsyncPublisher
+from rabbit_mq.topology import TOPOLOGY
+
+# Соединение aio-pika привязано к циклу событий, поэтому издатель свой
+# для каждого цикла. Под ASGI цикл один на процесс, и все запросы делят
+# одно соединение и канал
+_publishers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+
+
+async def get_async_publisher() -> AsyncPublisher:
+    loop = asyncio.get_running_loop()
+    connecting = _publishers.get(loop)
+    if connecting is None or (connecting.done() and connecting.exception() is not None):
+        async def connect():
+            publisher = AsyncPublisher(TOPOLOGY)
+            await publisher.connect(settings.RABBITMQ_URL)
+            return publisher
+
+        connecting = _publishers[loop] = loop.create_task(connect())
+    return await asyncio.shield(connecting)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class RabbitMqConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "rabbit_mq"
+
+    def ready(self):
+        from rabbit_mq import signals  # noqa: F401
@@ -0,0 +1,93 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from common.events import CREATED, DELETED, UPDATED, make_event
+from rabbit_mq.outbox import enqueue
+
+# Список, в который собираются события вместо постановки в очередь, см. collect_events()
+_collected: ContextVar[Optional[List[Dict]]] = ContextVar('collected_events', default=None)
+
+
+def entity_name(model) -> str:
+    return model._meta.model_name
+
+
+def created_event(model, data: Dict) -> Dict:
+    return make_event(CREATED, entity_name(model), data['id'], data['version'], data)
+
+
+def updated_event(model, data: Dict, changed: Iterable[str]) -> Dict:
+    return make_event(
+        UPDATED, entity_name(model), data['id'], data['version'],
+        {name: data[name] for name in changed if name in data},
+    )
+
+
+def deleted_event(model, pk, version: int) -> Dict:
+    return make_event(DELETED, entity_name(model), pk, version)
+
+
+@contextmanager
+def collect_events():
+    """
+    События моделей, сохранённых внутри блока, не ставятся в очередь, а
+    собираются в список: их публикует вызывающий, например асинхронным издателем.
+    """
+    events = []
+    token = _collected.set(events)
+    try:
+        yield events
+    finally:
+        _collected.reset(token)
+
+
+class EventsMixin:
+    """
+    Версия и событие для любого изменения модели: через API, админку или ORM.
+
+    save() блокирует строку, увеличивает version и ставит событие created или
+    updated в ту же транзакцию (см. rabbit_mq.outbox.enqueue). Удаление, в том
+    числе QuerySet.delete(), обрабатывают сигналы из rabbit_mq.signals.
+    bulk_create/bulk_update сигналов и save() не вызывают, события пачек
+    ставит в очередь вызывающий.
+    """
+    events_queue: str = None
+    events_exchange: str = ''
+    # Сериализатор данных события, путь для import_string
+    events_serializer: str = None
+
+    def event_data(self) -> Dict:
+        return import_string(self.events_serializer)(self).data
+
+    def emit_event(self, body: Dict):
+        collected = _collected.get()
+        if collected is not None:
+            collected.append(body)
+            return
+        enqueue(self.events_queue, body, self.events_exchange)
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                self.emit_event(created_event(type(self), self.event_data()))
+                return
+
+            # Блокировка строки: версии параллельных изменений не совпадут
+            current = type(self)._base_manager.select_for_update().get(pk=self.pk)
+            update_fields = kwargs.get('update_fields')
+            changed = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+                and (update_fields is None or field.name in update_fields)
+                and getattr(current, field.attname) != getattr(self, field.attname)
+            ]
+            self.version = current.version + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+            super().save(*args, **kwargs)
+            self.emit_event(updated_event(type(self), self.event_data(), changed))
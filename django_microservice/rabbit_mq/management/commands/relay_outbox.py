@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from opentelemetry.trace import SpanKind
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from common import tracing
+from common.messaging import AsyncPublisher, BrokerUnavailable
+from rabbit_mq.models import OutboxMessage
+from rabbit_mq.topology import TOPOLOGY
+
+RELAYED = Counter('django_outbox_relayed_total', 'Событий outbox, подтверждённых брокером')
+BATCH_SECONDS = Histogram('django_outbox_batch_seconds', 'Время отправки пачки outbox до подтверждения брокером')
+RELAY_LAG = Gauge('django_outbox_lag_seconds', 'Возраст самого старого события в последней отправленной пачке')
+
+
+class Command(BaseCommand):
+    help = 'Отправляет накопленные в outbox события в RabbitMQ пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.RABBITMQ_OUTBOX_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Пауза в секундах, когда outbox пуст')
+        parser.add_argument('--once', action='store_true', help='Вычитать outbox и завершиться')
+        parser.add_argument('--metrics-port', type=int, default=0, help='Порт HTTP-сервера /metrics (0 - выключен)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tracing.configure_from_env('outbox_relay')
+        if options['metrics_port']:
+            start_http_server(options['metrics_port'])
+        loop = asyncio.new_event_loop()
+        # Relay отправляет по одной пачке за раз
+        publisher = AsyncPublisher(TOPOLOGY, max_in_flight=batch_size)
+        loop.run_until_complete(publisher.connect(settings.RABBITMQ_URL))
+        self.stdout.write('Relay outbox запущен...')
+
+        try:
+            while True:
+                try:
+                    sent = self.relay_batch(loop, publisher, batch_size)
+                except BrokerUnavailable as e:
+                    # Брокер заблокирован или недоступен: пачка откатилась и
+                    # останется в outbox до следующей попытки
+                    self.stderr.write(f'{e}, повтор через {e.retry_after:g} с')
+                    time.sleep(e.retry_after)
+                    continue
+                if sent:
+                    self.stdout.write(f'Отправлено сообщений: {sent}')
+                if sent < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Выключение...')
+        finally:
+            loop.run_until_complete(publisher.close())
+            loop.close()
+            tracing.flush()
+
+    @staticmethod
+    def message_headers(headers, created_at):
+        # Время в outbox - отдельный span в trace запроса, записавшего событие;
+        # consumer продолжает trace уже от него
+        parent = tracing.extract(headers)
+        if parent is None:
+            return headers
+        waited = tracing.record_span(
+            'outbox wait', int(created_at.timestamp() * 1_000_000) * 1000, parent=parent, kind=SpanKind.PRODUCER,
+        )
+        # Издатель публикует сообщение в контексте из его заголовков, поэтому
+        # span публикации aio-pika станет дочерним для ожидания в outbox
+        return tracing.inject(dict(headers), waited)
+
+    def relay_batch(self, loop, publisher, batch_size):
+        # Строки блокируются до подтверждения брокером; при ошибке публикации
+        # транзакция откатывается и пачка уйдёт повторно (at-least-once).
+        # skip_locked позволяет запускать несколько relay параллельно.
+        with transaction.atomic():
+            batch = list(
+                OutboxMessage.objects
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'exchange', 'routing_key', 'body', 'created_at', 'headers')[:batch_size]
+            )
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            # Повторная отправка пачки после сбоя уходит с теми же message_id,
+            # по ним consumer'ы отбрасывают дубликаты
+            loop.run_until_complete(publisher.publish_many(
+                (
+                    exchange,
+                    routing_key,
+                    publisher.build_message(
+                        json.dumps(body).encode(),
+                        message_id=f'outbox-{pk}',
+                        headers=self.message_headers(headers, created_at),
+                    ),
+                )
+                for pk, exchange, routing_key, body, created_at, headers in batch
+            ))
+            OutboxMessage.objects.filter(id__in=[row[0] for row in batch]).delete()
+        BATCH_SECONDS.observe(time.perf_counter() - started)
+        RELAYED.inc(len(batch))
+        # Отставание relay от записи событий
+        RELAY_LAG.set((timezone.now() - batch[0][4]).total_seconds())
+        return len(batch)
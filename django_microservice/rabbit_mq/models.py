@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    exchange = models.CharField('Обменник', max_length=255, blank=True, default='')
+    routing_key = models.CharField('Ключ маршрутизации', max_length=255)
+    body = models.JSONField('Тело сообщения')
+    # Контекст трассировки запроса, записавшего событие
+    headers = models.JSONField('Заголовки', default=dict, blank=True)
+    created_at = models.DateTimeField('Создано', auto_now_add=True)
+
+    def __str__(self):
+        return f'Outbox: {self.routing_key} #{self.pk}'
+
+    class Meta:
+        verbose_name = 'Исходящее сообщение'
+        verbose_name_plural = 'Исходящие сообщения'
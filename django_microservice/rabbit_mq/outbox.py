@@ -0,0 +1,34 @@
+from typing import Dict, List
+
+from django.conf import settings
+from django.db import transaction
+
+from common import tracing
+from rabbit_mq.models import OutboxMessage
+from rabbit_mq.rabbit_mq_provider import publish, publish_many
+
+
+def enqueue(q_name: str, body: Dict, exchange: str = ''):
+    """
+    Ставит событие в очередь на отправку в рамках текущей транзакции.
+
+    С включённым outbox событие сохраняется в ту же транзакцию, что и
+    изменение модели, и отправляется relay-процессом. Без outbox публикация
+    выполняется после коммита, чтобы не отправлять события откатанных изменений.
+    """
+    if settings.RABBITMQ_OUTBOX:
+        OutboxMessage.objects.create(exchange=exchange, routing_key=q_name, body=body, headers=tracing.inject({}))
+    else:
+        transaction.on_commit(lambda: publish(q_name, body, exchange))
+
+
+def enqueue_many(q_name: str, bodies: List[Dict], exchange: str = ''):
+    """Пачечный вариант enqueue: один INSERT в outbox на все события."""
+    if settings.RABBITMQ_OUTBOX:
+        headers = tracing.inject({})
+        OutboxMessage.objects.bulk_create(
+            [OutboxMessage(exchange=exchange, routing_key=q_name, body=body, headers=headers) for body in bodies],
+            batch_size=1000,
+        )
+    else:
+        transaction.on_commit(lambda: publish_many(q_name, bodies, exchange))
@@ -1,23 +1,84 @@
 import json
 import logging
-from typing import Dict
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import pika
+from django.conf import settings
+from prometheus_client import Counter, Histogram
+
+from common import tracing
+from common.messaging.codecs import JSON_CONTENT_TYPE
+from common.messaging.sync_publisher import SyncPublisher
+from rabbit_mq.topology import TOPOLOGY
 
 logger = logging.getLogger('django')
 
+PUBLISHED = Counter('django_rabbitmq_published_total', 'Сообщений, отправленных в RabbitMQ', ['routing_key'])
+PUBLISH_ERRORS = Counter('django_rabbitmq_publish_errors_total', 'Неудачных публикаций в RabbitMQ', ['routing_key'])
+PUBLISH_SECONDS = Histogram(
+    'django_rabbitmq_publish_seconds',
+    'Время публикации пачки сообщений, включая взятие канала из пула',
+    ['routing_key'],
+)
+
+
+class Publisher(SyncPublisher):
+    """Пул каналов common.messaging с метриками Django-сервиса."""
+
+    def publish_many(
+        self,
+        queue_name: str,
+        messages: List[Tuple[bytes, Optional[pika.BasicProperties]]],
+        exchange: str = '',
+    ):
+        started = time.perf_counter()
+        try:
+            super().publish_many(queue_name, messages, exchange)
+        except Exception:
+            PUBLISH_ERRORS.labels(queue_name).inc()
+            raise
+        PUBLISH_SECONDS.labels(queue_name).observe(time.perf_counter() - started)
+        PUBLISHED.labels(queue_name).inc(len(messages))
+
+
+_publisher: Optional[Publisher] = None
+_publisher_lock = threading.Lock()
 
-def publish(q_name: str, body: Dict):
-    connection_params = pika.ConnectionParameters()
-    connection = pika.BlockingConnection(connection_params)
-    channel = connection.channel(1)
-    queue_name = q_name
-    channel.queue_declare(queue=queue_name)
 
-    channel.basic_publish(
-        exchange='',
-        routing_key=queue_name,
-        body=json.dumps(body)
+def get_publisher() -> Publisher:
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = Publisher(
+                    pika.URLParameters(settings.RABBITMQ_URL),
+                    topology=TOPOLOGY,
+                    max_size=settings.RABBITMQ_POOL_SIZE,
+                )
+    return _publisher
+
+
+def message_properties(message_id: Optional[str] = None) -> pika.BasicProperties:
+    # message_id позволяет consumer'ам отбрасывать повторные доставки.
+    # Span публикации и traceparent добавляет инструментирование pika,
+    # здесь - только время отправки для span'а ожидания в очереди
+    return pika.BasicProperties(
+        content_type=JSON_CONTENT_TYPE,
+        delivery_mode=pika.DeliveryMode.Persistent,
+        message_id=message_id or uuid.uuid4().hex,
+        headers=tracing.inject({}) or None,
     )
+
+
+def publish(q_name: str, body: Dict, exchange: str = ''):
+    get_publisher().publish(q_name, json.dumps(body).encode(), message_properties(), exchange=exchange)
     logger.info(f"\r\nСообщение успешно отправлено в RabbitMQ ({body})\r\n")
-    connection.close()
+
+
+def publish_many(q_name: str, bodies: Iterable[Dict], exchange: str = ''):
+    messages = [(json.dumps(body).encode(), message_properties()) for body in bodies]
+    get_publisher().publish_many(q_name, messages, exchange=exchange)
+    logger.info(f"\r\nВ RabbitMQ отправлено сообщений: {len(messages)}\r\n")
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from rabbit_mq.events import EventsMixin, deleted_event
+
+
+@receiver(pre_delete)
+def lock_deleted_version(sender, instance, **kwargs):
+    # Удаление всегда идёт в транзакции (Collector.delete); версия берётся
+    # из заблокированной строки, а не из объекта, прочитанного раньше
+    if isinstance(instance, EventsMixin):
+        version = sender._base_manager.select_for_update().filter(pk=instance.pk).values_list('version', flat=True).first()
+        instance._deleted_version = instance.version if version is None else version
+
+
+@receiver(post_delete)
+def emit_deleted_event(sender, instance, **kwargs):
+    if isinstance(instance, EventsMixin):
+        version = getattr(instance, '_deleted_version', instance.version)
+        instance.emit_event(deleted_event(sender, instance.pk, version + 1))
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+import aio_pika
+import pika
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from common.messaging import AsyncPublisher, BrokerUnavailable
+from common.messaging.sync_publisher import PoolExhausted
+from rabbit_mq.management.commands.relay_outbox import Command as RelayCommand
+from rabbit_mq.models import OutboxMessage
+from rabbit_mq.outbox import enqueue, enqueue_many
+from rabbit_mq.rabbit_mq_provider import Publisher
+
+
+@mock.patch('common.messaging.sync_publisher.pika.BlockingConnection')
+class PublisherPoolTests(SimpleTestCase):
+    def make_publisher(self, **options):
+        return Publisher(pika.ConnectionParameters(), **options)
+
+    def test_channels_are_reused(self, connection_cls):
+        publisher = self.make_publisher()
+        for _ in range(3):
+            publisher.publish('orders_q', b'{}')
+
+        connection_cls.assert_called_once()
+        channel = connection_cls.return_value.channel.return_value
+        self.assertEqual(channel.basic_publish.call_count, 3)
+        # Очередь объявляется один раз на канал
+        channel.queue_declare.assert_called_once_with(queue='orders_q', durable=True, arguments={'x-queue-type': 'stream'})
+
+    def test_exhausted_pool_raises_pool_exhausted(self, connection_cls):
+        publisher = self.make_publisher(max_size=1, acquire_timeout=0.01)
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def hold_channel():
+            with publisher.channel():
+                acquired.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold_channel)
+        holder.start()
+        acquired.wait()
+        try:
+            with self.assertRaises(PoolExhausted):
+                publisher.publish('orders_q', b'{}')
+        finally:
+            release.set()
+            holder.join()
+
+        # Канал вернулся в пул и снова доступен
+        publisher.publish('orders_q', b'{}')
+        connection_cls.assert_called_once()
+
+    def test_fork_opens_own_connections(self, connection_cls):
+        publisher = self.make_publisher(max_size=1)
+        publisher.publish('orders_q', b'{}')
+        parent_connection = connection_cls.return_value
+        connection_cls.return_value = mock.MagicMock()
+
+        with mock.patch('common.messaging.sync_publisher.os.getpid', return_value=-1):
+            publisher.publish('orders_q', b'{}')
+
+        self.assertEqual(connection_cls.call_count, 2)
+        # Соединение родителя не закрывается и не используется дочерним процессом
+        parent_connection.close.assert_not_called()
+        self.assertEqual(parent_connection.channel.return_value.basic_publish.call_count, 1)
+        connection_cls.return_value.channel.return_value.basic_publish.assert_called_once()
+
+
+@override_settings(RABBITMQ_OUTBOX=True)
+class OutboxRelayTests(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.publisher = AsyncPublisher()
+        self.publisher.publish_many = mock.AsyncMock()
+
+    def relay(self, batch_size=10):
+        return RelayCommand().relay_batch(self.loop, self.publisher, batch_size)
+
+    def test_relay_publishes_persistent_messages_and_deletes_rows(self):
+        enqueue('orders_q', {'id': 1})
+        enqueue_many('recipes_q', [{'id': 2}, {'id': 3}], exchange='recipes')
+        ids = list(OutboxMessage.objects.order_by('id').values_list('id', flat=True))
+
+        self.assertEqual(self.relay(), 3)
+
+        (messages,), _ = self.publisher.publish_many.await_args
+        messages = list(messages)
+        self.assertEqual(
+            [(exchange, routing_key, json.loads(message.body)) for exchange, routing_key, message in messages],
+            [('', 'orders_q', {'id': 1}), ('recipes', 'recipes_q', {'id': 2}), ('recipes', 'recipes_q', {'id': 3})],
+        )
+        # Durable-очередь не спасёт событие без persistent-доставки
+        self.assertTrue(all(message.delivery_mode == aio_pika.DeliveryMode.PERSISTENT for _, _, message in messages))
+        self.assertEqual([message.message_id for _, _, message in messages], [f'outbox-{pk}' for pk in ids])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_relay_respects_batch_size(self):
+        enqueue_many('orders_q', [{'id': i} for i in range(5)])
+
+        self.assertEqual(self.relay(batch_size=2), 2)
+        self.assertEqual(OutboxMessage.objects.count(), 3)
+
+    def test_failed_publish_keeps_rows(self):
+        enqueue('orders_q', {'id': 1})
+        self.publisher.publish_many.side_effect = BrokerUnavailable('timeout', 1.0)
+
+        with self.assertRaises(BrokerUnavailable):
+            self.relay()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
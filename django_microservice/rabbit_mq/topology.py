@@ -0,0 +1,7 @@
+# Очереди и обменники общие для всех сервисов, см. common.messaging.topology.
+# Очереди с тем же именем, что и раньше, продолжают получать события, а
+# каждый экземпляр сервиса может привязать к fanout обменнику свою
+# временную очередь (см. recipe.cache)
+from common.messaging.topology import RECIPES_EXCHANGE, default_topology  # noqa: F401
+
+TOPOLOGY = default_topology()
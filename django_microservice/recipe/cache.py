@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Optional, Tuple
+
+import pika
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from pika.exceptions import AMQPError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from project.fast_serializers import renders_plain_json
+from rabbit_mq.topology import RECIPES_EXCHANGE, TOPOLOGY
+
+logger = logging.getLogger('django')
+
+Entry = Tuple[str, bytes]
+
+
+class LocalLRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: Entry, version: int):
+        with self._lock:
+            # Пока строили ответ, пришла инвалидация - ответ мог устареть
+            if version != self.version:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, recipe_ids: Optional[Iterable[int]] = None):
+        with self._lock:
+            self.version += 1
+            if recipe_ids is None:
+                self._entries.clear()
+                return
+            stale = {('detail', recipe_id) for recipe_id in recipe_ids}
+            for key in list(self._entries):
+                if key[0] == 'list' or key in stale:
+                    del self._entries[key]
+
+
+class InvalidationListener:
+    """
+    Фоновый поток, получающий события рецептов через собственную временную
+    очередь, привязанную к fanout-обменнику. Так каждый экземпляр сервиса
+    видит все create/update/destroy, а не делит их с другими consumer'ами.
+    """
+
+    def __init__(self, on_event: Callable[[dict], None], on_reset: Callable[[], None], retry_delay: float = 5.0):
+        self.on_event = on_event
+        self.on_reset = on_reset
+        self.retry_delay = retry_delay
+        self.connected = False
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Поток не переживает fork, поэтому запускаем его в каждом воркере
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self.connected = False
+                threading.Thread(target=self._run, name='recipe-cache-invalidation', daemon=True).start()
+
+    def _on_message(self, channel, method, properties, body):
+        try:
+            event = json.loads(body)
+        except ValueError:
+            event = None
+        # Непонятное событие (не JSON-объект) сбрасывает весь кэш
+        self.on_event(event if isinstance(event, dict) else {})
+
+    def _run(self):
+        while True:
+            connection = None
+            try:
+                connection = pika.BlockingConnection(pika.URLParameters(settings.RABBITMQ_URL))
+                channel = connection.channel()
+                exchange = TOPOLOGY.exchange(RECIPES_EXCHANGE)
+                channel.exchange_declare(exchange=exchange.name, exchange_type=exchange.type, durable=exchange.durable)
+                result = channel.queue_declare(queue='', exclusive=True, auto_delete=True)
+                channel.queue_bind(queue=result.method.queue, exchange=RECIPES_EXCHANGE)
+                channel.basic_consume(queue=result.method.queue, on_message_callback=self._on_message, auto_ack=True)
+
+                # События, пришедшие без нас, потеряны - начинаем с пустого кэша
+                self.on_reset()
+                self.connected = True
+                channel.start_consuming()
+            except AMQPError as e:
+                logger.warning(f'Инвалидация кэша рецептов недоступна: {e!r}')
+            except Exception:
+                # Поток не должен умирать: без него локальный уровень выключен до перезапуска процесса
+                logger.exception('Ошибка слушателя инвалидации кэша рецептов')
+            finally:
+                self.connected = False
+                if connection is not None and connection.is_open:
+                    try:
+                        connection.close()
+                    except AMQPError:
+                        pass
+            time.sleep(self.retry_delay)
+
+
+class RecipeCache:
+    """
+    Кэш готовых JSON-ответов рецептов из двух уровней: LRU в памяти процесса
+    и необязательный общий кэш Django (например, Redis).
+
+    Локальный уровень используется только пока подключён слушатель событий,
+    иначе изменения с других экземпляров могли бы пройти мимо. Общий уровень
+    инвалидируется сменой поколения ключей экземпляром, сделавшим изменение.
+    """
+    GENERATION_KEY = 'recipe:generation'
+
+    def __init__(self, max_entries: int = 1024, shared_alias: Optional[str] = None):
+        self.local = LocalLRU(max_entries)
+        self.shared = caches[shared_alias] if shared_alias else None
+        self.listener = InvalidationListener(self._on_event, self.local.invalidate)
+
+    def _on_event(self, event: dict):
+        recipe_id = event.get('id')
+        if isinstance(recipe_id, int) or (isinstance(recipe_id, str) and recipe_id.isdecimal()):
+            self.local.invalidate([int(recipe_id)])
+        else:
+            self.local.invalidate()
+
+    def _shared_key(self, key: Hashable) -> str:
+        generation = self.shared.get_or_set(self.GENERATION_KEY, 1, timeout=None)
+        return f'recipe:{generation}:{"|".join(map(str, key))}'
+
+    def get_or_build(self, key: Hashable, build: Callable[[], bytes]) -> Entry:
+        self.listener.ensure_started()
+        use_local = self.listener.connected
+        if use_local:
+            entry = self.local.get(key)
+            if entry is not None:
+                return entry
+
+        version = self.local.version
+        shared_key = self._shared_key(key) if self.shared else None
+        entry = self.shared.get(shared_key) if shared_key else None
+        if entry is None:
+            content = build()
+            entry = (f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"', content)
+            if shared_key:
+                self.shared.set(shared_key, entry, timeout=None)
+        if use_local:
+            self.local.set(key, entry, version)
+        return entry
+
+    def invalidate(self, recipe_ids: Optional[Iterable] = None):
+        self.local.invalidate(None if recipe_ids is None else [int(pk) for pk in recipe_ids])
+        if self.shared:
+            try:
+                self.shared.incr(self.GENERATION_KEY)
+            except ValueError:
+                self.shared.set(self.GENERATION_KEY, 1, timeout=None)
+
+
+_recipe_cache: Optional[RecipeCache] = None
+_recipe_cache_lock = threading.Lock()
+
+
+def get_recipe_cache() -> Optional[RecipeCache]:
+    global _recipe_cache
+    if not settings.RECIPE_CACHE_ENABLED:
+        return None
+    if _recipe_cache is None:
+        with _recipe_cache_lock:
+            if _recipe_cache is None:
+                _recipe_cache = RecipeCache(
+                    max_entries=settings.RECIPE_CACHE_MAX_ENTRIES,
+                    shared_alias=settings.RECIPE_CACHE_SHARED_ALIAS,
+                )
+    return _recipe_cache
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """If-None-Match: список тегов через запятую или *; сравнение слабое (RFC 9110), W/ не учитывается."""
+    tags = parse_etags(if_none_match)
+    if tags == ['*']:
+        return True
+    return any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def cached_response(request, key: Hashable, build: Callable[[], object], render: Optional[Callable[[object], bytes]] = None):
+    """
+    Ответ с ETag из кэша; при совпадении If-None-Match - 304 без тела.
+    render - готовый рендерер JSON вместо согласования формата DRF.
+    В кэше только обычный JSON: browsable API, ?format= и indent идут через DRF.
+    """
+    cache = get_recipe_cache()
+    if cache is None or not renders_plain_json(request):
+        if render is None:
+            return Response(build())
+        return HttpResponse(render(build()), content_type='application/json')
+
+    etag, content = cache.get_or_build(key, lambda: (render or JSONRenderer().render)(build()))
+    if etag_matches(etag, request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def invalidate_on_commit(recipe_ids: Optional[Iterable] = None):
+    cache = get_recipe_cache()
+    if cache is not None:
+        ids = None if recipe_ids is None else list(recipe_ids)
+        transaction.on_commit(lambda: cache.invalidate(ids))
@@ -1,12 +1,43 @@
 from django.db import models
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
 
+from rabbit_mq.events import EventsMixin
+from rabbit_mq.topology import RECIPES_EXCHANGE
 
-class Recipe(models.Model):
+
+class RecipeQuerySet(models.QuerySet):
+    def with_comments_count(self):
+        return self.annotate(comments_count=Count('comments'))
+
+    def with_comments(self, limit: int):
+        """
+        Число комментариев и последние limit из них для каждого рецепта.
+
+        Count считается в том же запросе, что и рецепты, а комментарии всей
+        страницы подгружаются одним запросом с ограничением на рецепт
+        (ROW_NUMBER() OVER (PARTITION BY recipe_id)), так что число запросов
+        не зависит от размера страницы.
+        """
+        return self.with_comments_count().prefetch_related(
+            Prefetch('comments', queryset=RecipeComment.objects.order_by('-id')[:limit], to_attr='recent_comments'),
+        )
+
+
+class Recipe(EventsMixin, models.Model):
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     description = models.TextField(max_length=1000)
     ingredients = models.TextField(max_length=500)
+    # Растёт при каждом изменении; передаётся в событиях, см. common.events
+    version = models.PositiveIntegerField('Версия', default=1)
+
+    objects = RecipeQuerySet.as_manager()
+
+    events_queue = 'recipes_q'
+    events_exchange = RECIPES_EXCHANGE
+    events_serializer = 'recipe.serializers.RecipeSerializer'
 
     def __str__(self):
         return self.title
@@ -16,10 +47,20 @@ class Recipe(models.Model):
         verbose_name_plural = 'Рецепты'
 
 
+class RecipeCommentQuerySet(models.QuerySet):
+    def latest_per_recipe(self, limit: int):
+        """Последние limit комментариев каждого рецепта, новые первыми."""
+        return self.annotate(
+            position=Window(RowNumber(), partition_by=F('recipe_id'), order_by=F('id').desc()),
+        ).filter(position__lte=limit).order_by('-id')
+
+
 class RecipeComment(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='comments')
     comment_text = models.TextField()
 
+    objects = RecipeCommentQuerySet.as_manager()
+
     def __str__(self):
         return self.comment_text
 
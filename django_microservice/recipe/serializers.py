@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from project.serializers import BulkListSerializer
+
 from .models import Recipe, RecipeComment
 
 
@@ -7,9 +9,20 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = '__all__'
+        read_only_fields = ('version',)
+        list_serializer_class = BulkListSerializer
 
 
 class RecipeCommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeComment
         fields = '__all__'
+
+
+class RecipeWithCommentsSerializer(RecipeSerializer):
+    """Рецепт для чтения; queryset должен быть подготовлен Recipe.objects.with_comments()."""
+    comments = RecipeCommentSerializer(source='recent_comments', many=True, read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        pass
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipe.cache import get_recipe_cache, invalidate_on_commit
+from recipe.models import Recipe, RecipeComment
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    # Любое изменение через ORM, в том числе из админки; у записей кэша нет TTL
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(pre_save, sender=RecipeComment)
+def remember_previous_recipe(sender, instance, **kwargs):
+    # Комментарий можно перенести к другому рецепту: сбросить надо оба
+    if instance.pk is not None and get_recipe_cache() is not None:
+        instance._previous_recipe_id = sender.objects.filter(pk=instance.pk).values_list('recipe_id', flat=True).first()
+
+
+@receiver(post_save, sender=RecipeComment)
+@receiver(post_delete, sender=RecipeComment)
+def invalidate_comment_recipe(sender, instance, **kwargs):
+    # Комментарии входят в ответы рецептов, а меняют их и в обход API, например в админке
+    invalidate_on_commit({instance.recipe_id, getattr(instance, '_previous_recipe_id', None)} - {None})
@@ -0,0 +1,305 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipe.cache import InvalidationListener, RecipeCache, etag_matches
+from recipe.models import Recipe, RecipeComment
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False, RECIPE_COMMENTS_LIMIT=2)
+class RecipeCommentsQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(title=f'Рецепт {i}', time_minutes=10, price='1.00', description='-', ingredients='-')
+            for i in range(30)
+        ])
+        RecipeComment.objects.bulk_create([
+            RecipeComment(recipe=recipe, comment_text=f'Коммент {j}')
+            for recipe in recipes
+            for j in range(recipe.id % 4)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        small, _ = self._count_queries('/recipe?limit=2')
+        large, data = self._count_queries('/recipe?limit=30')
+
+        # Рецепты со счётчиком и комментарии всей страницы
+        self.assertEqual(small, 2)
+        self.assertEqual(large, small)
+        for item in data['results']:
+            recipe = Recipe.objects.get(id=item['id'])
+            self.assertEqual(item['comments_count'], recipe.comments.count())
+            self.assertEqual(
+                [comment['id'] for comment in item['comments']],
+                list(recipe.comments.order_by('-id').values_list('id', flat=True)[:2]),
+            )
+
+    def test_retrieve_embeds_comments(self):
+        recipe = next(r for r in Recipe.objects.all() if r.id % 4 == 3)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/recipe/{recipe.id}')
+
+        self.assertEqual(response.json()['comments_count'], 3)
+        self.assertEqual(len(response.json()['comments']), 2)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False)
+class RecipeFastListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        recipes = Recipe.objects.bulk_create([
+            Recipe(title='Борщ \u2028 "острый"', time_minutes=90, price='7.5', description='Ещё', ingredients='свёкла'),
+            Recipe(title='Tea', time_minutes=1, price='0.10', description='', ingredients='tea'),
+        ])
+        RecipeComment.objects.bulk_create([RecipeComment(recipe=recipes[0], comment_text=f'Коммент {j}') for j in range(7)])
+
+    def test_fast_list_is_byte_identical(self):
+        client = APIClient()
+        for url in ('/recipe', '/recipe?limit=1'):
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = client.get(url)
+            with self.assertNumQueries(2):
+                actual = client.get(url)
+            self.assertEqual(actual.content, expected.content)
+            self.assertEqual(actual['Content-Type'], expected['Content-Type'])
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False, RABBITMQ_OUTBOX=True)
+class RecipeWriteTests(TestCase):
+    def test_missing_recipe_is_404(self):
+        client = APIClient()
+        for pk in (999, 'abc'):
+            with self.subTest(pk=pk):
+                self.assertEqual(client.get(f'/recipe/{pk}').status_code, 404)
+                self.assertEqual(client.put(f'/recipe/{pk}', {'title': 'Суп'}, format='json').status_code, 404)
+                self.assertEqual(client.delete(f'/recipe/{pk}').status_code, 404)
+
+
+@override_settings(RECIPE_CACHE_ENABLED=True)
+class RecipeCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(title=f'Рецепт {i}', time_minutes=10, price='1.00', description='-', ingredients='-')
+            for i in range(2)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        # Слушатель fanout-событий считается подключённым, без RabbitMQ
+        self.cache = RecipeCache(max_entries=16)
+        self.cache.listener.connected = True
+        patches = [
+            mock.patch.object(self.cache.listener, 'ensure_started'),
+            mock.patch('recipe.cache._recipe_cache', self.cache),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        url = f'/recipe/{self.recipes[0].id}'
+        first = self.get(url)
+        with self.assertNumQueries(0):
+            second = self.get(url)
+
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        with self.assertNumQueries(2):
+            self.get('/recipe')
+
+    def test_other_formats_bypass_cache(self):
+        url = f'/recipe/{self.recipes[0].id}'
+        self.get(url)
+        for query, headers, content_type in (
+            ('?format=api', {}, 'text/html'),
+            ('', {'Accept': 'text/html'}, 'text/html'),
+            ('', {'Accept': 'application/json; indent=2'}, 'application/json'),
+        ):
+            with self.subTest(query=query, headers=headers):
+                with self.assertNumQueries(2):
+                    response = self.get(url + query, **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(content_type))
+                self.assertNotIn('ETag', response)
+        self.assertIn(b'\n  ', response.content)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.get('/recipe')['ETag']
+
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                response = self.get('/recipe', If_None_Match=header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+        # Часть тега или тег без кавычек - не совпадение
+        for header in (etag[1:-1], f'"{etag[2:-2]}"', '"other"'):
+            with self.subTest(header=header):
+                self.assertEqual(self.get('/recipe', If_None_Match=header).status_code, 200)
+
+    @override_settings(RABBITMQ_OUTBOX=True)
+    def test_write_invalidates_after_commit(self):
+        recipe = self.recipes[0]
+        url = f'/recipe/{recipe.id}'
+        etag = self.get(url)['ETag']
+        list_etag = self.get('/recipe')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.put(url, {'title': 'Новое название'}, format='json')
+        # До коммита кэш не трогаем: откат не должен был бы его сбросить
+        self.assertEqual(self.get(url, If_None_Match=etag).status_code, 304)
+
+        for callback in callbacks:
+            callback()
+        response = self.get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Новое название')
+        self.assertNotEqual(self.get('/recipe')['ETag'], list_etag)
+
+    def test_bulk_writes_invalidate_after_commit(self):
+        url = f'/recipe/{self.recipes[0].id}'
+        etag = self.get(url)['ETag']
+        list_etag = self.get('/recipe')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/recipe/bulk', [
+                {'title': 'Суп', 'time_minutes': 5, 'price': '1.00', 'description': '-', 'ingredients': '-'},
+            ], format='json')
+        self.assertEqual(self.get('/recipe', If_None_Match=list_etag).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/recipe/bulk', [{'id': self.recipes[0].id, 'title': 'Борщ'}], format='json')
+        response = self.get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Борщ')
+
+    def test_orm_changes_invalidate_recipe_after_commit(self):
+        first, second = self.recipes
+        etags = {recipe.id: self.get(f'/recipe/{recipe.id}')['ETag'] for recipe in self.recipes}
+
+        # Как в админке: рецепт меняется в обход API
+        with self.captureOnCommitCallbacks(execute=True):
+            first.title = 'Новое название'
+            first.save()
+        response = self.get(f'/recipe/{first.id}', If_None_Match=etags[first.id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Новое название')
+        self.assertEqual(self.get(f'/recipe/{second.id}', If_None_Match=etags[second.id]).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.get(f'/recipe/{second.id}').status_code, 404)
+
+    def test_comment_changes_invalidate_recipe_after_commit(self):
+        first, second = self.recipes
+        url = f'/recipe/{first.id}'
+        etag = self.get(url)['ETag']
+
+        # Как в админке: комментарий меняется в обход API рецептов
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = RecipeComment.objects.create(recipe=first, comment_text='Вкусно')
+        response = self.get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments_count'], 1)
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.comment_text = 'Очень вкусно'
+            comment.save()
+        response = self.get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments'][0]['comment_text'], 'Очень вкусно')
+
+        # Перенос к другому рецепту сбрасывает оба
+        etags = {recipe.id: self.get(f'/recipe/{recipe.id}')['ETag'] for recipe in self.recipes}
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.recipe = second
+            comment.save()
+        for recipe in self.recipes:
+            with self.subTest(recipe=recipe.id):
+                self.assertEqual(self.get(f'/recipe/{recipe.id}', If_None_Match=etags[recipe.id]).status_code, 200)
+
+        etag = self.get(f'/recipe/{second.id}')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.delete()
+        response = self.get(f'/recipe/{second.id}', If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments_count'], 0)
+
+    def test_fanout_event_invalidates_recipe_and_lists(self):
+        first, second = (f'/recipe/{recipe.id}' for recipe in self.recipes)
+        for url in (first, second, '/recipe'):
+            self.get(url)
+
+        # Событие с другого экземпляра сервиса
+        self.cache.listener._on_message(None, None, None, f'{{"id": {self.recipes[0].id}}}'.encode())
+        with self.assertNumQueries(0):
+            self.get(second)
+        with self.assertNumQueries(2):
+            self.get(first)
+        with self.assertNumQueries(2):
+            self.get('/recipe')
+
+        # Событие без id сбрасывает всё
+        for body in (b'not json', b'[1]', b'"x"', b'{"id": "\xc2\xb2"}'):
+            with self.subTest(body=body):
+                self.get(second)
+                self.cache.listener._on_message(None, None, None, body)
+                with self.assertNumQueries(2):
+                    self.get(second)
+
+    def test_listener_reconnects_after_unexpected_error(self):
+        listener = InvalidationListener(on_event=mock.Mock(), on_reset=mock.Mock(side_effect=RuntimeError('bug')))
+
+        class Stop(BaseException):
+            pass
+
+        with mock.patch('recipe.cache.pika.BlockingConnection') as connection_cls, \
+                mock.patch('recipe.cache.time.sleep', side_effect=Stop) as sleep:
+            with self.assertRaises(Stop), self.assertLogs('django', 'ERROR'):
+                listener._run()
+        # Ошибка не убила поток: соединение закрыто, следующая попытка после паузы
+        connection_cls.return_value.close.assert_called_once()
+        sleep.assert_called_once_with(listener.retry_delay)
+        self.assertFalse(listener.connected)
+
+    def test_detail_key_does_not_depend_on_id_spelling(self):
+        recipe = self.recipes[0]
+        self.get(f'/recipe/0{recipe.id}')
+        with self.assertNumQueries(0):
+            self.get(f'/recipe/{recipe.id}')
+
+        self.cache.listener._on_message(None, None, None, f'{{"id": "{recipe.id}"}}'.encode())
+        with self.assertNumQueries(2):
+            self.get(f'/recipe/0{recipe.id}')
+
+    def test_local_tier_is_bypassed_without_listener(self):
+        url = f'/recipe/{self.recipes[0].id}'
+        self.cache.listener.connected = False
+        self.get(url)
+        with self.assertNumQueries(2):
+            self.get(url)
+
+
+class EtagMatchTests(SimpleTestCase):
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a"', '"b", W/"a"'))
+        self.assertTrue(etag_matches('"a"', '*'))
+        self.assertFalse(etag_matches('"a"', '"ab"'))
+        self.assertFalse(etag_matches('"a"', ''))
@@ -1,40 +1,130 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404
 from rest_framework import viewsets, status
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from rabbit_mq.rabbit_mq_provider import publish
-from recipe.models import Recipe
-from recipe.serializers import RecipeSerializer
+from project.async_views import AsyncDetailView, AsyncListView
+from project.fast_serializers import RowSerializer, render_json, use_fast_path
+from project.pagination import KeysetPagination, stream_ndjson
+from project.serializers import BULK_MAX_ITEMS, BulkListSerializer
+from rabbit_mq.events import created_event, updated_event
+from rabbit_mq.outbox import enqueue_many
+from recipe.cache import cached_response, invalidate_on_commit
+from recipe.models import Recipe, RecipeComment
+from recipe.serializers import RecipeSerializer, RecipeWithCommentsSerializer
+
+
+RECIPE_ROWS = RowSerializer(RecipeWithCommentsSerializer)
 
 
 class RecipeView(viewsets.ViewSet):
     def list(self, request):
-        recipes = Recipe.objects.all()
-        serializer = RecipeSerializer(recipes, many=True)
-        return Response(serializer.data)
+        recipes = Recipe.objects.order_by('id')
+        if request.query_params.get('stream') == 'ndjson':
+            return stream_ndjson(recipes, RecipeSerializer)
+
+        def build():
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(recipes.with_comments(settings.RECIPE_COMMENTS_LIMIT), request)
+            serializer = RecipeWithCommentsSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data).data
+
+        def build_rows():
+            # Те же два запроса, что и с prefetch, но строками .values()
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(recipes.with_comments_count().values(*RECIPE_ROWS.value_names), request)
+            comment_rows = RECIPE_ROWS.nested['recent_comments']
+            recent_comments = defaultdict(list)
+            if page:
+                comments = RecipeComment.objects.filter(recipe_id__in=[row['id'] for row in page])
+                for comment in comments.latest_per_recipe(settings.RECIPE_COMMENTS_LIMIT).values(*comment_rows.value_names):
+                    recent_comments[comment['recipe']].append(comment)
+            for row in page:
+                row['recent_comments'] = recent_comments[row['id']]
+            return paginator.get_paginated_data(RECIPE_ROWS.many(page))
+
+        key = ('list', request.build_absolute_uri())
+        if use_fast_path(request):
+            return cached_response(request, key, build_rows, render=render_json)
+        return cached_response(request, key, build)
+
+    def retrieve(self, request, pk=None):
+        # Ключ кэша - id рецепта, а не строка из URL: /recipe/01 и /recipe/1
+        # должны попасть в одну запись, которую сбросит событие с id=1
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise Http404
+
+        def build():
+            recipe = get_object_or_404(Recipe.objects.with_comments(settings.RECIPE_COMMENTS_LIMIT), id=recipe_id)
+            return RecipeWithCommentsSerializer(recipe).data
+
+        return cached_response(request, ('detail', recipe_id), build)
 
     def create(self, request):
         serializer = RecipeSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
 
-        publish('recipes_q', serializer.data)
-    
+        # Событие ставит в очередь сама модель, см. rabbit_mq.events.EventsMixin
+        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def update(self, request, pk=None):
-        recipe = Recipe.objects.get(id=pk)
-        serializer = RecipeSerializer(instance=recipe, data=request.data, partial=True)
+    def bulk_create(self, request):
+        serializer = RecipeSerializer(data=request.data, many=True, max_length=BULK_MAX_ITEMS)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            # bulk_create не вызывает save() и post_save: события пачки и
+            # сброс кэша (см. recipe.signals) - здесь
+            enqueue_many(Recipe.events_queue, [created_event(Recipe, data) for data in serializer.data], Recipe.events_exchange)
+            invalidate_on_commit([])
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        ids = BulkListSerializer.collect_ids(request.data)
+        with transaction.atomic():
+            instances = Recipe.objects.select_for_update().in_bulk(ids)
+            serializer = RecipeSerializer(instance=instances, data=request.data, many=True, partial=True, max_length=BULK_MAX_ITEMS)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            enqueue_many(Recipe.events_queue, [
+                updated_event(Recipe, data, changed) for data, changed in zip(serializer.data, serializer.changed)
+            ], Recipe.events_exchange)
+            invalidate_on_commit(instances)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
-        publish('recipes_q', serializer.data)
+    def update(self, request, pk=None):
+        with transaction.atomic():
+            recipe = get_object_or_404(Recipe.objects.select_for_update(), id=pk)
+            serializer = RecipeSerializer(instance=recipe, data=request.data, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
 
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
     def destroy(self, request, pk=None):
-        recipe = Recipe.objects.get(id=pk)
-        recipe.delete()
-
-        publish('recipes_q', {'id': 'pk'})
+        with transaction.atomic():
+            get_object_or_404(Recipe.objects.select_for_update(), id=pk).delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RecipeAsyncMixin:
+    model = Recipe
+    serializer_class = RecipeSerializer
+
+
+class RecipeAsyncListView(RecipeAsyncMixin, AsyncListView):
+    read_serializer_class = RecipeWithCommentsSerializer
+
+    def get_queryset(self, request):
+        return Recipe.objects.with_comments(settings.RECIPE_COMMENTS_LIMIT)
+
+
+class RecipeAsyncDetailView(RecipeAsyncMixin, AsyncDetailView):
+    pass
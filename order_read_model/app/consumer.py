@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, UTC
+from functools import partial
+from typing import List, Optional, Sequence, Tuple
+
+import aio_pika
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.projection import Projection
+from common.events import CREATED, ChangeEvent, make_event, parse_event
+from common.messaging import QueueSpec, codecs, open_channels
+
+STREAM_OFFSET_HEADER = "x-stream-offset"
+
+EVENTS = Counter(
+    "read_model_events_total",
+    "Полученные события по итогу: applied, stale (повтор или устаревшая версия), skipped, invalid",
+    ["result"],
+)
+ROWS = Gauge("read_model_rows", "Строк в локальной копии")
+LAG = Histogram(
+    "read_model_lag_seconds",
+    "Задержка от изменения в сервисе-источнике до применения в локальной копии",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+BATCH_SIZE = Histogram("read_model_batch_size", "Событий в пачке, записанной в снимок", buckets=(1, 10, 50, 100, 500, 1000))
+
+
+def decode_event(body: bytes, content_type: Optional[str]) -> ChangeEvent:
+    """
+    Событие из сообщения: конверт common.events (Django, orders_q) или
+    заказ order_service (orders_queue), который считается created версии 1.
+    """
+    data = codecs.decode(body, content_type)
+    if isinstance(data, dict) and "schema" not in data and "order_id" in data:
+        data = dict(data)
+        order_id = data.pop("order_id")
+        occurred_at = datetime.fromisoformat(data["created_at"]) if data.get("created_at") else None
+        return parse_event(make_event(CREATED, "order", order_id, 1, {"id": order_id, **data}, occurred_at))
+    return parse_event(data)
+
+
+class ProjectionConsumer:
+    """
+    Поддерживает Projection по событиям из одной или нескольких очередей.
+
+    Сообщения всех очередей идут через один канал и применяются строго в
+    порядке доставки, пачками до batch_size (это же prefetch). Пачка
+    записывается в снимок одной транзакцией и затем подтверждается одним
+    ack(multiple=True), поэтому снимок никогда не отстаёт от подтверждённого.
+    Для stream-очередей вместе с пачкой сохраняется позиция, и чтение после
+    перезапуска продолжается с неё (или с начала потока, если снимка нет).
+    """
+
+    def __init__(
+        self,
+        projection: Projection,
+        queues: Sequence[QueueSpec],
+        batch_size: int = 500,
+        stream_offset="first",
+    ):
+        self.projection = projection
+        self.queues = queues
+        self.batch_size = batch_size
+        self.stream_offset = stream_offset
+        self.connection = None
+        self.channel = None
+        self._messages: Optional[asyncio.Queue] = None
+        self._stopping = asyncio.Event()
+        ROWS.set_function(lambda: len(self.projection))
+
+    async def connect(self, rabbitmq_url: str):
+        self.connection, (self.channel,) = await open_channels(rabbitmq_url, prefetch_count=self.batch_size)
+
+    def start_offset(self, queue_name: str):
+        stored = self.projection.offsets.get(queue_name)
+        return stored + 1 if stored is not None else self.stream_offset
+
+    async def consume(self):
+        self._messages = asyncio.Queue()
+        subscriptions = []
+        try:
+            for spec in self.queues:
+                queue = await spec.declare(self.channel)
+                arguments = {STREAM_OFFSET_HEADER: self.start_offset(spec.name)} if spec.is_stream else None
+                consumer_tag = await queue.consume(partial(self._deliver, spec.name), arguments=arguments)
+                subscriptions.append((queue, consumer_tag))
+            while True:
+                batch = await self._next_batch()
+                if batch is None:
+                    break
+                await self.process_batch(batch)
+        finally:
+            # Неподтверждённый хвост брокер доставит заново, повтор
+            # отбросится по версии
+            for queue, consumer_tag in subscriptions:
+                await queue.cancel(consumer_tag)
+
+    async def _deliver(self, queue_name: str, message: aio_pika.abc.AbstractIncomingMessage):
+        await self._messages.put((queue_name, message))
+
+    async def _next_batch(self) -> Optional[List[Tuple[str, aio_pika.abc.AbstractIncomingMessage]]]:
+        getter = asyncio.ensure_future(self._messages.get())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({getter, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not getter.done():
+            getter.cancel()
+            return None
+
+        batch = [getter.result()]
+        while len(batch) < self.batch_size and not self._messages.empty():
+            batch.append(self._messages.get_nowait())
+        return batch
+
+    async def process_batch(self, batch: List[Tuple[str, aio_pika.abc.AbstractIncomingMessage]]):
+        offsets = {}
+        for queue_name, message in batch:
+            self.apply_message(message)
+            offset = (message.headers or {}).get(STREAM_OFFSET_HEADER)
+            if isinstance(offset, int):
+                offsets[queue_name] = offset
+        await self.projection.flush(offsets)
+        BATCH_SIZE.observe(len(batch))
+        await batch[-1][1].ack(multiple=True)
+
+    def apply_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        try:
+            event = decode_event(message.body, message.content_type)
+        except (ValueError, KeyError) as e:
+            # Повтор не поможет: сообщение подтверждается вместе с пачкой
+            print(f"Не удалось разобрать событие {message.message_id}: {e}")
+            EVENTS.labels("invalid").inc()
+            return
+        if event.entity != self.projection.entity:
+            EVENTS.labels("skipped").inc()
+            return
+        if not self.projection.apply(event):
+            EVENTS.labels("stale").inc()
+            return
+        EVENTS.labels("applied").inc()
+        self._observe_lag(event)
+
+    @staticmethod
+    def _observe_lag(event: ChangeEvent):
+        try:
+            occurred = datetime.fromisoformat(event.occurred_at)
+        except ValueError:
+            return
+        if occurred.tzinfo is None:
+            occurred = occurred.replace(tzinfo=UTC)
+        LAG.observe((datetime.now(UTC) - occurred).total_seconds())
+
+    def stop(self):
+        self._stopping.set()
+
+    async def close(self):
+        if self.connection is not None:
+            await self.connection.close()
@@ -0,0 +1,265 @@
+"""
+Локальная материализованная копия сущностей, собранная из событий
+изменений (common.events).
+
+Состояние целиком лежит в памяти: строки по id, отсортированный по
+(created_at, id) список всех ключей и такие же списки по значениям
+индексируемых полей (для заказов - status и customer_email). Запросы
+обслуживаются только из памяти, без обращений к базе сервиса-источника.
+
+SQLite - снимок этого состояния: после каждой пачки событий изменённые
+строки, удалённые (как версии без данных) и позиции в потоках пишутся
+одной транзакцией, и только потом пачка подтверждается брокеру. При
+старте снимок загружается в память, а недоподтверждённые события брокер
+доставит заново (для stream-очереди чтение продолжается с сохранённой
+позиции); повтор отбрасывается по версии.
+"""
+import asyncio
+import json
+import sqlite3
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from common.events import CREATED, DELETED, ChangeEvent, VersionTracker
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+# Ключ сортировки строки: новые сверху, id различает строки с одним временем
+SortKey = Tuple[datetime, str]
+
+
+def encode_cursor(key: SortKey) -> str:
+    values = [key[0].isoformat(), key[1]]
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        created_at, row_id = json.loads(urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+        # Ключи строк всегда с часовым поясом, наивное время не сравнить с ними
+        if created_at.tzinfo is None:
+            raise ValueError("Время в курсоре без часового пояса")
+        return created_at, str(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+def _created_at(row: dict) -> datetime:
+    try:
+        created_at = datetime.fromisoformat(str(row["created_at"]))
+    except (KeyError, ValueError):
+        # Строка собрана из updated без created: в конец списка
+        return EPOCH
+    return created_at if created_at.tzinfo is not None else created_at.replace(tzinfo=UTC)
+
+
+class SortedIndex:
+    """Ключи строк по значению поля, каждый список отсортирован по возрастанию."""
+
+    def __init__(self):
+        self._keys: Dict[object, List[SortKey]] = {}
+
+    def add(self, value, key: SortKey, keep_sorted: bool = True):
+        keys = self._keys.setdefault(value, [])
+        if keep_sorted:
+            insort(keys, key)
+        else:
+            keys.append(key)
+
+    def sort(self):
+        for keys in self._keys.values():
+            keys.sort()
+
+    def remove(self, value, key: SortKey):
+        keys = self._keys.get(value)
+        if not keys:
+            return
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+        if not keys:
+            del self._keys[value]
+
+    def keys(self, value) -> List[SortKey]:
+        return self._keys.get(value, [])
+
+    def counts(self) -> Dict[object, int]:
+        return {value: len(keys) for value, keys in self._keys.items()}
+
+
+class Projection:
+    def __init__(self, path: str = ":memory:", entity: str = "order", indexes: Sequence[str] = ()):
+        self.path = path
+        self.entity = entity
+        self.indexes: Dict[str, SortedIndex] = {name: SortedIndex() for name in indexes}
+        self.versions = VersionTracker()
+        self.offsets: Dict[str, int] = {}
+
+        self._rows: Dict[str, dict] = {}
+        self._sort_keys: Dict[str, SortKey] = {}
+        self._all: List[SortKey] = []
+        # Изменённые с последнего flush(): id -> (версия, строка или None)
+        self._dirty: Dict[str, Tuple[int, Optional[dict]]] = {}
+
+        self.db = None
+        # Как в хранилище order_service: sqlite3 в одном отдельном потоке
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="read-model-sqlite")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _load_sync(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot ("
+            "entity TEXT NOT NULL, id TEXT NOT NULL, version INTEGER NOT NULL, data TEXT, "
+            "PRIMARY KEY (entity, id))"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS offsets ("
+            "entity TEXT NOT NULL, queue TEXT NOT NULL, position INTEGER NOT NULL, "
+            "PRIMARY KEY (entity, queue))"
+        )
+        self.db.commit()
+        rows = self.db.execute("SELECT id, version, data FROM snapshot WHERE entity = ?", (self.entity,)).fetchall()
+        offsets = self.db.execute("SELECT queue, position FROM offsets WHERE entity = ?", (self.entity,)).fetchall()
+        return rows, offsets
+
+    async def load(self):
+        """Открывает снимок и восстанавливает из него состояние в памяти."""
+        rows, offsets = await self._run(self._load_sync)
+        for row_id, version, data in rows:
+            self.versions.remember(self.entity, row_id, version)
+            if data is not None:
+                self._put(row_id, json.loads(data), keep_sorted=False)
+        # Списки сортируются один раз, а не вставкой каждой строки
+        self._all.sort()
+        for index in self.indexes.values():
+            index.sort()
+        self.offsets = dict(offsets)
+
+    def _write_sync(self, dirty: List[tuple], offsets: List[tuple]):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO snapshot (entity, id, version, data) VALUES (?, ?, ?, ?)",
+                dirty,
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO offsets (entity, queue, position) VALUES (?, ?, ?)",
+                offsets,
+            )
+
+    async def flush(self, offsets: Optional[Mapping[str, int]] = None):
+        """Пишет изменения и позиции в потоках одной транзакцией."""
+        dirty, self._dirty = self._dirty, {}
+        offsets = dict(offsets or {})
+        if not dirty and not offsets:
+            return
+        await self._run(
+            self._write_sync,
+            [
+                (self.entity, row_id, version, None if row is None else json.dumps(row))
+                for row_id, (version, row) in dirty.items()
+            ],
+            [(self.entity, queue, position) for queue, position in offsets.items()],
+        )
+        self.offsets.update(offsets)
+
+    async def close(self):
+        if self.db is not None:
+            await self._run(self.db.close)
+            self.db = None
+        self._executor.shutdown()
+
+    def apply(self, event: ChangeEvent) -> bool:
+        """Применяет событие своей сущности; False - устаревшее или повтор."""
+        if event.entity != self.entity:
+            raise ValueError(f"Событие сущности {event.entity}, ожидалась {self.entity}")
+        if not self.versions.accept(event):
+            return False
+
+        row_id = str(event.id)
+        old = self._remove(row_id)
+        if event.type == DELETED:
+            row = None
+        elif event.type == CREATED or old is None:
+            # updated без created (чтение начато с середины) даёт строку
+            # только из изменённых полей
+            row = {"id": event.id, **event.data}
+        else:
+            row = {**old, **event.data}
+        if row is not None:
+            self._put(row_id, row)
+        self._dirty[row_id] = (event.version, row)
+        return True
+
+    def _put(self, row_id: str, row: dict, keep_sorted: bool = True):
+        key = (_created_at(row), row_id)
+        self._rows[row_id] = row
+        self._sort_keys[row_id] = key
+        if keep_sorted:
+            insort(self._all, key)
+        else:
+            self._all.append(key)
+        for name, index in self.indexes.items():
+            index.add(row.get(name), key, keep_sorted)
+
+    def _remove(self, row_id: str) -> Optional[dict]:
+        row = self._rows.pop(row_id, None)
+        if row is None:
+            return None
+        key = self._sort_keys.pop(row_id)
+        position = bisect_left(self._all, key)
+        del self._all[position]
+        for name, index in self.indexes.items():
+            index.remove(row.get(name), key)
+        return row
+
+    def get(self, row_id) -> Optional[dict]:
+        return self._rows.get(str(row_id))
+
+    def count(self, field: str) -> Dict[object, int]:
+        return self.indexes[field].counts()
+
+    def query(self, filters: Optional[Mapping[str, object]] = None, limit: int = 100, cursor: Optional[str] = None) -> dict:
+        """
+        Строки, совпадающие со всеми фильтрами, новые сверху, постранично
+        по ключу (created_at, id). Фильтровать можно только по индексам;
+        перебирается самый короткий из подходящих списков.
+        """
+        filters = dict(filters or {})
+        unknown = set(filters) - set(self.indexes)
+        if unknown:
+            raise ValueError(f"Нет индекса по полям: {', '.join(sorted(unknown))}")
+
+        candidates = self._all
+        driving = None
+        for name, value in filters.items():
+            keys = self.indexes[name].keys(value)
+            if driving is None or len(keys) < len(candidates):
+                candidates, driving = keys, name
+        rest = [(name, value) for name, value in filters.items() if name != driving]
+
+        position = len(candidates) if cursor is None else bisect_left(candidates, decode_cursor(cursor))
+        results = []
+        last_key = None
+        while position > 0:
+            position -= 1
+            key = candidates[position]
+            row = self._rows[key[1]]
+            if any(row.get(name) != value for name, value in rest):
+                continue
+            if len(results) == limit:
+                return {"next": encode_cursor(last_key), "results": results}
+            results.append(row)
+            last_key = key
+        return {"next": None, "results": results}
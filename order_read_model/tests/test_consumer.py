@@ -0,0 +1,123 @@
+import asyncio
+import json
+from datetime import datetime, UTC
+from unittest.mock import AsyncMock
+
+import pytest
+import pytest_asyncio
+
+from app.consumer import ProjectionConsumer, decode_event
+from app.main import order_queues
+from app.projection import Projection
+from common.events import CREATED, UPDATED, make_event
+from common.messaging import QueueSpec
+
+
+class FakeMessage:
+    def __init__(self, body: dict, offset=None, content_type="application/json"):
+        self.body = json.dumps(body).encode()
+        self.content_type = content_type
+        self.message_id = None
+        self.headers = {"x-stream-offset": offset} if offset is not None else {}
+        self.acks = []
+
+    async def ack(self, multiple=False):
+        self.acks.append(multiple)
+
+
+class FakeQueue:
+    def __init__(self, messages):
+        self.messages = messages
+        self.consume_arguments = None
+
+    async def consume(self, callback, arguments=None):
+        self.consume_arguments = arguments
+        for message in self.messages:
+            await callback(message)
+        return "ctag"
+
+    async def cancel(self, consumer_tag):
+        pass
+
+
+@pytest_asyncio.fixture
+async def projection(tmp_path):
+    projection = Projection(str(tmp_path / "read_model.db"), indexes=("status",))
+    await projection.load()
+    yield projection
+    await projection.close()
+
+
+def test_decodes_order_service_message_as_created():
+    body = {
+        "order_id": "a1", "product_name": "Товар", "quantity": 2, "customer_name": "Иван",
+        "customer_email": "i@example.com", "status": "created", "created_at": "2024-05-01T12:00:00+00:00",
+    }
+    event = decode_event(json.dumps(body).encode(), "application/json")
+
+    assert (event.type, event.id, event.version) == (CREATED, "a1", 1)
+    assert event.data["id"] == "a1"
+    assert event.occurred_at == "2024-05-01T12:00:00.000000Z"
+
+
+@pytest.mark.asyncio
+async def test_applies_batch_then_acks_and_saves_stream_offset(projection):
+    messages = [
+        FakeMessage(make_event(CREATED, "order", 1, 1, {"status": "created", "created_at": "2024-05-01T12:00:00Z"}), offset=5),
+        FakeMessage({"not": "an event"}, offset=6),
+        FakeMessage(make_event(CREATED, "recipe", 1, 1, {}), offset=7),
+        FakeMessage(make_event(UPDATED, "order", 1, 2, {"status": "paid"}), offset=8),
+    ]
+    stream = FakeQueue(messages)
+    consumer = ProjectionConsumer(
+        projection,
+        [QueueSpec("orders_queue", arguments={"x-queue-type": "stream"})],
+        batch_size=100,
+    )
+    consumer.channel = AsyncMock()
+    consumer.channel.declare_queue.return_value = stream
+
+    task = asyncio.create_task(consumer.consume())
+    await asyncio.sleep(0.05)
+    consumer.stop()
+    await task
+
+    # Снимка не было: поток читается с начала
+    assert stream.consume_arguments == {"x-stream-offset": "first"}
+    assert projection.get(1)["status"] == "paid"
+    assert projection.offsets == {"orders_queue": 8}
+    assert [message.acks for message in messages] == [[], [], [], [True]]
+    assert consumer.start_offset("orders_queue") == 9
+
+
+@pytest.mark.asyncio
+async def test_classic_queue_consumed_without_offset(projection):
+    queue = FakeQueue([FakeMessage(make_event(CREATED, "order", 1, 1, {"created_at": datetime.now(UTC).isoformat()}))])
+    consumer = ProjectionConsumer(projection, [QueueSpec("orders_q")])
+    consumer.channel = AsyncMock()
+    consumer.channel.declare_queue.return_value = queue
+
+    task = asyncio.create_task(consumer.consume())
+    await asyncio.sleep(0.05)
+    consumer.stop()
+    await task
+
+    consumer.channel.declare_queue.assert_awaited_once_with("orders_q", durable=True, arguments=None)
+    assert queue.consume_arguments is None
+    assert len(projection) == 1
+    assert projection.offsets == {}
+
+
+def test_order_queues_must_be_streams(monkeypatch):
+    monkeypatch.delenv("ORDER_EVENTS_QUEUE_TYPE", raising=False)
+    monkeypatch.delenv("ORDERS_QUEUE_TYPE", raising=False)
+    assert [queue.arguments for queue in order_queues(["orders_q"])] == [{"x-queue-type": "stream"}]
+    # Обычную orders_queue read model забирал бы у телеграм-бота
+    with pytest.raises(ValueError, match="orders_queue"):
+        order_queues(["orders_q", "orders_queue"])
+
+    monkeypatch.setenv("ORDERS_QUEUE_TYPE", "stream")
+    assert all(queue.is_stream for queue in order_queues(["orders_q", "orders_queue"]))
+    monkeypatch.setenv("ORDER_EVENTS_QUEUE_TYPE", "classic")
+    with pytest.raises(ValueError, match="orders_q$"):
+        order_queues(["orders_q"])
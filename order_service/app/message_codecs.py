@@ -0,0 +1,39 @@
+from common.messaging import codecs
+from common.messaging.codecs import BINARY_ORDER_CONTENT_TYPE as BINARY_CONTENT_TYPE, JSON_CONTENT_TYPE  # noqa: F401
+
+from app.models import Order
+
+
+def order_message(order: Order) -> dict:
+    """Тело события о новом заказе; формат общий для всех кодеков, см. common.messaging.codecs."""
+    return {
+        "order_id": order.id,
+        "product_name": order.product_name,
+        "quantity": order.quantity,
+        "customer_name": order.customer_name,
+        "customer_email": order.customer_email,
+        "status": order.status.value,
+        "created_at": order.created_at.isoformat()
+    }
+
+
+class JsonOrderCodec(codecs.JsonCodec):
+    def encode(self, order: Order) -> bytes:
+        return super().encode(order_message(order))
+
+
+class BinaryOrderCodec(codecs.BinaryOrderCodec):
+    def encode(self, order: Order) -> bytes:
+        # Время передаётся как datetime, без лишнего круга через isoformat
+        return super().encode({**order_message(order), "created_at": order.created_at})
+
+
+ORDER_CODECS = {codec.content_type: codec for codec in (JsonOrderCodec(), BinaryOrderCodec())}
+
+
+def codec_by_name(name: str):
+    """Кодек заказов по имени из RABBITMQ_CODEC (json, binary)."""
+    return ORDER_CODECS[codecs.codec_by_name(name).content_type]
+
+
+decode_order = codecs.decode
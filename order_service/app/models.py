@@ -1,14 +1,26 @@
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
+from typing import List, Optional
+
+from common.messaging.codecs import MAX_QUANTITY, MAX_STRING_BYTES, MIN_QUANTITY
 
 
 class CreateOrderRequest(BaseModel):
+    # Пределы бинарного формата сообщений: иначе заказ сохранится, а
+    # публикация упадёт уже после этого
     product_name: str
-    quantity: int
+    quantity: int = Field(ge=MIN_QUANTITY, le=MAX_QUANTITY)
     customer_name: str
     customer_email: str
 
+    @field_validator("product_name", "customer_name", "customer_email")
+    @classmethod
+    def fits_message(cls, value: str) -> str:
+        if len(value.encode()) > MAX_STRING_BYTES:
+            raise ValueError(f"не длиннее {MAX_STRING_BYTES} байт в UTF-8")
+        return value
+
 
 class OrderStatus(str, Enum):
     CREATED = "created"
@@ -25,3 +37,8 @@ class Order(BaseModel):
     customer_email: str
     status: OrderStatus
     created_at: datetime
+
+
+class OrderPage(BaseModel):
+    next: Optional[str]
+    results: List[Order]
@@ -1,39 +1,84 @@
-import aio_pika
-import json
+import time
+from typing import Optional
 
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.message_codecs import codec_by_name
 from app.models import Order
+from common import tracing
+from common.messaging import ORDERS_QUEUE, AsyncPublisher, QueueSpec, Topology
+from common.messaging import BrokerUnavailable  # noqa: F401 - реэкспорт для app.main
+from common.partitioning import PartitionedTopology
+
+PUBLISHED = Counter("order_service_published_total", "Заказов, подтверждённых брокером")
+PUBLISH_ERRORS = Counter("order_service_publish_errors_total", "Неудачных публикаций заказов")
+REJECTED = Counter("order_service_rejected_total", "Заказов, отклонённых без публикации", ["reason"])
+IN_FLIGHT = Gauge("order_service_publish_in_flight", "Публикации, ожидающие подтверждения брокером")
+BROKER_BLOCKED = Gauge("order_service_broker_blocked", "1, если брокер приостановил публикации (connection.blocked)")
+PUBLISH_SECONDS = Histogram(
+    "order_service_publish_seconds",
+    "Время публикации заказа до подтверждения брокером, включая ожидание в пачке",
+)
+
+
+class RabbitMQClient(AsyncPublisher):
+    """
+    Публикация созданных заказов в orders_queue (или её партиции).
 
+    Соединение, пачки, подтверждения и допуск публикаций - в
+    common.messaging.AsyncPublisher; здесь кодек, маршрут и метрики сервиса.
+    """
 
-class RabbitMQClient:
-    def __init__(self):
-        self.connection = None
-        self.channel = None
+    def __init__(
+        self,
+        codec: str = "json",
+        partitioning: Optional[PartitionedTopology] = None,
+        queue_arguments: Optional[dict] = None,
+        **options,
+    ):
+        # x-queue-type для quorum/stream, см. common.queues
+        super().__init__(topology=Topology([QueueSpec(ORDERS_QUEUE, arguments=queue_arguments)]), **options)
+        self.codec = codec_by_name(codec)
+
+        # С партициями заказы идут через обменник в orders_queue.p<N> по ключу
+        # клиента, иначе - в единственную orders_queue
+        self.partitioning = partitioning
+        self.exchange = None
+        IN_FLIGHT.set_function(lambda: self.in_flight)
+        BROKER_BLOCKED.set_function(lambda: float(self.blocked))
 
     async def connect(self, rabbitmq_url: str):
-        self.connection = await aio_pika.connect_robust(rabbitmq_url)
-        self.channel = await self.connection.channel()
-        await self.channel.declare_queue("orders_queue", durable=True)
+        await super().connect(rabbitmq_url)
+        if self.partitioning is not None:
+            self.exchange = await self.partitioning.declare(self.channel)
+        else:
+            await self.declare_queue(ORDERS_QUEUE)
+
+    def on_rejected(self, reason: str):
+        REJECTED.labels(reason).inc()
+
+    def _route(self, order: Order):
+        if self.partitioning is not None:
+            return self.exchange, self.partitioning.routing_key(order.customer_email)
+        return self.channel.default_exchange, ORDERS_QUEUE
 
     async def publish_order_created(self, order: Order):
-        if self.channel is None:
-            raise Exception("Не удалось подключиться к каналу RabbitMQ...")
-
-        message_body = json.dumps({
-            "order_id": order.id,
-            "product_name": order.product_name,
-            "quantity": order.quantity,
-            "customer_name": order.customer_name,
-            "customer_email": order.customer_email,
-            "status": order.status.value,
-            "created_at": order.created_at.isoformat()
-        })
-
-        message = aio_pika.Message(
-            body=message_body.encode(),
-            delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-        )
-        await self.channel.default_exchange.publish(message, routing_key="orders_queue")
-
-    async def close(self):
-        if self.connection:
-            await self.connection.close()
+        self.check_available()
+
+        started = time.perf_counter()
+        try:
+            # Span публикации создаёт инструментирование aio-pika; message_id
+            # (он же id заказа) попадает в его атрибуты
+            exchange, routing_key = self._route(order)
+            message = self.build_message(
+                self.codec.encode(order),
+                content_type=self.codec.content_type,
+                message_id=order.id,
+                headers=tracing.inject({}),
+            )
+            await self.publish(message, routing_key, exchange)
+        except Exception:
+            PUBLISH_ERRORS.inc()
+            raise
+        PUBLISH_SECONDS.observe(time.perf_counter() - started)
+        PUBLISHED.inc()
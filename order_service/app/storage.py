@@ -0,0 +1,304 @@
+"""
+Хранилище заказов order_service.
+
+OrderRepository задаёт интерфейс и общую часть: одиночные add() из
+параллельных запросов собираются в пачки по размеру/времени (как
+микробатчинг публикаций в RabbitMQClient) и записываются одной
+транзакцией через _insert_many(). Реализации:
+
+- SqliteOrderRepository - stdlib sqlite3 в отдельном потоке, для локального
+  запуска и тестов;
+- PostgresOrderRepository - пул соединений asyncpg.
+
+Списки отдаются постранично по ключу (created_at, id), как в Django-сервисе.
+"""
+import asyncio
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC
+from typing import List, Optional, Sequence, Tuple
+
+from app.models import Order, OrderPage
+
+COLUMNS = ("id", "product_name", "quantity", "customer_name", "customer_email", "status", "created_at")
+
+
+def encode_cursor(order: Order) -> str:
+    values = [order.created_at.isoformat(), order.id]
+    return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, order_id = json.loads(urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), str(order_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+class OrderRepository(ABC):
+    def __init__(self, max_batch_size: int = 100, max_batch_delay: float = 0.002):
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self._pending = None
+        self._flusher = None
+
+    @abstractmethod
+    async def connect(self):
+        ...
+
+    @abstractmethod
+    async def _close(self):
+        ...
+
+    @abstractmethod
+    async def _insert_many(self, orders: Sequence[Order]):
+        ...
+
+    @abstractmethod
+    async def get(self, order_id: str) -> Optional[Order]:
+        ...
+
+    @abstractmethod
+    async def delete(self, order_id: str):
+        ...
+
+    @abstractmethod
+    async def _fetch_page(self, after: Optional[Tuple[datetime, str]], limit: int) -> List[Order]:
+        ...
+
+    async def add(self, order: Order):
+        """Сохраняет заказ; возвращается после коммита пачки, в которую он попал."""
+        if self._flusher is None:
+            self._pending = asyncio.Queue()
+            self._flusher = asyncio.create_task(self._flush_loop())
+        saved = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((order, saved))
+        await saved
+
+    async def add_many(self, orders: Sequence[Order]):
+        await self._insert_many(orders)
+
+    async def list(self, limit: int = 100, cursor: Optional[str] = None) -> OrderPage:
+        after = decode_cursor(cursor) if cursor else None
+        # Лишняя строка показывает, есть ли следующая страница, без COUNT(*)
+        rows = await self._fetch_page(after, limit + 1)
+        page = rows[:limit]
+        return OrderPage(next=encode_cursor(page[-1]) if len(rows) > limit else None, results=page)
+
+    async def _collect_batch(self):
+        batch = [await self._pending.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_batch_delay
+
+        while len(batch) < self.max_batch_size and batch[-1] is not None:
+            if not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._pending.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush_loop(self):
+        while True:
+            batch = await self._collect_batch()
+            # None - сигнал остановки от close()
+            stopping = batch[-1] is None
+            items = [item for item in batch if item is not None]
+            if items:
+                try:
+                    await self._insert_many([order for order, _ in items])
+                except Exception as e:
+                    for _, saved in items:
+                        if not saved.done():
+                            saved.set_exception(e)
+                else:
+                    for _, saved in items:
+                        if not saved.done():
+                            saved.set_result(None)
+            if stopping:
+                return
+
+    async def close(self):
+        if self._flusher is not None:
+            self._pending.put_nowait(None)
+            await self._flusher
+            self._flusher = None
+        await self._close()
+
+
+class SqliteOrderRepository(OrderRepository):
+    def __init__(self, path: str = "orders.db", **options):
+        super().__init__(**options)
+        self.path = path
+        self.db = None
+        # Один поток на соединение: sqlite3 не любит параллельный доступ, а
+        # запросы не блокируют цикл событий
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orders-sqlite")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _connect_sync(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            "id TEXT PRIMARY KEY, product_name TEXT NOT NULL, quantity INTEGER NOT NULL, "
+            "customer_name TEXT NOT NULL, customer_email TEXT NOT NULL, "
+            "status TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS orders_created_at_id ON orders (created_at, id)")
+        self.db.commit()
+
+    async def connect(self):
+        await self._run(self._connect_sync)
+
+    @staticmethod
+    def _row(order: Order) -> tuple:
+        # Время в UTC с микросекундами: строки сравниваются так же, как моменты
+        created_at = order.created_at.astimezone(UTC).isoformat(timespec="microseconds")
+        return (
+            order.id, order.product_name, order.quantity, order.customer_name,
+            order.customer_email, order.status.value, created_at,
+        )
+
+    @staticmethod
+    def _order(row: tuple) -> Order:
+        return Order(**dict(zip(COLUMNS, row)))
+
+    def _insert_sync(self, rows: List[tuple]):
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR IGNORE INTO orders ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+
+    async def _insert_many(self, orders: Sequence[Order]):
+        await self._run(self._insert_sync, [self._row(order) for order in orders])
+
+    def _select_sync(self, query: str, params: tuple) -> List[tuple]:
+        # sqlite3 кэширует подготовленные запросы по тексту (cached_statements)
+        return self.db.execute(query, params).fetchall()
+
+    async def get(self, order_id: str) -> Optional[Order]:
+        rows = await self._run(self._select_sync, f"SELECT {', '.join(COLUMNS)} FROM orders WHERE id = ?", (order_id,))
+        return self._order(rows[0]) if rows else None
+
+    def _delete_sync(self, order_id: str):
+        with self.db:
+            self.db.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+
+    async def delete(self, order_id: str):
+        await self._run(self._delete_sync, order_id)
+
+    async def _fetch_page(self, after: Optional[Tuple[datetime, str]], limit: int) -> List[Order]:
+        if after is None:
+            query = f"SELECT {', '.join(COLUMNS)} FROM orders ORDER BY created_at, id LIMIT ?"
+            params = (limit,)
+        else:
+            query = (
+                f"SELECT {', '.join(COLUMNS)} FROM orders WHERE (created_at, id) > (?, ?) "
+                "ORDER BY created_at, id LIMIT ?"
+            )
+            created_at = after[0].astimezone(UTC).isoformat(timespec="microseconds")
+            params = (created_at, after[1], limit)
+        return [self._order(row) for row in await self._run(self._select_sync, query, params)]
+
+    async def _close(self):
+        if self.db is not None:
+            await self._run(self.db.close)
+            self.db = None
+        self._executor.shutdown(wait=False)
+
+
+class PostgresOrderRepository(OrderRepository):
+    """
+    asyncpg кэширует подготовленные запросы на каждом соединении пула
+    (statement_cache_size), поэтому повторяющиеся SELECT/INSERT разбираются
+    сервером один раз на соединение.
+    """
+
+    def __init__(self, dsn: str, min_size: int = 2, max_size: int = 10, **options):
+        super().__init__(**options)
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+
+    async def connect(self):
+        # asyncpg нужен только этому бэкенду
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        async with self.pool.acquire() as connection:
+            await connection.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                "id TEXT PRIMARY KEY, product_name TEXT NOT NULL, quantity INTEGER NOT NULL, "
+                "customer_name TEXT NOT NULL, customer_email TEXT NOT NULL, "
+                "status TEXT NOT NULL, created_at TIMESTAMPTZ NOT NULL)"
+            )
+            await connection.execute("CREATE INDEX IF NOT EXISTS orders_created_at_id ON orders (created_at, id)")
+
+    @staticmethod
+    def _order(record) -> Order:
+        return Order(**dict(record))
+
+    async def _insert_many(self, orders: Sequence[Order]):
+        rows = [
+            (
+                order.id, order.product_name, order.quantity, order.customer_name,
+                order.customer_email, order.status.value, order.created_at,
+            )
+            for order in orders
+        ]
+        async with self.pool.acquire() as connection:
+            await connection.executemany(
+                f"INSERT INTO orders ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join(f'${i}' for i in range(1, len(COLUMNS) + 1))}) "
+                "ON CONFLICT (id) DO NOTHING",
+                rows,
+            )
+
+    async def get(self, order_id: str) -> Optional[Order]:
+        record = await self.pool.fetchrow(f"SELECT {', '.join(COLUMNS)} FROM orders WHERE id = $1", order_id)
+        return self._order(record) if record else None
+
+    async def delete(self, order_id: str):
+        await self.pool.execute("DELETE FROM orders WHERE id = $1", order_id)
+
+    async def _fetch_page(self, after: Optional[Tuple[datetime, str]], limit: int) -> List[Order]:
+        if after is None:
+            records = await self.pool.fetch(
+                f"SELECT {', '.join(COLUMNS)} FROM orders ORDER BY created_at, id LIMIT $1", limit,
+            )
+        else:
+            records = await self.pool.fetch(
+                f"SELECT {', '.join(COLUMNS)} FROM orders WHERE (created_at, id) > ($1, $2) "
+                "ORDER BY created_at, id LIMIT $3",
+                after[0], after[1], limit,
+            )
+        return [self._order(record) for record in records]
+
+    async def _close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+
+def create_repository(url: str, **options) -> OrderRepository:
+    """sqlite:///path/to/orders.db (sqlite:///:memory: для тестов) или postgresql://..."""
+    if url.startswith("sqlite://"):
+        return SqliteOrderRepository(url[len("sqlite:///"):] or ":memory:", **options)
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresOrderRepository(url, **options)
+    raise ValueError(f"Неподдерживаемое хранилище заказов: {url}")
@@ -0,0 +1,40 @@
+from datetime import datetime, UTC
+
+import pytest
+
+from common.events import CREATED, DELETED, UPDATED, VersionTracker, make_event, parse_event
+
+
+def test_make_and_parse_event():
+    body = make_event(UPDATED, "order", 7, 2, {"status": "paid"}, occurred_at=datetime(2024, 5, 1, 12, tzinfo=UTC))
+
+    assert body["occurred_at"] == "2024-05-01T12:00:00.000000Z"
+    event = parse_event(body)
+    assert event.key == ("order", "7")
+    assert event.version == 2
+    assert event.data == {"status": "paid"}
+    assert "data" not in make_event(DELETED, "order", 7, 3, {"status": "paid"})
+
+
+@pytest.mark.parametrize("body", [
+    {"id": 1},
+    {"schema": 1, "type": "moved", "entity": "order", "id": 1, "version": 1},
+    {"schema": 1, "type": CREATED, "entity": "order", "version": 1},
+    [1, 2],
+])
+def test_parse_event_rejects_foreign_bodies(body):
+    with pytest.raises(ValueError):
+        parse_event(body)
+
+
+def test_version_tracker_drops_stale_and_duplicate_events():
+    tracker = VersionTracker()
+    v1 = parse_event(make_event(CREATED, "recipe", 1, 1, {"title": "x"}))
+    v2 = parse_event(make_event(UPDATED, "recipe", 1, 2, {"title": "y"}))
+    other = parse_event(make_event(CREATED, "order", 1, 1, {}))
+
+    assert tracker.accept(v2)
+    assert not tracker.accept(v1)
+    assert not tracker.accept(v2)
+    assert tracker.accept(other)
+    assert tracker.version(v1) == 2
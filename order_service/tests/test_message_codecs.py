@@ -0,0 +1,56 @@
+import json
+from datetime import datetime, UTC
+
+import pytest
+
+from app.message_codecs import BINARY_CONTENT_TYPE, BinaryOrderCodec, JsonOrderCodec, decode_order
+from app.models import Order, OrderStatus
+
+
+@pytest.fixture
+def order():
+    return Order(
+        id="0b7e7dd2-4a4e-4f0e-9d7e-2f1c9e0c6b1a",
+        product_name="Кофе",
+        quantity=3,
+        customer_name="Test Customer",
+        customer_email="test@example.com",
+        status=OrderStatus.PROCESSING,
+        created_at=datetime(2025, 9, 6, 14, 0, 0, 123456, tzinfo=UTC)
+    )
+
+
+def test_binary_codec_matches_json(order):
+    binary = BinaryOrderCodec().encode(order)
+    text = JsonOrderCodec().encode(order)
+
+    assert len(binary) < len(text)
+    assert decode_order(binary, BINARY_CONTENT_TYPE) == json.loads(text)
+
+
+def test_message_without_content_type_is_json(order):
+    body = JsonOrderCodec().encode(order)
+
+    assert decode_order(body, None)["order_id"] == order.id
+
+
+def test_unknown_content_type():
+    with pytest.raises(ValueError):
+        decode_order(b"", "application/xml")
+
+
+@pytest.mark.parametrize("field, value, valid", [
+    ("quantity", 2 ** 31 - 1, True),
+    ("quantity", -(2 ** 31), True),
+    ("quantity", 2 ** 31, False),
+    ("quantity", -(2 ** 31) - 1, False),
+    ("product_name", "я" * (2 ** 15 - 1) + "x", True),
+    ("product_name", "я" * 2 ** 15, False),
+])
+def test_binary_format_limits(order, field, value, valid):
+    order = order.model_copy(update={field: value})
+    if valid:
+        assert decode_order(BinaryOrderCodec().encode(order), BINARY_CONTENT_TYPE)[field] == value
+    else:
+        with pytest.raises(ValueError):
+            BinaryOrderCodec().encode(order)
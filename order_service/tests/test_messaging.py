@@ -0,0 +1,42 @@
+import pytest
+
+from common.messaging import (
+    JSON_CONTENT_TYPE,
+    ORDER_EVENTS_QUEUE,
+    ORDERS_QUEUE,
+    RECIPE_EVENTS_QUEUE,
+    RECIPES_EXCHANGE,
+    codec_by_name,
+    decode,
+    default_topology,
+    get_codec,
+)
+
+
+def test_default_topology_declares_all_queues_durable(monkeypatch):
+    monkeypatch.setenv("ORDERS_QUEUE_TYPE", "quorum")
+    monkeypatch.delenv("ORDER_EVENTS_QUEUE_TYPE", raising=False)
+    topology = default_topology()
+
+    assert topology.queue(ORDERS_QUEUE).arguments == {"x-queue-type": "quorum"}
+    # События заказов по умолчанию - поток, который может читать каждый экземпляр read model
+    assert topology.queue(ORDER_EVENTS_QUEUE).is_stream
+    assert all(topology.queue(name).durable for name in (ORDERS_QUEUE, ORDER_EVENTS_QUEUE, RECIPE_EVENTS_QUEUE))
+    assert topology.exchange(RECIPES_EXCHANGE).queues == (RECIPE_EVENTS_QUEUE,)
+    # Очереди вне описания (партиции, повторы) объявляются durable без аргументов
+    assert topology.queue("orders_queue.p3").durable
+    with pytest.raises(ValueError):
+        topology.exchange("unknown")
+
+
+def test_codec_registry():
+    binary = codec_by_name("binary")
+
+    assert get_codec(None).content_type == JSON_CONTENT_TYPE
+    assert decode(b'{"id": 1}', None) == {"id": 1}
+    with pytest.raises(ValueError):
+        get_codec("application/xml")
+    with pytest.raises(ValueError):
+        codec_by_name("xml")
+    with pytest.raises(ValueError):
+        decode(b"\x01", binary.content_type)
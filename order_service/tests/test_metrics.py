@@ -0,0 +1,20 @@
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.main import app
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=")
+    assert "order_service_publish_seconds" in response.text
+
+
+def test_metrics_are_registered_once():
+    # Метрики регистрируются в общем реестре prometheus_client при первом импорте модуля
+    assert REGISTRY.get_sample_value("order_service_published_total") is not None
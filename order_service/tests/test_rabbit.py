@@ -1,10 +1,18 @@
+import asyncio
 from datetime import datetime, UTC
+from types import SimpleNamespace
 from unittest.mock import AsyncMock
 
+import aiormq
+import httpx
 import pytest
 
-from app.rabbit_client import RabbitMQClient
+from app.main import app
+from app.rabbit_client import BrokerUnavailable, RabbitMQClient
 from app.models import Order, OrderStatus
+from app.storage import SqliteOrderRepository
+from common.messaging import AsyncPublisher
+from common.partitioning import PartitionedTopology
 
 
 @pytest.mark.asyncio
@@ -35,3 +43,288 @@ async def test_publish_order_created():
 
     assert message.delivery_mode == 2
     assert "test-id" in message.body.decode()
+    assert message.message_id == "test-id"
+
+
+def make_order(order_id: str) -> Order:
+    return Order(
+        id=order_id,
+        product_name="Test Product",
+        quantity=1,
+        customer_name="Test Customer",
+        customer_email="test@example.com",
+        status=OrderStatus.CREATED,
+        created_at=datetime.now(UTC)
+    )
+
+
+@pytest.mark.asyncio
+async def test_batched_publish_confirms_each_caller():
+    mock_channel = AsyncMock()
+    rabbitmq_client = RabbitMQClient(batching=True, max_batch_size=2, max_unconfirmed=1)
+    rabbitmq_client.channel = mock_channel
+
+    await asyncio.gather(*(
+        rabbitmq_client.publish_order_created(make_order(f"id-{i}")) for i in range(5)
+    ))
+
+    assert mock_channel.default_exchange.publish.call_count == 5
+    bodies = [call[0][0].body.decode() for call in mock_channel.default_exchange.publish.call_args_list]
+    assert all(f"id-{i}" in body for i, body in enumerate(bodies))
+    await rabbitmq_client.close()
+
+
+@pytest.mark.asyncio
+async def test_batching_sends_at_once_on_idle_channel_and_coalesces_while_busy():
+    release = asyncio.Event()
+
+    async def publish(message, routing_key):
+        await release.wait()
+
+    mock_channel = AsyncMock()
+    mock_channel.default_exchange.publish.side_effect = publish
+    # Задержка пачки заведомо больше таймаута теста
+    rabbitmq_client = RabbitMQClient(batching=True, max_batch_delay=60)
+    rabbitmq_client.channel = mock_channel
+    batch_sizes = []
+    publish_batch = rabbitmq_client._publish_batch
+
+    async def record_batch(batch):
+        batch_sizes.append(len(batch))
+        await publish_batch(batch)
+
+    rabbitmq_client._publish_batch = record_batch
+
+    first = asyncio.create_task(rabbitmq_client.publish_order_created(make_order("first")))
+    await asyncio.sleep(0.01)
+    # Канал был свободен - первое сообщение ушло, не дожидаясь max_batch_delay
+    assert batch_sizes == [1]
+
+    rest = [asyncio.create_task(rabbitmq_client.publish_order_created(make_order(f"id-{i}"))) for i in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.wait_for(asyncio.gather(first, *rest), 1)
+
+    # Пока первая пачка ждала подтверждения, остальные собрались в одну
+    assert batch_sizes == [1, 3]
+    await rabbitmq_client.close()
+
+
+@pytest.mark.asyncio
+async def test_batched_publish_propagates_nack():
+    mock_channel = AsyncMock()
+    mock_channel.default_exchange.publish.side_effect = RuntimeError("nack")
+    rabbitmq_client = RabbitMQClient(batching=True)
+    rabbitmq_client.channel = mock_channel
+
+    with pytest.raises(RuntimeError):
+        await rabbitmq_client.publish_order_created(make_order("id-1"))
+    await rabbitmq_client.close()
+
+
+@pytest.mark.asyncio
+async def test_partitioned_publish_routes_by_customer():
+    mock_channel = AsyncMock()
+    rabbitmq_client = RabbitMQClient(partitioning=PartitionedTopology(4))
+    rabbitmq_client.channel = mock_channel
+    rabbitmq_client.exchange = AsyncMock()
+
+    orders = [make_order(f"id-{i}") for i in range(6)]
+    for i, order in enumerate(orders):
+        order.customer_email = f"customer-{i % 2}@example.com"
+        await rabbitmq_client.publish_order_created(order)
+
+    routing_keys = [call.kwargs["routing_key"] for call in rabbitmq_client.exchange.publish.call_args_list]
+    assert len(routing_keys) == 6
+    assert all(key in {"0", "1", "2", "3"} for key in routing_keys)
+    # Заказы одного клиента всегда в одной партиции
+    assert len(set(routing_keys[0::2])) == 1
+    assert len(set(routing_keys[1::2])) == 1
+    mock_channel.default_exchange.publish.assert_not_called()
+
+
+def blocked_connection(blocked: bool):
+    # Соединение aiormq: ready() ждёт, пока брокер не снимет connection.blocked
+    unblocked = asyncio.Event()
+    if not blocked:
+        unblocked.set()
+
+    async def ready():
+        await unblocked.wait()
+
+    return SimpleNamespace(transport=SimpleNamespace(connection=SimpleNamespace(ready=ready)))
+
+
+def test_installed_aiormq_reports_blocked_state_through_ready():
+    assert asyncio.iscoroutinefunction(aiormq.Connection.ready)
+
+
+def test_connection_without_ready_is_logged_once(caplog):
+    rabbitmq_client = RabbitMQClient()
+    rabbitmq_client.connection = SimpleNamespace(transport=SimpleNamespace(connection=object()))
+
+    assert not rabbitmq_client.blocked
+    assert not rabbitmq_client.blocked
+    assert len([record for record in caplog.records if "connection.blocked" in record.getMessage()]) == 1
+
+
+@pytest.mark.asyncio
+async def test_sheds_load_when_broker_blocked_or_overloaded():
+    release = asyncio.Event()
+
+    async def hanging_publish(message, routing_key):
+        await release.wait()
+
+    mock_channel = AsyncMock()
+    mock_channel.default_exchange.publish.side_effect = hanging_publish
+    rabbitmq_client = RabbitMQClient(max_in_flight=1, publish_timeout=0.05, retry_after=2)
+    rabbitmq_client.channel = mock_channel
+
+    rabbitmq_client.connection = blocked_connection(True)
+    with pytest.raises(BrokerUnavailable) as blocked:
+        await rabbitmq_client.publish_order_created(make_order("blocked"))
+    assert blocked.value.reason == "blocked"
+    mock_channel.default_exchange.publish.assert_not_called()
+
+    rabbitmq_client.connection = blocked_connection(False)
+    first = asyncio.create_task(rabbitmq_client.publish_order_created(make_order("first")))
+    await asyncio.sleep(0)
+    assert rabbitmq_client.unavailable_reason() == "overloaded"
+    with pytest.raises(BrokerUnavailable):
+        await rabbitmq_client.publish_order_created(make_order("second"))
+
+    # Зависшая публикация не держит запрос дольше publish_timeout
+    with pytest.raises(BrokerUnavailable) as timeout:
+        await first
+    assert timeout.value.reason == "timeout"
+    assert rabbitmq_client.in_flight == 0
+    assert rabbitmq_client.unavailable_reason() is None
+
+
+@pytest.mark.asyncio
+async def test_batches_count_towards_in_flight_limit():
+    release = asyncio.Event()
+
+    async def hanging_publish(message, routing_key):
+        await release.wait()
+
+    mock_channel = AsyncMock()
+    mock_channel.default_exchange.publish.side_effect = hanging_publish
+    publisher = AsyncPublisher(max_in_flight=3)
+    publisher.channel = mock_channel
+
+    def batch(size):
+        return [("", "orders_q", publisher.build_message(b"{}")) for _ in range(size)]
+
+    # Пачка больше предела не проходит даже на простаивающем издателе
+    with pytest.raises(ValueError):
+        await publisher.publish_many(batch(4))
+    assert publisher.unavailable_reason(4) == "overloaded"
+
+    first = asyncio.create_task(publisher.publish_many(batch(2)))
+    await asyncio.sleep(0)
+    with pytest.raises(BrokerUnavailable) as overloaded:
+        await publisher.publish_many(batch(2))
+    assert overloaded.value.reason == "overloaded"
+    assert publisher.unavailable_reason(1) is None
+
+    release.set()
+    await first
+    assert mock_channel.default_exchange.publish.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_unavailable_broker_returns_503_and_fails_readiness():
+    rabbitmq_client = RabbitMQClient(retry_after=1.5)
+    rabbitmq_client.channel = AsyncMock()
+    rabbitmq_client.connection = blocked_connection(True)
+    app.state.rabbitmq_client = rabbitmq_client
+    app.state.order_repository = AsyncMock()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        created = await http.post(
+            "/orders",
+            json={"product_name": "Tea", "quantity": 1, "customer_name": "Jane", "customer_email": "jane@example.com"},
+        )
+        ready = await http.get("/health/ready")
+        rabbitmq_client.connection = blocked_connection(False)
+        ready_again = await http.get("/health/ready")
+
+    assert created.status_code == 503
+    assert created.headers["Retry-After"] == "2"
+    app.state.order_repository.add.assert_not_called()
+    assert ready.status_code == 503 and ready.json()["reason"] == "blocked"
+    assert ready_again.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_removes_saved_order():
+    async def hanging_publish(message, routing_key):
+        await asyncio.Event().wait()
+
+    mock_channel = AsyncMock()
+    mock_channel.default_exchange.publish.side_effect = hanging_publish
+    rabbitmq_client = RabbitMQClient(publish_timeout=0.05)
+    rabbitmq_client.channel = mock_channel
+    repository = SqliteOrderRepository(":memory:")
+    await repository.connect()
+    app.state.rabbitmq_client = rabbitmq_client
+    app.state.order_repository = repository
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+            created = await http.post(
+                "/orders",
+                json={"product_name": "Tea", "quantity": 1, "customer_name": "Jane", "customer_email": "jane@example.com"},
+            )
+        page = await repository.list()
+    finally:
+        await repository.close()
+
+    assert created.status_code == 503
+    assert created.json()["reason"] == "timeout"
+    # Повтор по Retry-After не оставит рядом с новым заказом старый без события
+    assert page.results == []
+
+
+@pytest.mark.asyncio
+async def test_orders_outside_message_format_are_rejected_before_saving():
+    app.state.rabbitmq_client = RabbitMQClient()
+    app.state.rabbitmq_client.channel = AsyncMock()
+    app.state.order_repository = AsyncMock()
+    order = {"product_name": "Tea", "quantity": 1, "customer_name": "Jane", "customer_email": "jane@example.com"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        responses = [
+            await http.post("/orders", json={**order, **invalid})
+            for invalid in ({"quantity": 2 ** 31}, {"customer_name": "я" * 2 ** 15})
+        ]
+
+    assert [response.status_code for response in responses] == [422, 422]
+    app.state.order_repository.add.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_timed_out_batched_message_is_not_sent_later():
+    release = asyncio.Event()
+
+    async def slow_publish(message, routing_key):
+        await release.wait()
+
+    mock_channel = AsyncMock()
+    mock_channel.default_exchange.publish.side_effect = slow_publish
+    rabbitmq_client = RabbitMQClient(batching=True, max_unconfirmed=1, publish_timeout=0.05)
+    rabbitmq_client.channel = mock_channel
+
+    first = asyncio.create_task(rabbitmq_client.publish_order_created(make_order("first")))
+    await asyncio.sleep(0.01)
+    # Второй заказ ждёт, пока брокер подтвердит первый, и не дожидается
+    with pytest.raises(BrokerUnavailable):
+        await rabbitmq_client.publish_order_created(make_order("second"))
+
+    release.set()
+    await asyncio.gather(first, return_exceptions=True)
+    await rabbitmq_client.close()
+
+    sent = [call.args[0].message_id for call in mock_channel.default_exchange.publish.call_args_list]
+    assert sent == ["first"]
@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta, UTC
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.main import app
+from app.models import Order, OrderStatus
+from app.rabbit_client import RabbitMQClient
+from app.storage import OrderRepository, SqliteOrderRepository
+
+
+def make_order(number: int) -> Order:
+    return Order(
+        id=f"order-{number:03}",
+        product_name="Tea",
+        quantity=number,
+        customer_name="Jane",
+        customer_email="jane@example.com",
+        status=OrderStatus.CREATED,
+        created_at=datetime(2024, 1, 1, tzinfo=UTC) + timedelta(microseconds=number),
+    )
+
+
+def test_repository_requires_backend_methods():
+    class Incomplete(OrderRepository):
+        async def connect(self):
+            pass
+
+    with pytest.raises(TypeError, match="_insert_many"):
+        Incomplete()
+
+
+@pytest_asyncio.fixture
+async def repository():
+    repository = SqliteOrderRepository(":memory:", max_batch_size=50)
+    await repository.connect()
+    yield repository
+    await repository.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_adds_are_batched(repository, monkeypatch):
+    batches = []
+    insert_many = repository._insert_many
+
+    async def spy(orders):
+        batches.append(len(orders))
+        await insert_many(orders)
+
+    monkeypatch.setattr(repository, "_insert_many", spy)
+    await asyncio.gather(*(repository.add(make_order(number)) for number in range(120)))
+
+    assert batches == [50, 50, 20]
+    assert await repository.get("order-007") == make_order(7)
+    assert await repository.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_all_orders(repository):
+    await repository.add_many([make_order(number) for number in reversed(range(25))])
+
+    seen = []
+    cursor = None
+    while True:
+        page = await repository.list(limit=10, cursor=cursor)
+        seen.extend(order.id for order in page.results)
+        cursor = page.next
+        if cursor is None:
+            break
+
+    assert seen == [f"order-{number:03}" for number in range(25)]
+    with pytest.raises(ValueError):
+        await repository.list(cursor="garbage")
+
+
+@pytest.mark.asyncio
+async def test_order_endpoints(repository):
+    app.state.order_repository = repository
+    rabbitmq_client = RabbitMQClient()
+    rabbitmq_client.channel = AsyncMock()
+    app.state.rabbitmq_client = rabbitmq_client
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        created = await http.post(
+            "/orders",
+            json={"product_name": "Tea", "quantity": 2, "customer_name": "Jane", "customer_email": "jane@example.com"},
+        )
+        order_id = created.json()["id"]
+        fetched = await http.get(f"/orders/{order_id}")
+        listed = await http.get("/orders", params={"limit": 1})
+        missing = await http.get("/orders/missing")
+        bad_cursor = await http.get("/orders", params={"cursor": "garbage"})
+
+    assert fetched.status_code == 200
+    assert fetched.json() == created.json()
+    assert listed.json() == {"next": None, "results": [created.json()]}
+    assert missing.status_code == 404
+    assert bad_cursor.status_code == 400
@@ -0,0 +1,73 @@
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from opentelemetry import trace
+from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.main import app
+from app.rabbit_client import RabbitMQClient
+from common import tracing
+
+
+@pytest.fixture(scope="session")
+def span_exporter():
+    # Глобальный TracerProvider OpenTelemetry задаётся один раз на процесс
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return exporter
+
+
+@pytest.fixture
+def instrumented_app(span_exporter):
+    span_exporter.clear()
+    FastAPIInstrumentor.instrument_app(app)
+    # Стек middleware собирается при первом запросе; пересобираем его с инструментированием
+    app.middleware_stack = None
+    yield app
+    FastAPIInstrumentor.uninstrument_app(app)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batching", [False, True])
+async def test_trace_context_reaches_message_headers(instrumented_app, span_exporter, batching):
+    published_under = []
+    mock_channel = AsyncMock()
+    # Span публикации aio-pika создаётся в текущем контексте вызова publish()
+    mock_channel.default_exchange.publish.side_effect = (
+        lambda *args, **kwargs: published_under.append(trace.get_current_span().get_span_context())
+    )
+    rabbitmq_client = RabbitMQClient(batching=batching)
+    rabbitmq_client.channel = mock_channel
+    app.state.rabbitmq_client = rabbitmq_client
+    app.state.order_repository = AsyncMock()
+
+    incoming = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=instrumented_app), base_url="http://test") as http:
+        for _ in range(2):
+            response = await http.post(
+                "/orders",
+                json={"product_name": "Tea", "quantity": 1, "customer_name": "Jane", "customer_email": "jane@example.com"},
+                headers={"traceparent": incoming},
+            )
+            assert response.status_code == 200
+    await rabbitmq_client.close()
+
+    request_spans = [span for span in span_exporter.get_finished_spans() if span.name == "POST /orders"]
+    assert len(request_spans) == 2
+    for request_span in request_spans:
+        assert request_span.context.trace_id == 0x0af7651916cd43dd8448eb211c80319c
+        assert request_span.parent.span_id == 0xb7ad6b7169203331
+        assert request_span.attributes["http.status_code"] == 200
+    # Пачки отправляет фоновая задача, но публикация продолжает trace своего запроса
+    assert [context.span_id for context in published_under] == [span.context.span_id for span in request_spans]
+
+    for call, request_span in zip(mock_channel.default_exchange.publish.call_args_list, request_spans):
+        context = tracing.extract(call.args[0].headers)
+        assert trace.get_current_span(context).get_span_context().span_id == request_span.context.span_id
+        assert tracing.sent_at_ns(call.args[0].headers) is not None
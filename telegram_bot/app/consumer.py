@@ -1,32 +1,158 @@
-import json
+import asyncio
+import time
+from datetime import datetime, UTC
+from typing import Optional
 
 import aio_pika
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from prometheus_client import Counter, Gauge, Histogram
 
+from common import tracing
+from common.messaging import ConsumerRunner, QueueSpec, open_channels
+from common.messaging.codecs import decode as decode_order
+from dedup import SeenCache
+from retry import RetryPolicy
 from tg_client import TelegramClient
 
+MESSAGES = Counter(
+    "telegram_bot_messages_total",
+    "Полученные сообщения по итогу обработки: processed, duplicate, retry, dead_letter",
+    ["result"],
+)
+HANDLE_SECONDS = Histogram("telegram_bot_handle_seconds", "Время обработки заказа, включая отправку в Telegram")
+ORDER_LAG = Histogram(
+    "telegram_bot_order_lag_seconds",
+    "Задержка от создания заказа до начала его обработки",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600),
+)
+BUFFERED = Gauge("telegram_bot_buffered_messages", "Сообщения, полученные от брокера и ждущие обработчика")
+
+TRACER = trace.get_tracer(__name__)
+
 
 class OrderConsumer:
-    def __init__(self, telegram_client: TelegramClient):
+    def __init__(
+        self,
+        telegram_client: TelegramClient,
+        prefetch_count: int = 100,
+        concurrency: int = 100,
+        channels: int = 1,
+        dedup: Optional[SeenCache] = None,
+        retry: Optional[RetryPolicy] = None,
+        queue_arguments: Optional[dict] = None,
+    ):
         self.telegram_client = telegram_client
         self.connection = None
         self.channel = None
 
+        # prefetch_count задаётся на каждый канал, concurrency - число
+        # параллельных обработчиков на весь consumer. Обработчик ждёт
+        # отправки в Telegram, поэтому при одном обработчике SendScheduler
+        # никогда не видел бы двух уведомлений сразу и не мог бы их склеить
+        self.prefetch_count = prefetch_count
+        self.concurrency = concurrency
+        self.channels_count = channels
+        self.channels = []
+        self._stopping = asyncio.Event()
+
+        # Повторные доставки (переподключение, requeue) отбрасываются по
+        # message_id или order_id до отправки в Telegram
+        self.dedup = dedup if dedup is not None else SeenCache()
+        self._processing = set()
+
+        # Упавшие сообщения не теряются, а повторяются с задержкой
+        self.retry = retry if retry is not None else RetryPolicy()
+        # x-queue-type для quorum/stream, см. common.queues
+        self.queue_arguments = queue_arguments
+
+    @property
+    def queue(self) -> QueueSpec:
+        return QueueSpec(self.retry.queue_name, arguments=self.queue_arguments)
+
     async def connect(self, rabbitmq_url: str):
-        self.connection = await aio_pika.connect_robust(rabbitmq_url)
-        self.channel = await self.connection.channel()
-        await self.channel.set_qos(prefetch_count=1)
+        self.dedup.load()
+        self.connection, self.channels = await open_channels(rabbitmq_url, self.channels_count, self.prefetch_count)
+        self.channel = self.channels[0]
 
     async def consume_orders(self):
-        queue = await self.channel.declare_queue("orders_queue", durable=True)
+        await self.retry.declare(self.channels[0])
+        runner = ConsumerRunner(self.handle_message, self.concurrency, buffered=BUFFERED)
+        await runner.run(self.channels, self.queue, self.prefetch_count, self._stopping)
 
-        async with queue.iterator() as queue_iter:
-            async for message in queue_iter:
-                async with message.process():
-                    try:
-                        order_data = json.loads(message.body.decode())
-                        await self.process_order(order_data)
-                    except Exception as e:
-                        print(f"Error processing message: {e}")
+    async def handle_message(self, message: aio_pika.abc.AbstractIncomingMessage, retry: Optional[RetryPolicy] = None):
+        # Каждое сообщение подтверждается отдельно, поэтому ack могут
+        # приходить в порядке завершения обработки, а не доставки
+        try:
+            await self.process_message(message, retry or self.retry)
+        except Exception as e:
+            # Не удалось даже переложить сообщение на повтор: брокер вернёт его в очередь
+            print(f"Сообщение {message.message_id} не передано на повтор: {e}")
+            await message.nack(requeue=True)
+            return
+        await message.ack()
+
+    async def process_message(self, message: aio_pika.abc.AbstractIncomingMessage, retry: RetryPolicy):
+        """Обработка без подтверждения: ack остаётся за вызывающим."""
+        # Trace продолжается от span'а публикации; время между отправкой
+        # и началом обработки (брокер и буфер consumer'а) - отдельный span
+        parent = tracing.extract(message.headers)
+        sent_at = tracing.sent_at_ns(message.headers)
+        if parent is not None and sent_at is not None:
+            tracing.record_span(f"{retry.queue_name} wait", sent_at, parent=parent, kind=SpanKind.CONSUMER)
+        with TRACER.start_as_current_span("handle order", context=parent, kind=SpanKind.CONSUMER) as current:
+            await self._handle(message, retry, current)
+
+    async def _handle(
+        self,
+        message: aio_pika.abc.AbstractIncomingMessage,
+        retry: RetryPolicy,
+        current: trace.Span,
+    ):
+        key = message.message_id
+        if key is not None and self._is_duplicate(key):
+            return
+        try:
+            with TRACER.start_as_current_span("decode"):
+                order_data = decode_order(message.body, message.content_type)
+            key = key or order_data["order_id"]
+            if self._is_duplicate(key):
+                return
+            self._observe_lag(order_data)
+            self._processing.add(key)
+            started = time.perf_counter()
+            try:
+                await self.process_order(order_data)
+            finally:
+                self._processing.discard(key)
+            HANDLE_SECONDS.observe(time.perf_counter() - started)
+            self.dedup.add(key)
+            MESSAGES.labels("processed").inc()
+        except Exception as e:
+            current.record_exception(e)
+            current.set_status(Status(StatusCode.ERROR, f"{type(e).__name__}: {e}"))
+            target = await retry.handle_failure(self.channels[0], message, e)
+            MESSAGES.labels("dead_letter" if target == retry.dlq_name else "retry").inc()
+            print(f"Error processing message: {e}; отправлено в {target}")
+
+    @staticmethod
+    def _observe_lag(order_data: dict):
+        try:
+            created = datetime.fromisoformat(str(order_data["created_at"]))
+        except (KeyError, ValueError):
+            return
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=UTC)
+        ORDER_LAG.observe((datetime.now(UTC) - created).total_seconds())
+
+    def _is_duplicate(self, key: str) -> bool:
+        # _processing закрывает случай, когда дубликат пришёл, пока первая
+        # доставка ещё обрабатывается
+        if key in self._processing or key in self.dedup:
+            print(f"Повторная доставка заказа {key}, пропускаю")
+            MESSAGES.labels("duplicate").inc()
+            return True
+        return False
 
     async def process_order(self, order_data: dict):
         message = (
@@ -42,5 +168,9 @@ class OrderConsumer:
         print(message)
         await self.telegram_client.send_message(message)
 
+    def stop(self):
+        self._stopping.set()
+
     async def close(self):
+        self.dedup.save()
         await self.connection.close()
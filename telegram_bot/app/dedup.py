@@ -0,0 +1,73 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class SeenCache:
+    """
+    Множество уже обработанных ключей (message_id / order_id) с вытеснением
+    по времени и по размеру. Ключи хранятся в порядке добавления, поэтому
+    устаревшие и лишние записи снимаются с головы за O(1).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        ttl: float = 24 * 3600,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        seen_at = self._entries.get(key)
+        if seen_at is None:
+            return False
+        if self.clock() - seen_at > self.ttl:
+            del self._entries[key]
+            return False
+        return True
+
+    def add(self, key: str):
+        self._entries[key] = self.clock()
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def _evict(self):
+        expire_before = self.clock() - self.ttl
+        while self._entries:
+            key, seen_at = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and seen_at >= expire_before:
+                break
+            self._entries.popitem(last=False)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать кэш дубликатов {self.path}: {e}")
+            return
+        self._entries = OrderedDict(sorted(entries.items(), key=lambda item: item[1]))
+        self._evict()
+
+    def save(self):
+        if not self.path:
+            return
+        self._evict()
+        # Пишем во временный файл и подменяем, чтобы не оставить обрезанный файл
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,125 @@
+import asyncio
+import random
+from typing import Dict, Optional
+
+import aio_pika
+from aiormq.exceptions import ChannelAccessRefused
+
+from common.messaging import QueueSpec
+from common.partitioning import PartitionedTopology
+from consumer import OrderConsumer
+from retry import RetryPolicy
+
+
+class PartitionClaim:
+    def __init__(self, channel, queue, consumer_tag: str, buffer: asyncio.Queue, worker: asyncio.Task):
+        self.channel = channel
+        self.queue = queue
+        self.consumer_tag = consumer_tag
+        self.buffer = buffer
+        self.worker = worker
+
+
+class PartitionedConsumer(OrderConsumer):
+    """
+    Consumer очередей-партиций orders_queue.p<N>.
+
+    Партиция захватывается эксклюзивной подпиской (basic.consume exclusive),
+    поэтому её читает ровно один экземпляр бота. Каждый экземпляр берёт до
+    max_partitions свободных партиций и раз в claim_interval пробует занять
+    оставшиеся - так партиции упавшего экземпляра подхватываются остальными.
+    Сообщения партиции обрабатываются строго по одному, что сохраняет
+    порядок заказов клиента (кроме ушедших на повтор).
+    """
+
+    def __init__(
+        self,
+        telegram_client,
+        topology: PartitionedTopology,
+        max_partitions: Optional[int] = None,
+        claim_interval: float = 5.0,
+        **options,
+    ):
+        super().__init__(telegram_client, **options)
+        self.topology = topology
+        self.max_partitions = max_partitions or topology.partitions
+        self.claim_interval = claim_interval
+        self.claims: Dict[str, PartitionClaim] = {}
+        # Повторы возвращаются в ту же партицию, из которой сообщение пришло
+        self.retry_policies = {
+            queue_name: RetryPolicy(queue_name, self.retry.delays) for queue_name in topology.queue_names()
+        }
+
+    async def consume_orders(self):
+        await self.topology.declare(self.channels[0])
+        for policy in self.retry_policies.values():
+            await policy.declare(self.channels[0])
+
+        try:
+            while not self._stopping.is_set():
+                await self.claim_partitions()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.claim_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for queue_name in list(self.claims):
+                await self.release(queue_name)
+
+    async def claim_partitions(self):
+        queue_names = self.topology.queue_names()
+        # Случайный сдвиг, чтобы стартующие одновременно экземпляры не
+        # толкались за одни и те же первые партиции
+        offset = random.randrange(len(queue_names))
+        for queue_name in queue_names[offset:] + queue_names[:offset]:
+            if len(self.claims) >= self.max_partitions:
+                return
+            if queue_name not in self.claims:
+                await self.claim(queue_name)
+
+    async def claim(self, queue_name: str) -> bool:
+        # Отказ в эксклюзивной подписке закрывает канал, поэтому у каждой
+        # партиции свой канал
+        channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=self.prefetch_count)
+        queue = await QueueSpec(queue_name, arguments=self.topology.queue_arguments).declare(channel)
+        buffer = asyncio.Queue(maxsize=self.prefetch_count)
+        try:
+            consumer_tag = await queue.consume(buffer.put, exclusive=True)
+        except ChannelAccessRefused:
+            return False
+
+        worker = asyncio.create_task(self._partition_worker(queue_name, buffer, self.retry_policies[queue_name]))
+        self.claims[queue_name] = PartitionClaim(channel, queue, consumer_tag, buffer, worker)
+        print(f"Партиция {queue_name} захвачена")
+        return True
+
+    async def release(self, queue_name: str):
+        claim = self.claims.pop(queue_name)
+        await claim.queue.cancel(claim.consumer_tag)
+        await claim.buffer.join()
+        claim.worker.cancel()
+        await asyncio.gather(claim.worker, return_exceptions=True)
+        await claim.channel.close()
+
+    async def _partition_worker(self, queue_name: str, buffer: asyncio.Queue, retry: RetryPolicy):
+        try:
+            while True:
+                message: aio_pika.abc.AbstractIncomingMessage = await buffer.get()
+                try:
+                    await self.handle_message(message, retry)
+                except Exception as e:
+                    # Например, ack на закрытом канале; партиция продолжает работать
+                    print(f"Сообщение {message.message_id} из {queue_name} не обработано: {e}")
+                finally:
+                    buffer.task_done()
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            # Без worker'а партиция не читается, а эксклюзивная подписка не
+            # даёт забрать её другим: закрытие канала снимает подписку и
+            # возвращает неподтверждённые сообщения в очередь
+            claim = self.claims.pop(queue_name, None)
+            if claim is not None:
+                await claim.channel.close()
+            raise
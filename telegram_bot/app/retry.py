@@ -0,0 +1,82 @@
+from typing import Sequence
+
+import aio_pika
+
+from common import tracing
+from common.messaging import ORDERS_QUEUE
+
+ATTEMPT_HEADER = "x-attempt"
+ERROR_HEADER = "x-last-error"
+
+# Ошибки, которые не исчезнут при повторе (битое сообщение), сразу уходят в DLQ
+PERMANENT_ERRORS = (ValueError, KeyError, TypeError)
+
+
+class RetryPolicy:
+    """
+    Отложенные повторы через очереди ожидания и очередь недоставленных.
+
+    Для каждой ступени задержки объявляется очередь `<queue>.retry.<N>s` с
+    x-message-ttl, у которой dead-letter ведёт обратно в основную очередь:
+    сообщение лежит там N секунд и возвращается на обработку. Номер попытки
+    хранится в заголовке x-attempt; после последней ступени сообщение
+    попадает в `<queue>.dlq`, откуда его можно вернуть командой replay_dlq.
+    """
+
+    def __init__(self, queue_name: str = ORDERS_QUEUE, delays: Sequence[float] = (5, 30, 300)):
+        self.queue_name = queue_name
+        self.delays = tuple(delays)
+        self.dlq_name = f"{queue_name}.dlq"
+
+    def retry_queue_name(self, delay: float) -> str:
+        return f"{self.queue_name}.retry.{delay:g}s"
+
+    async def declare(self, channel: aio_pika.abc.AbstractChannel):
+        for delay in self.delays:
+            await channel.declare_queue(
+                self.retry_queue_name(delay),
+                durable=True,
+                arguments={
+                    "x-message-ttl": int(delay * 1000),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": self.queue_name,
+                },
+            )
+        await channel.declare_queue(self.dlq_name, durable=True)
+
+    @staticmethod
+    def attempt(message: aio_pika.abc.AbstractIncomingMessage) -> int:
+        return int((message.headers or {}).get(ATTEMPT_HEADER, 0))
+
+    async def handle_failure(
+        self,
+        channel: aio_pika.abc.AbstractChannel,
+        message: aio_pika.abc.AbstractIncomingMessage,
+        error: Exception,
+    ) -> str:
+        """Перекладывает сообщение в очередь ожидания или DLQ; возвращает имя очереди."""
+        attempt = self.attempt(message) + 1
+        if isinstance(error, PERMANENT_ERRORS) or attempt > len(self.delays):
+            target = self.dlq_name
+        else:
+            target = self.retry_queue_name(self.delays[attempt - 1])
+
+        headers = dict(message.headers or {})
+        headers[ATTEMPT_HEADER] = attempt
+        headers[ERROR_HEADER] = f"{type(error).__name__}: {error}"[:500]
+        # Следующая попытка продолжит trace от неудачной обработки
+        tracing.inject(headers)
+        # Исходное сообщение подтверждается только после подтверждения копии
+        # брокером, поэтому при сбое публикации оно не теряется
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=message.body,
+                headers=headers,
+                content_type=message.content_type,
+                message_id=message.message_id,
+                timestamp=message.timestamp,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=target,
+        )
+        return target
@@ -0,0 +1,130 @@
+import asyncio
+import os
+from datetime import datetime, UTC
+from typing import List, Optional, Union
+
+import aio_pika
+from prometheus_client import Gauge
+
+from consumer import OrderConsumer
+
+STREAM_OFFSET_HEADER = "x-stream-offset"
+OFFSET_KEYWORDS = ("first", "last", "next")
+
+STREAM_OFFSET = Gauge("telegram_bot_stream_offset", "Смещение последнего обработанного сообщения потока")
+
+Offset = Union[str, int, datetime]
+
+
+def parse_offset(value: str) -> Offset:
+    """first/last/next, номер сообщения в потоке или момент времени ISO 8601."""
+    value = value.strip()
+    if value in OFFSET_KEYWORDS:
+        return value
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=UTC)
+
+
+class OffsetStore:
+    """Файл с позицией, с которой продолжить чтение после перезапуска."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[int]:
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать смещение потока {self.path}: {e}")
+            return None
+
+    def save(self, offset: int):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self.path)
+
+
+class StreamConsumer(OrderConsumer):
+    """
+    Чтение orders_queue, объявленной как RabbitMQ stream, с заданного места.
+
+    Поток не удаляет сообщения после чтения, поэтому новый consumer может
+    начать с начала истории (first), с момента времени или с номера
+    сообщения. Сообщения забираются пачками до batch_size (это же prefetch),
+    обрабатываются параллельно до concurrency и подтверждаются одним
+    ack(multiple=True) на пачку; после пачки позиция сохраняется в
+    offset_store, и перезапуск продолжает с неё.
+    """
+
+    def __init__(
+        self,
+        telegram_client,
+        offset: Offset = "next",
+        batch_size: int = 1000,
+        offset_store: Optional[OffsetStore] = None,
+        **options,
+    ):
+        super().__init__(telegram_client, **options)
+        self.offset = offset
+        self.batch_size = batch_size
+        # Брокер требует prefetch для потоков; он же ограничивает размер пачки
+        self.prefetch_count = batch_size
+        self.offset_store = offset_store
+
+    def start_offset(self) -> Offset:
+        stored = self.offset_store.load() if self.offset_store else None
+        return stored if stored is not None else self.offset
+
+    async def consume_orders(self):
+        self._messages = asyncio.Queue()
+        channel = self.channels[0]
+        await self.retry.declare(channel)
+        queue = await self.queue.declare(channel)
+        consumer_tag = await queue.consume(self._messages.put, arguments={STREAM_OFFSET_HEADER: self.start_offset()})
+        try:
+            while True:
+                batch = await self._next_batch()
+                if batch is None:
+                    break
+                await self._process_batch(batch)
+        finally:
+            # Неподтверждённый хвост не теряется: следующий запуск начнёт
+            # с сохранённой позиции
+            await queue.cancel(consumer_tag)
+
+    async def _next_batch(self) -> Optional[List[aio_pika.abc.AbstractIncomingMessage]]:
+        getter = asyncio.ensure_future(self._messages.get())
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait({getter, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+        if not getter.done():
+            getter.cancel()
+            return None
+
+        batch = [getter.result()]
+        while len(batch) < self.batch_size and not self._messages.empty():
+            batch.append(self._messages.get_nowait())
+        return batch
+
+    async def _process_batch(self, batch: List[aio_pika.abc.AbstractIncomingMessage]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(message):
+            async with semaphore:
+                await self.process_message(message, self.retry)
+
+        await asyncio.gather(*(process(message) for message in batch))
+        last = batch[-1]
+        await last.ack(multiple=True)
+
+        offset = (last.headers or {}).get(STREAM_OFFSET_HEADER)
+        if isinstance(offset, int):
+            STREAM_OFFSET.set(offset)
+            if self.offset_store:
+                self.offset_store.save(offset + 1)
@@ -1,10 +1,206 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Tuple
+
 from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+from prometheus_client import Counter, Gauge, Histogram
+
+API_REQUESTS = Counter(
+    "telegram_bot_api_requests_total",
+    "Запросы sendMessage к Telegram по результату: ok, retry_after, error",
+    ["result"],
+)
+API_SECONDS = Histogram("telegram_bot_api_seconds", "Длительность запроса sendMessage")
+SEND_QUEUE = Gauge("telegram_bot_send_queue_depth", "Уведомления, ждущие отправки в Telegram")
+
+TRACER = trace.get_tracer(__name__)
+
+# Ограничение Bot API на длину одного сообщения
+MESSAGE_LIMIT = 4096
+SEPARATOR = "\n\n"
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Режет текст на части не длиннее limit, по возможности по переводам строк."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut > 0:
+            parts.append(text[:cut])
+            text = text[cut + 1:]
+        else:
+            parts.append(text[:limit])
+            text = text[limit:]
+    parts.append(text)
+    return parts
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = asyncio.get_running_loop().time()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class SendScheduler:
+    """
+    Планировщик отправки сообщений с учётом лимитов Telegram.
+
+    Сообщения копятся в очереди своего чата. Пока чат ждёт токен или
+    retry_after после 429, новые уведомления склеиваются в одно сообщение
+    до MESSAGE_LIMIT символов. Каждый чат обслуживается отдельной задачей,
+    так что пауза одного чата не задерживает остальные.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable[None]],
+        per_chat_rate: float = 1.0,
+        per_chat_burst: float = 1.0,
+        global_rate: float = 30.0,
+        coalesce: bool = True,
+    ):
+        self.send = send
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.global_rate = global_rate
+        self.coalesce = coalesce
+        self._queues: Dict[str, Deque[Tuple[str, asyncio.Future]]] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._lanes: Dict[str, asyncio.Task] = {}
+        self._global_bucket = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def enqueue(self, chat_id: str, text: str) -> asyncio.Future:
+        # Telegram отвечает 400 на сообщение длиннее MESSAGE_LIMIT, поэтому
+        # длинное уведомление уходит несколькими сообщениями подряд
+        loop = asyncio.get_running_loop()
+        queue = self._queues.setdefault(chat_id, deque())
+        parts = []
+        for part in split_message(text):
+            delivered = loop.create_future()
+            queue.append((part, delivered))
+            parts.append(delivered)
+        if chat_id not in self._lanes:
+            self._lanes[chat_id] = asyncio.create_task(self._run_lane(chat_id))
+        return parts[0] if len(parts) == 1 else asyncio.gather(*parts)
+
+    def _take_batch(self, queue: Deque[Tuple[str, asyncio.Future]]) -> List[Tuple[str, asyncio.Future]]:
+        batch = [queue.popleft()]
+        length = len(batch[0][0])
+        while self.coalesce and queue:
+            next_length = length + len(SEPARATOR) + len(queue[0][0])
+            if next_length > MESSAGE_LIMIT:
+                break
+            batch.append(queue.popleft())
+            length = next_length
+        return batch
+
+    async def _wait_for_slot(self, chat_id: str):
+        loop = asyncio.get_running_loop()
+        if self._global_bucket is None:
+            self._global_bucket = TokenBucket(self.global_rate, self.global_rate)
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+
+        while True:
+            now = loop.time()
+            delay = max(
+                self._retry_at.get(chat_id, 0.0) - now,
+                bucket.delay(now),
+                self._global_bucket.delay(now),
+            )
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        bucket.consume()
+        self._global_bucket.consume()
+
+    async def _run_lane(self, chat_id: str):
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                await self._wait_for_slot(chat_id)
+                batch = self._take_batch(queue)
+                started = time.perf_counter()
+                try:
+                    await self.send(chat_id, SEPARATOR.join(text for text, _ in batch))
+                except TelegramRetryAfter as e:
+                    API_REQUESTS.labels("retry_after").inc()
+                    # Возвращаем пачку в начало очереди и ждём, сколько просит Telegram
+                    self._retry_at[chat_id] = asyncio.get_running_loop().time() + e.retry_after
+                    queue.extendleft(reversed(batch))
+                    continue
+                except Exception as e:
+                    API_REQUESTS.labels("error").inc()
+                    for _, delivered in batch:
+                        if not delivered.done():
+                            delivered.set_exception(e)
+                    continue
+                finally:
+                    API_SECONDS.observe(time.perf_counter() - started)
+                API_REQUESTS.labels("ok").inc()
+                for _, delivered in batch:
+                    if not delivered.done():
+                        delivered.set_result(None)
+        finally:
+            del self._lanes[chat_id]
+
+    async def close(self):
+        if self._lanes:
+            await asyncio.gather(*self._lanes.values(), return_exceptions=True)
 
 
 class TelegramClient:
-    def __init__(self, bot_token: str, chat_id: str):
+    def __init__(self, bot_token: str, chat_id: str, **scheduler_options):
         self.bot = Bot(token=bot_token)
         self.chat_id = chat_id
+        self.scheduler_options = scheduler_options
+        self.scheduler = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.scheduler.queue_depth if self.scheduler else 0
+
+    async def _send(self, chat_id: str, text: str):
+        await self.bot.send_message(chat_id=chat_id, text=text)
 
     async def send_message(self, message: str):
-        await self.bot.send_message(chat_id=self.chat_id, text=message)
+        # Ожидаем фактической доставки, чтобы consumer подтверждал сообщение
+        # только после отправки в Telegram
+        if self.scheduler is None:
+            self.scheduler = SendScheduler(self._send, **self.scheduler_options)
+            SEND_QUEUE.set_function(lambda: self.queue_depth)
+        # Span включает ожидание лимитов Telegram и склейку с соседними уведомлениями
+        attributes = {"telegram.queue_depth": self.queue_depth}
+        with TRACER.start_as_current_span("telegram send", kind=SpanKind.CLIENT, attributes=attributes):
+            await self.scheduler.enqueue(self.chat_id, message)
+
+    async def close(self):
+        if self.scheduler is not None:
+            await self.scheduler.close()
+        await self.bot.session.close()
@@ -1,9 +1,17 @@
+import asyncio
+import json
+import struct
 from unittest.mock import AsyncMock
 
 import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
 
-from app.consumer import OrderConsumer
-from app.tg_client import TelegramClient
+from consumer import OrderConsumer
+from tg_client import TelegramClient
 
 
 @pytest.mark.asyncio
@@ -28,3 +36,244 @@ async def test_process_order():
     assert "Новый заказ" in message
     assert "test-123" in message
     assert "Test Product" in message
+
+
+class FakeMessage:
+    def __init__(self, order_id: str, message_id: str = None):
+        self.body = json.dumps({
+            "order_id": order_id,
+            "product_name": "Test Product",
+            "quantity": 1,
+            "customer_name": "John Doe",
+            "customer_email": "john@example.com",
+            "status": "created",
+            "created_at": "2023-01-01T00:00:00"
+        }).encode()
+        self.content_type = "application/json"
+        self.message_id = message_id
+        self.headers = {}
+        self.timestamp = None
+        self.acked = False
+        self.requeued = False
+
+    async def ack(self):
+        self.acked = True
+
+    async def nack(self, requeue=True):
+        self.requeued = requeue
+
+
+class FakeQueue:
+    def __init__(self, messages):
+        self.messages = messages
+        self.cancelled = False
+
+    async def consume(self, callback):
+        for message in self.messages:
+            await callback(message)
+        return "ctag"
+
+    async def cancel(self, consumer_tag):
+        self.cancelled = True
+
+
+@pytest.mark.asyncio
+async def test_consume_orders_concurrently_and_drains_on_stop():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_send(message):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    mock_telegram.send_message.side_effect = slow_send
+    consumer = OrderConsumer(mock_telegram, prefetch_count=10, concurrency=4)
+
+    messages = [FakeMessage(f"order-{i}") for i in range(10)]
+    queue = FakeQueue(messages)
+    mock_channel = AsyncMock()
+    mock_channel.declare_queue.return_value = queue
+    consumer.channels = [mock_channel]
+
+    task = asyncio.create_task(consumer.consume_orders())
+    await asyncio.sleep(0)
+    consumer.stop()
+    await task
+
+    assert queue.cancelled
+    assert all(message.acked for message in messages)
+    assert mock_telegram.send_message.call_count == 10
+    assert max_in_flight == 4
+
+
+@pytest.mark.asyncio
+async def test_default_consumer_coalesces_orders_into_one_telegram_call(monkeypatch):
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append(text)
+
+    telegram_client = TelegramClient("123456:TEST", "chat", per_chat_rate=50)
+    monkeypatch.setattr(telegram_client, "_send", send)
+    consumer = OrderConsumer(telegram_client)
+
+    messages = [FakeMessage(f"order-{i}") for i in range(3)]
+    mock_channel = AsyncMock()
+    mock_channel.declare_queue.return_value = FakeQueue(messages)
+    consumer.channels = [mock_channel]
+
+    task = asyncio.create_task(consumer.consume_orders())
+    await asyncio.sleep(0)
+    consumer.stop()
+    await task
+    await telegram_client.close()
+
+    # Обработчики поставили заказы в очередь чата одновременно
+    assert len(sent) == 1
+    assert all(f"order-{i}" in sent[0] for i in range(3))
+    assert all(message.acked for message in messages)
+
+
+@pytest.mark.asyncio
+async def test_handle_binary_message():
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    consumer = OrderConsumer(mock_telegram)
+
+    body = (
+        struct.pack("!Biq", 2, 5, 1_700_000_000_000_000)
+        + b"".join(struct.pack("!H", len(value)) + value for value in (b"id-7", b"Tea", b"Jane", b"jane@example.com"))
+    )
+    message = FakeMessage("unused")
+    message.body = body
+    message.content_type = "application/x-order-v1"
+
+    await consumer.handle_message(message)
+
+    text = mock_telegram.send_message.call_args[0][0]
+    assert "id-7" in text
+    assert "completed" in text
+    assert "2023-11-14T22:13:20+00:00" in text
+    assert message.acked
+
+
+@pytest.mark.asyncio
+async def test_duplicate_deliveries_are_sent_once():
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    consumer = OrderConsumer(mock_telegram)
+
+    messages = [
+        FakeMessage("order-1", message_id="order-1"),
+        FakeMessage("order-1", message_id="order-1"),
+        # Без message_id ключом служит order_id из тела
+        FakeMessage("order-1"),
+        FakeMessage("order-2"),
+    ]
+    for message in messages:
+        await consumer.handle_message(message)
+
+    assert mock_telegram.send_message.call_count == 2
+    assert all(message.acked for message in messages)
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_go_to_retry_tiers_then_dlq():
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    mock_telegram.send_message.side_effect = ConnectionError("telegram is down")
+    mock_channel = AsyncMock()
+    consumer = OrderConsumer(mock_telegram)
+    consumer.channels = [mock_channel]
+
+    first = FakeMessage("order-1")
+    last = FakeMessage("order-2")
+    last.headers = {"x-attempt": 3}
+    broken = FakeMessage("order-3")
+    broken.body = b"not json"
+    for message in (first, last, broken):
+        await consumer.handle_message(message)
+
+    published = [
+        (call.kwargs["routing_key"], call.args[0].headers["x-attempt"])
+        for call in mock_channel.default_exchange.publish.call_args_list
+    ]
+    assert published == [
+        ("orders_queue.retry.5s", 1),
+        ("orders_queue.dlq", 4),
+        ("orders_queue.dlq", 1),
+    ]
+    assert all(message.acked for message in (first, last, broken))
+
+
+@pytest.mark.asyncio
+async def test_failures_do_not_stop_workers():
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    mock_telegram.send_message.side_effect = [ConnectionError("telegram is down"), None, None]
+    mock_channel = AsyncMock()
+    # Повтор опубликовать не удалось
+    mock_channel.default_exchange.publish.side_effect = ConnectionError("channel closed")
+    consumer = OrderConsumer(mock_telegram, prefetch_count=10, concurrency=1)
+    consumer.channels = [mock_channel]
+
+    broken_ack = FakeMessage("order-2")
+    broken_ack.ack = AsyncMock(side_effect=ConnectionError("channel closed"))
+    messages = [FakeMessage("order-1"), broken_ack, FakeMessage("order-3")]
+    mock_channel.declare_queue.return_value = FakeQueue(messages)
+
+    task = asyncio.create_task(consumer.consume_orders())
+    await asyncio.sleep(0)
+    consumer.stop()
+    await asyncio.wait_for(task, 1)
+
+    # Первое сообщение вернулось брокеру, а единственный worker обработал следующие
+    assert messages[0].requeued and not messages[0].acked
+    assert mock_telegram.send_message.call_count == 3
+    assert messages[2].acked
+
+
+@pytest.fixture(scope="session")
+def span_exporter():
+    # Глобальный TracerProvider OpenTelemetry задаётся один раз на процесс
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return exporter
+
+
+@pytest.mark.asyncio
+async def test_handle_message_continues_producer_trace(span_exporter):
+    span_exporter.clear()
+    consumer = OrderConsumer(AsyncMock(spec=TelegramClient))
+
+    message = FakeMessage("order-1")
+    message.headers = {
+        "traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01",
+        "x-sent-at": 1_700_000_000_000_000_000,
+    }
+    await consumer.handle_message(message)
+
+    spans = {span.name: span for span in span_exporter.get_finished_spans()}
+    assert set(spans) == {"orders_queue wait", "handle order", "decode"}
+    assert {span.context.trace_id for span in spans.values()} == {0x0af7651916cd43dd8448eb211c80319c}
+    assert spans["orders_queue wait"].start_time == 1_700_000_000_000_000_000
+    assert spans["orders_queue wait"].kind == SpanKind.CONSUMER
+    assert spans["handle order"].parent.span_id == 0xb7ad6b7169203331
+    assert spans["decode"].parent.span_id == spans["handle order"].context.span_id
+
+
+@pytest.mark.asyncio
+async def test_failed_handling_marks_span_as_error(span_exporter):
+    span_exporter.clear()
+    telegram = AsyncMock(spec=TelegramClient)
+    telegram.send_message.side_effect = RuntimeError("boom")
+    consumer = OrderConsumer(telegram)
+    consumer.channels = [AsyncMock()]
+
+    await consumer.handle_message(FakeMessage("order-1"))
+
+    (handle,) = [span for span in span_exporter.get_finished_spans() if span.name == "handle order"]
+    assert handle.status.status_code == StatusCode.ERROR
+    assert handle.events[0].name == "exception"
@@ -0,0 +1,45 @@
+from dedup import SeenCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_seen_cache_evicts_by_ttl_and_size():
+    clock = FakeClock()
+    cache = SeenCache(max_entries=2, ttl=60, clock=clock)
+
+    cache.add("a")
+    clock.now += 30
+    cache.add("b")
+    assert "a" in cache and "b" in cache
+
+    cache.add("c")
+    assert "a" not in cache
+    assert len(cache) == 2
+
+    clock.now += 61
+    assert "b" not in cache
+    assert "c" not in cache
+
+
+def test_seen_cache_persists_between_restarts(tmp_path):
+    clock = FakeClock()
+    path = str(tmp_path / "seen.json")
+    cache = SeenCache(ttl=60, path=path, clock=clock)
+    cache.add("old")
+    clock.now += 50
+    cache.add("new")
+    cache.save()
+
+    clock.now += 20
+    restored = SeenCache(ttl=60, path=path, clock=clock)
+    restored.load()
+
+    assert "new" in restored
+    assert "old" not in restored
+    assert len(restored) == 1
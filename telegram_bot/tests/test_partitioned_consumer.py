@@ -0,0 +1,99 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiormq.exceptions import ChannelAccessRefused
+
+from partitioned_consumer import PartitionedConsumer
+from tg_client import TelegramClient
+from common.partitioning import PartitionedTopology
+from tests.test_consumer import FakeMessage
+
+
+class WorkerCrash(BaseException):
+    """Ошибка, которую не перехватывает обработка отдельного сообщения."""
+
+
+class ExclusiveQueue:
+    """Очередь, уже занятая другим экземпляром, если taken."""
+
+    def __init__(self, messages, taken=False):
+        self.messages = messages
+        self.taken = taken
+        self.cancelled = False
+
+    async def consume(self, callback, exclusive=False):
+        if self.taken:
+            raise ChannelAccessRefused(None)
+        for message in self.messages:
+            await callback(message)
+        return "ctag"
+
+    async def cancel(self, consumer_tag):
+        self.cancelled = True
+
+
+@pytest.mark.asyncio
+async def test_claims_free_partitions_and_keeps_order():
+    topology = PartitionedTopology(3)
+    sent = []
+
+    async def send(message):
+        await asyncio.sleep(0)
+        sent.append(message.split("\n")[2])
+
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    mock_telegram.send_message.side_effect = send
+    consumer = PartitionedConsumer(mock_telegram, topology, prefetch_count=10, claim_interval=0.01)
+
+    queues = {
+        "orders_queue.p0": ExclusiveQueue([FakeMessage(f"a-{i}") for i in range(5)]),
+        "orders_queue.p1": ExclusiveQueue([], taken=True),
+        "orders_queue.p2": ExclusiveQueue([FakeMessage(f"b-{i}") for i in range(5)]),
+    }
+
+    async def new_channel():
+        channel = AsyncMock()
+        channel.declare_queue.side_effect = lambda name, **kwargs: queues[name]
+        return channel
+
+    consumer.connection = MagicMock()
+    consumer.connection.channel.side_effect = new_channel
+    consumer.channels = [AsyncMock()]
+
+    task = asyncio.create_task(consumer.consume_orders())
+    await asyncio.sleep(0.05)
+    assert set(consumer.claims) == {"orders_queue.p0", "orders_queue.p2"}
+    consumer.stop()
+    await task
+
+    assert queues["orders_queue.p0"].cancelled and queues["orders_queue.p2"].cancelled
+    assert [line for line in sent if "a-" in line] == [f"ID: a-{i}" for i in range(5)]
+    assert [line for line in sent if "b-" in line] == [f"ID: b-{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_partition_survives_failed_message_and_releases_claim_if_worker_dies():
+    topology = PartitionedTopology(1)
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    consumer = PartitionedConsumer(mock_telegram, topology, prefetch_count=10)
+    first, second = FakeMessage("a-1"), FakeMessage("a-2")
+    first.ack = AsyncMock(side_effect=ConnectionError("channel closed"))
+    channel = AsyncMock()
+    channel.declare_queue.return_value = ExclusiveQueue([first, second])
+    consumer.connection = MagicMock()
+    consumer.connection.channel = AsyncMock(return_value=channel)
+
+    assert await consumer.claim("orders_queue.p0")
+    claim = consumer.claims["orders_queue.p0"]
+    await asyncio.wait_for(claim.buffer.join(), 1)
+    assert second.acked
+    assert not claim.worker.done()
+
+    # Worker всё же упал: эксклюзивная подписка снимается вместе с каналом
+    consumer.handle_message = AsyncMock(side_effect=WorkerCrash)
+    await claim.buffer.put(FakeMessage("a-3"))
+    with pytest.raises(WorkerCrash):
+        await claim.worker
+    assert "orders_queue.p0" not in consumer.claims
+    channel.close.assert_awaited_once()
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, UTC
+from unittest.mock import AsyncMock
+
+import pytest
+
+from stream_consumer import OffsetStore, StreamConsumer, parse_offset
+from tg_client import TelegramClient
+from tests.test_consumer import FakeMessage
+
+
+class StreamMessage(FakeMessage):
+    def __init__(self, order_id: str, offset: int):
+        super().__init__(order_id, message_id=order_id)
+        self.headers = {"x-stream-offset": offset}
+        self.acks = []
+
+    async def ack(self, multiple=False):
+        self.acks.append(multiple)
+
+
+class FakeStream:
+    def __init__(self, messages):
+        self.messages = messages
+        self.consume_arguments = None
+        self.cancelled = False
+
+    async def consume(self, callback, arguments=None):
+        self.consume_arguments = arguments
+        for message in self.messages:
+            await callback(message)
+        return "ctag"
+
+    async def cancel(self, consumer_tag):
+        self.cancelled = True
+
+
+def test_parse_offset():
+    assert parse_offset("first") == "first"
+    assert parse_offset("42") == 42
+    assert parse_offset("2024-05-01T10:00:00") == datetime(2024, 5, 1, 10, tzinfo=UTC)
+
+
+@pytest.mark.asyncio
+async def test_resumes_from_stored_offset_and_acks_batch(tmp_path):
+    store = OffsetStore(str(tmp_path / "offset"))
+    store.save(10)
+    messages = [StreamMessage(f"order-{offset}", offset) for offset in range(10, 15)]
+    stream = FakeStream(messages)
+
+    mock_telegram = AsyncMock(spec=TelegramClient)
+    consumer = StreamConsumer(mock_telegram, offset="first", batch_size=100, offset_store=store, concurrency=2)
+    channel = AsyncMock()
+    channel.declare_queue.return_value = stream
+    consumer.channels = [channel]
+
+    task = asyncio.create_task(consumer.consume_orders())
+    await asyncio.sleep(0.05)
+    consumer.stop()
+    await task
+
+    assert stream.consume_arguments == {"x-stream-offset": 10}
+    assert stream.cancelled
+    assert mock_telegram.send_message.await_count == 5
+    # Вся пачка подтверждается одним ack последнего сообщения
+    assert messages[-1].acks == [True]
+    assert not any(message.acks for message in messages[:-1])
+    assert store.load() == 15
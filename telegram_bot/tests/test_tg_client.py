@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+
+from tg_client import MESSAGE_LIMIT, SendScheduler, split_message
+
+
+@pytest.mark.asyncio
+async def test_scheduler_coalesces_while_rate_limited():
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append((chat_id, text))
+
+    scheduler = SendScheduler(send, per_chat_rate=20, per_chat_burst=1)
+    await scheduler.enqueue("chat", "order-0")
+    deliveries = [scheduler.enqueue("chat", f"order-{i}") for i in range(1, 4)]
+    assert scheduler.queue_depth == 3
+
+    await asyncio.gather(*deliveries)
+
+    assert sent[0] == ("chat", "order-0")
+    assert sent[1] == ("chat", "order-1\n\norder-2\n\norder-3")
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_respects_message_limit():
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append(text)
+
+    scheduler = SendScheduler(send, per_chat_rate=1000, per_chat_burst=1)
+    long_text = "x" * (MESSAGE_LIMIT // 2)
+    await asyncio.gather(*(scheduler.enqueue("chat", long_text) for _ in range(3)))
+
+    assert all(len(text) <= MESSAGE_LIMIT for text in sent)
+    assert sum(text.count("x") for text in sent) == 3 * len(long_text)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_splits_message_over_limit():
+    sent = []
+
+    async def send(chat_id, text):
+        sent.append(text)
+
+    scheduler = SendScheduler(send, per_chat_rate=1000, per_chat_burst=1, coalesce=False)
+    text = "x" * (2 * MESSAGE_LIMIT + 10)
+    await scheduler.enqueue("chat", text)
+
+    assert [len(part) for part in sent] == [MESSAGE_LIMIT, MESSAGE_LIMIT, 10]
+    assert "".join(sent) == text
+
+
+def test_split_message_prefers_line_breaks():
+    lines = ["a" * 3000, "b" * 3000, "c" * 10]
+    assert split_message("\n".join(lines)) == ["a" * 3000, "b" * 3000 + "\n" + "c" * 10]
+    assert split_message("short") == ["short"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_honours_retry_after_per_chat():
+    sent = []
+    calls = 0
+
+    async def send(chat_id, text):
+        nonlocal calls
+        calls += 1
+        if chat_id == "slow" and calls == 1:
+            raise TelegramRetryAfter(method=None, message="Too Many Requests", retry_after=0.05)
+        sent.append((chat_id, text))
+
+    scheduler = SendScheduler(send, per_chat_rate=1000)
+    slow = scheduler.enqueue("slow", "first")
+    fast = scheduler.enqueue("fast", "second")
+
+    await fast
+    assert sent == [("fast", "second")]
+    await slow
+    assert sent[-1] == ("slow", "first")